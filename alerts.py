@@ -0,0 +1,298 @@
+"""AQI threshold alerts"""
+import atexit
+import ipaddress
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import requests
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id TEXT PRIMARY KEY,
+    city TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    horizon_days INTEGER NOT NULL,
+    webhook TEXT,
+    created_at REAL NOT NULL
+)
+"""
+COLUMNS = ['id', 'city', 'threshold', 'horizon_days', 'webhook', 'created_at']
+
+# Notifications kept per subscription for GET /alerts/<id>
+RECENT_NOTIFICATIONS = 20
+
+
+def check_webhook(url):
+    """Raise ValueError unless url is http(s) to a host with only public addresses"""
+    try:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError("webhook must be an http(s) URL")
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"webhook host does not resolve: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        # Loopback, private, link-local (cloud metadata), reserved and multicast
+        if not address.is_global or address.is_multicast:
+            raise ValueError("webhook must point to a public address")
+
+
+class ThresholdIndex:
+    """Subscription ids sorted by threshold, for one city and horizon"""
+
+    def __init__(self):
+        self.thresholds = []
+        self.ids = []
+        self.level = None  # peak AQI at the last evaluation
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, threshold, subscription_id):
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, subscription_id)
+
+    def remove(self, threshold, subscription_id):
+        low = bisect_left(self.thresholds, threshold)
+        high = bisect_right(self.thresholds, threshold)
+        i = self.ids.index(subscription_id, low, high)
+        del self.thresholds[i]
+        del self.ids[i]
+
+    def crossed(self, level):
+        """Ids whose threshold the level has gone above since the last evaluation"""
+        low = 0 if self.level is None else bisect_left(self.thresholds, self.level)
+        high = bisect_left(self.thresholds, level)
+        self.level = level
+        return self.ids[low:high] if high > low else []
+
+
+class AlertManager:
+    """Threshold subscriptions per city, evaluated on each new snapshot off the request path"""
+
+    def __init__(self, registry, path=None, enabled=None, max_horizon=None):
+        self.registry = registry
+        self.path = path or Config.ALERTS_PATH
+        self.enabled = Config.ALERTS_ENABLED if enabled is None else enabled
+        self.max_horizon = Config.ALERT_MAX_HORIZON if max_horizon is None else max_horizon
+        self.subscriptions = {}  # id -> subscription dict
+        self.indexes = {}  # city -> [ThresholdIndex per horizon 0..max_horizon]
+        self.notifications = {}  # id -> recent notifications
+        self.queue = queue.Queue(maxsize=100)
+        self.worker = None
+        self.lock = threading.Lock()
+        if self.enabled:
+            self.load()
+            registry.add_snapshot_listener(self.on_snapshot)
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute(SCHEMA)
+        return connection
+
+    def load(self):
+        connection = self.connect()
+        try:
+            rows = connection.execute(f"SELECT {', '.join(COLUMNS)} FROM subscriptions").fetchall()
+        finally:
+            connection.close()
+        with self.lock:
+            for row in rows:
+                subscription = dict(zip(COLUMNS, row))
+                # ALERT_MAX_HORIZON may have been lowered since it was stored
+                subscription['horizon_days'] = min(subscription['horizon_days'], self.max_horizon)
+                self.add(subscription)
+        if rows:
+            print(f"Loaded {len(rows)} alert subscriptions")
+            self.start()
+
+    def add(self, subscription):
+        """Index a subscription; the caller holds the lock"""
+        self.subscriptions[subscription['id']] = subscription
+        self.notifications[subscription['id']] = deque(maxlen=RECENT_NOTIFICATIONS)
+        indexes = self.indexes.setdefault(subscription['city'],
+                                          [ThresholdIndex() for _ in range(self.max_horizon + 1)])
+        indexes[subscription['horizon_days']].add(subscription['threshold'], subscription['id'])
+
+    def subscribe(self, city, threshold, horizon_days=1, webhook=None):
+        """Register a subscription; raises ValueError for bad input"""
+        city = self.registry.resolve_city(city)
+        threshold = float(threshold)
+        horizon_days = int(horizon_days)
+        if not 0 < threshold < 1000:
+            raise ValueError("threshold must be an AQI between 0 and 1000")
+        if not 0 <= horizon_days <= self.max_horizon:
+            raise ValueError(f"horizon_days must be between 0 and {self.max_horizon}")
+        if webhook:
+            check_webhook(webhook)
+
+        subscription = {'id': uuid.uuid4().hex, 'city': city, 'threshold': threshold,
+                        'horizon_days': horizon_days, 'webhook': webhook or None, 'created_at': time.time()}
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(f"INSERT INTO subscriptions VALUES ({', '.join('?' * len(COLUMNS))})",
+                                   [subscription[column] for column in COLUMNS])
+        finally:
+            connection.close()
+
+        self.start()
+        with self.lock:
+            self.add(subscription)
+            index = self.indexes[city][horizon_days]
+            # Already above the threshold at the last evaluation: tell them now
+            already = index.level is not None and threshold < index.level
+        if already:
+            # Delivered by the worker so a slow webhook never holds the request
+            self.enqueue(self.deliver, subscription, {'aqi': index.level, 'date': None,
+                                                      'message': f"AQI is already above {threshold:.0f}"})
+        return subscription
+
+    def unsubscribe(self, subscription_id):
+        """Remove a subscription; False if it does not exist"""
+        with self.lock:
+            subscription = self.subscriptions.pop(subscription_id, None)
+            if subscription is None:
+                return False
+            self.notifications.pop(subscription_id, None)
+            self.indexes[subscription['city']][subscription['horizon_days']].remove(
+                subscription['threshold'], subscription_id)
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM subscriptions WHERE id = ?", (subscription_id,))
+        finally:
+            connection.close()
+        return True
+
+    def get(self, subscription_id):
+        """Subscription with its recent notifications, or None"""
+        with self.lock:
+            subscription = self.subscriptions.get(subscription_id)
+            if subscription is None:
+                return None
+            return {**subscription, 'notifications': list(self.notifications[subscription_id])}
+
+    def on_snapshot(self, city, data):
+        """Snapshot listener: queue an evaluation if anyone subscribed to the city"""
+        if city not in self.indexes or not any(self.indexes[city]):
+            return
+        self.enqueue(self.evaluate, city, data)
+
+    def enqueue(self, task, *args):
+        """Run task(*args) on the worker thread"""
+        try:
+            self.queue.put_nowait((task, args))
+        except queue.Full:
+            print(f"Alert queue is full; skipped {task.__name__} for {args[0]}")
+
+    def start(self):
+        with self.lock:
+            if self.worker is not None:
+                return
+            worker = threading.Thread(target=self.work_loop, name='alerts', daemon=True)
+            worker.start()
+            self.worker = worker
+            atexit.register(self.close)
+
+    def work_loop(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=Config.SNAPSHOT_TTL)
+            except queue.Empty:
+                # No traffic: keep subscribed cities' snapshots fresh ourselves
+                self.poll()
+                continue
+            if item is None:
+                break
+            task, args = item
+            try:
+                task(*args)
+            except Exception as e:
+                print(f"Error in alerts {task.__name__}: {e}")
+
+    def poll(self):
+        """Refresh expired snapshots of subscribed cities; new ones arrive via on_snapshot"""
+        with self.lock:
+            cities = [city for city, indexes in self.indexes.items() if any(indexes)]
+        for city in cities:
+            try:
+                self.registry.get_fetcher(city).get_combined_data()
+            except Exception as e:
+                print(f"Error refreshing {city} for alerts: {e}")
+
+    def close(self):
+        if self.worker is None:
+            return
+        self.queue.put(None)
+        self.worker.join(timeout=5)
+        self.worker = None
+
+    def levels(self, city, data):
+        """AQI now, then the forecast for each of the next max_horizon days"""
+        values = [float(data.get('aqi', 0))]
+        if self.max_horizon > 0:
+            predictor = self.registry.get_predictor(city)
+            values += [entry['aqi'] for entry in predictor.get_forecast_next_n_days(data, self.max_horizon)]
+        return values
+
+    def evaluate(self, city, data):
+        """Notify subscriptions whose threshold the new peak AQI crossed"""
+        values = self.levels(city, data)
+        today = datetime.now().date()
+        crossed = []
+        with self.lock:
+            peak = float('-inf')
+            for horizon, index in enumerate(self.indexes.get(city, [])):
+                if horizon < len(values):
+                    peak = max(peak, values[horizon])
+                for subscription_id in index.crossed(peak):
+                    crossed.append(self.subscriptions[subscription_id])
+
+        for subscription in crossed:
+            # First day within the horizon that goes above the threshold
+            day = next(d for d in range(subscription['horizon_days'] + 1)
+                       if d < len(values) and values[d] > subscription['threshold'])
+            when = 'now' if day == 0 else f"on {(today + timedelta(days=day)).strftime('%A, %B %d')}"
+            self.deliver(subscription, {
+                'aqi': round(values[day], 1),
+                'date': (today + timedelta(days=day)).isoformat(),
+                'message': f"AQI in {Config.get_city(city)['name']} is {'' if day == 0 else 'forecast to be '}"
+                           f"{values[day]:.0f} {when}, above your threshold of {subscription['threshold']:.0f}"
+            })
+        return len(crossed)
+
+    def deliver(self, subscription, notification):
+        notification = {'subscription': subscription['id'], 'city': subscription['city'],
+                        'threshold': subscription['threshold'], 'sent_at': datetime.now().isoformat(timespec='seconds'),
+                        **notification}
+        with self.lock:
+            recent = self.notifications.get(subscription['id'])
+            if recent is not None:
+                recent.append(notification)
+        if subscription['webhook']:
+            try:
+                # The host may resolve differently since it subscribed
+                check_webhook(subscription['webhook'])
+                requests.post(subscription['webhook'], json=notification, timeout=Config.HTTP_TIMEOUT,
+                              allow_redirects=False)
+            except Exception as e:
+                print(f"Error delivering alert to {subscription['webhook']}: {e}")
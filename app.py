@@ -1,8 +1,61 @@
-from flask import Flask, render_template, request, jsonify
-from chatbot import AQIChatbot
+import time
+from flask import Flask, Response, render_template, request, jsonify
+from alerts import AlertManager
+from chatbot import AQIChatbot, MODEL_INTENTS
+from city_registry import CityRegistry
+from config import Config
+from http_cache import gzip_body, http_date, is_not_modified, should_compress
+from metrics import metrics
+from profiling import profiler
+from query_log import query_log
+from rate_limit import RateLimiter, retry_after_header
+from scenarios import CATEGORY_THRESHOLDS
+from single_flight import SingleFlight
 
 app = Flask(__name__)
-chatbot = AQIChatbot()
+app.json.ensure_ascii = False  # emoji as UTF-8 rather than \uXXXX escapes
+registry = CityRegistry()
+registry.start_background_refresh()
+chatbots = {}
+rate_limiter = RateLimiter()
+# Identical model-backed requests in flight at once share one computation
+in_flight = SingleFlight()
+alert_manager = AlertManager(registry)
+
+def get_chatbot(city=None):
+    """Return the chatbot for a city; models are loaded lazily by the registry"""
+    key = registry.resolve_city(city)
+    if key not in chatbots:
+        chatbots[key] = AQIChatbot(key, registry)
+    return chatbots[key]
+
+def client_id():
+    """Address the rate limits are keyed on"""
+    if Config.RATE_LIMIT_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+def coalesced(key, fn, *args):
+    """Run fn once for concurrent identical requests; followers take on the leader's annotations"""
+    def run():
+        return fn(*args), metrics.annotations()
+    (result, annotations), shared = in_flight.do(key, run)
+    if shared:
+        # The follower's own details (its message, intent, city) take precedence
+        metrics.annotate(**{**annotations, **metrics.annotations()})
+    metrics.annotate(coalesced=shared)
+    return result
+
+def rate_limited(intent, error_key):
+    """429 response if the client is over its limit for this intent, else None"""
+    wait = rate_limiter.check(client_id(), intent)
+    if not wait:
+        return None
+    metrics.annotate(rate_limited=True)
+    retry_after = retry_after_header(wait)
+    unit = 'second' if retry_after == '1' else 'seconds'
+    body = {error_key: f"You're sending requests too quickly. Please try again in {retry_after} {unit}."}
+    return jsonify(body), 429, {'Retry-After': retry_after}
 
 @app.route('/')
 def index():
@@ -10,17 +63,144 @@ def index():
 
 @app.route('/chat', methods=['POST'])
 def chat():
+    metrics.begin_request()
+    start = time.perf_counter()
+    with metrics.span('request'):
+        response = app.make_response(profiler.run(handle_chat, details=metrics.annotations))
+    query_log.record(metrics.annotations(), time.perf_counter() - start, response.status_code)
+    return response
+
+def handle_chat():
     user_message = request.json.get('message', '')
-    response = chatbot.process_message(user_message)
-    
+    metrics.annotate(message=user_message)
+    city = request.json.get('city') or registry.match_city(user_message)
+
+    try:
+        chatbot = get_chatbot(city)
+    except KeyError:
+        return jsonify({'response': f"Sorry, I don't have data for {city} yet."}), 404
+
+    message_lower = user_message.lower().strip()
+    intent = chatbot.classify_intent(message_lower)
+    metrics.annotate(intent=intent, city=chatbot.city)
+    limited = rate_limited(intent, 'response')
+    if limited:
+        return limited
+
+    if intent in MODEL_INTENTS:
+        response = coalesced((chatbot.city, message_lower), chatbot.process_message, user_message, intent)
+    else:
+        response = chatbot.process_message(user_message, intent)
+
     # Check if response includes graph data
     if isinstance(response, dict) and 'graph_data' in response:
         return jsonify({
             'response': response['text'],
             'graph_data': response['graph_data']
         })
-    
+
     return jsonify({'response': response})
 
+@app.route('/forecast')
+def forecast():
+    """7-day past and future AQI as JSON, with ETag/Last-Modified for conditional GETs"""
+    metrics.begin_request()
+    city = request.args.get('city')
+    metrics.annotate(intent='forecast', city=city)
+    with metrics.span('request'):
+        try:
+            chatbot = get_chatbot(city)
+        except KeyError:
+            return jsonify({'error': f"Sorry, I don't have data for {city} yet."}), 404
+        limited = rate_limited('forecast', 'error')
+        if limited:
+            return limited
+
+        data = chatbot.data_fetcher.get_combined_data()
+        if not data:
+            return jsonify({'error': "Sorry, I couldn't fetch data for the graph. Please try again later."}), 503
+
+        etag, last_modified = chatbot.forecast_validators(data)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(last_modified),
+            'Cache-Control': 'public, no-cache'
+        }
+        if is_not_modified(request.headers, etag, last_modified):
+            return Response(status=304, headers=headers)
+
+        response = coalesced(('forecast', chatbot.city, etag), chatbot.get_graph_response, data)
+        return jsonify({'response': response['text'], 'graph_data': response['graph_data']}), 200, headers
+
+def alerts_unavailable():
+    """429 if the client is over its alerts limit, 404 if alerts are off, else None"""
+    limited = rate_limited('alerts', 'error')
+    if limited:
+        return limited
+    if not alert_manager.enabled:
+        return jsonify({'error': "Alerts are disabled. Set ALERTS_ENABLED=true to enable."}), 404
+    return None
+
+@app.route('/alerts', methods=['POST'])
+def create_alert():
+    """Subscribe to alerts when AQI goes above a threshold now or within horizon_days"""
+    unavailable = alerts_unavailable()
+    if unavailable:
+        return unavailable
+
+    body = request.get_json(silent=True) or {}
+    threshold = body.get('threshold')
+    if threshold is None and body.get('category') in CATEGORY_THRESHOLDS:
+        threshold = CATEGORY_THRESHOLDS[body['category']]
+    if threshold is None:
+        return jsonify({'error': "Give a threshold AQI or a category name."}), 400
+    try:
+        subscription = alert_manager.subscribe(body.get('city'), threshold, body.get('horizon_days', 1),
+                                               body.get('webhook'))
+    except KeyError:
+        return jsonify({'error': f"Sorry, I don't have data for {body.get('city')} yet."}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(subscription), 201
+
+@app.route('/alerts/<subscription_id>')
+def get_alert(subscription_id):
+    """A subscription and its recent notifications"""
+    unavailable = alerts_unavailable()
+    if unavailable:
+        return unavailable
+    subscription = alert_manager.get(subscription_id)
+    if subscription is None:
+        return jsonify({'error': "No such subscription."}), 404
+    return jsonify(subscription)
+
+@app.route('/alerts/<subscription_id>', methods=['DELETE'])
+def delete_alert(subscription_id):
+    unavailable = alerts_unavailable()
+    if unavailable:
+        return unavailable
+    if not alert_manager.unsubscribe(subscription_id):
+        return jsonify({'error': "No such subscription."}), 404
+    return Response(status=204)
+
+@app.after_request
+def compress(response):
+    """gzip JSON and text responses for clients that accept it"""
+    if response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    if should_compress(request.headers, body, response.content_type or ''):
+        response.set_data(gzip_body(body))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled:
+        return Response("Metrics are disabled. Set METRICS_ENABLED=true to enable.\n",
+                        status=404, mimetype='text/plain')
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
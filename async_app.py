@@ -0,0 +1,151 @@
+"""Async serving mode: the same chatbot behind an aiohttp server"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import jinja2
+from aiohttp import web
+
+from chatbot import AQIChatbot
+from city_registry import CityRegistry
+from config import Config
+from http_cache import http_date, is_not_modified, should_compress
+from metrics import metrics
+from query_log import query_log
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SESSION = web.AppKey('session', aiohttp.ClientSession)
+EXECUTOR = web.AppKey('executor', ThreadPoolExecutor)
+INDEX_HTML = web.AppKey('index_html', str)
+
+# Emoji as UTF-8 rather than \uXXXX escapes, as in the Flask app
+json_response = functools.partial(web.json_response, dumps=functools.partial(json.dumps, ensure_ascii=False))
+
+registry = CityRegistry()
+registry.start_background_refresh()
+chatbots = {}
+
+def get_chatbot(city=None):
+    """Return the chatbot for a city; models are loaded lazily by the registry"""
+    key = registry.resolve_city(city)
+    if key not in chatbots:
+        chatbots[key] = AQIChatbot(key, registry)
+    return chatbots[key]
+
+async def index(request):
+    return web.Response(text=request.app[INDEX_HTML], content_type='text/html')
+
+async def chat(request):
+    metrics.begin_request()
+    start = time.perf_counter()
+    with metrics.span('request'):
+        response = await handle_chat(request)
+    query_log.record(metrics.annotations(), time.perf_counter() - start, response.status)
+    return response
+
+async def handle_chat(request):
+    body = await request.json()
+    user_message = body.get('message', '')
+    metrics.annotate(message=user_message)
+    city = body.get('city') or registry.match_city(user_message)
+
+    try:
+        chatbot = get_chatbot(city)
+    except KeyError:
+        return json_response({'response': f"Sorry, I don't have data for {city} yet."}, status=404)
+
+    response = await chatbot.process_message_async(user_message, request.app[SESSION], request.app[EXECUTOR])
+
+    # Check if response includes graph data
+    if isinstance(response, dict) and 'graph_data' in response:
+        return json_response({
+            'response': response['text'],
+            'graph_data': response['graph_data']
+        })
+
+    return json_response({'response': response})
+
+async def forecast(request):
+    """7-day past and future AQI as JSON, with ETag/Last-Modified for conditional GETs"""
+    metrics.begin_request()
+    city = request.query.get('city')
+    metrics.annotate(intent='forecast', city=city)
+    with metrics.span('request'):
+        try:
+            chatbot = get_chatbot(city)
+        except KeyError:
+            return json_response({'error': f"Sorry, I don't have data for {city} yet."}, status=404)
+
+        data = await chatbot.data_fetcher.get_combined_data_async(request.app[SESSION])
+        if not data:
+            return json_response({'error': "Sorry, I couldn't fetch data for the graph. Please try again later."},
+                                 status=503)
+
+        loop = asyncio.get_running_loop()
+        executor = request.app[EXECUTOR]
+        context = contextvars.copy_context()
+        # Loading the predictor may read model files; keep it off the event loop
+        etag, last_modified = await loop.run_in_executor(executor, context.run, chatbot.forecast_validators, data)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(last_modified),
+            'Cache-Control': 'public, no-cache'
+        }
+        if is_not_modified(request.headers, etag, last_modified):
+            return web.Response(status=304, headers=headers)
+
+        response = await loop.run_in_executor(executor, context.run, chatbot.get_graph_response, data)
+        return json_response({'response': response['text'], 'graph_data': response['graph_data']},
+                             headers=headers)
+
+@web.middleware
+async def compression_middleware(request, handler):
+    """gzip JSON and text responses for clients that accept it"""
+    response = await handler(request)
+    if isinstance(response, web.Response) and response.status == 200 and isinstance(response.body, bytes) \
+            and should_compress(request.headers, response.body, response.content_type):
+        response.enable_compression(web.ContentCoding.gzip)
+    return response
+
+async def metrics_endpoint(request):
+    if not metrics.enabled:
+        return web.Response(text="Metrics are disabled. Set METRICS_ENABLED=true to enable.\n",
+                            status=404, content_type='text/plain')
+    return web.Response(text=metrics.render_prometheus(),
+                        headers={'Content-Type': 'text/plain; version=0.0.4'})
+
+def render_index():
+    """Render the Flask template once, with url_for pointing at /static"""
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.join(BASE_DIR, 'templates')))
+    return env.get_template('index.html').render(
+        url_for=lambda endpoint, filename: f'/static/{filename}')
+
+async def client_session(app):
+    """One pooled aiohttp session for all upstream calls"""
+    connector = aiohttp.TCPConnector(limit=Config.ASYNC_UPSTREAM_CONNECTIONS)
+    app[SESSION] = aiohttp.ClientSession(connector=connector)
+    yield
+    await app[SESSION].close()
+    app[EXECUTOR].shutdown(wait=False)
+
+def create_app():
+    app = web.Application(middlewares=[compression_middleware])
+    app[EXECUTOR] = ThreadPoolExecutor(max_workers=Config.ASYNC_CPU_WORKERS,
+                                       thread_name_prefix='aqi-cpu')
+    app[INDEX_HTML] = render_index()
+    app.cleanup_ctx.append(client_session)
+    app.router.add_get('/', index)
+    app.router.add_post('/chat', chat)
+    app.router.add_get('/forecast', forecast)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_static('/static', os.path.join(BASE_DIR, 'static'))
+    return app
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
@@ -0,0 +1,153 @@
+"""Rolling-origin backtest of the daily forecast"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from config import Config
+from rollout import Rollout
+
+# Loaded once per worker process
+predictor = None
+
+
+def init_worker(city):
+    global predictor
+    from ml_model import AQIPredictor
+    predictor = AQIPredictor(city)
+
+
+def load_history(path):
+    """Full daily history (every CSV column), one row per date"""
+    df = pd.read_csv(path)
+    df['date'] = pd.to_datetime(df['date']).dt.normalize()
+    if 'aqi' not in df.columns:
+        raise ValueError(f"{path} has no aqi column")
+    return df.drop_duplicates('date', keep='last').sort_values('date').reset_index(drop=True)
+
+
+def run_fold(history, origins, horizon):
+    """Forecasts [n_origins, horizon] for origin row positions in history"""
+    aqi = history['aqi'].to_numpy(dtype=np.float64)
+    conditions = history.drop(columns=['date']).to_dict('records')
+    dates = history['date'].tolist()
+
+    rows = [predictor.build_features(conditions[o], dates[o] + timedelta(days=h), dates[o])
+            for h in range(1, horizon + 1) for o in origins]
+    X = predictor.feature_matrix(rows).reshape(horizon, len(origins), len(predictor.feature_names))
+    # Lags seeded from the history up to and including each origin day
+    histories = [aqi[max(0, o - 13):o + 1] for o in origins]
+    point, _, _ = Rollout(predictor).run_matrix(X, histories, intervals=False)
+    return point
+
+
+def category_index(aqi):
+    """Index of the AQI category (Good=0 ... Hazardous=5), as in get_aqi_category"""
+    return np.searchsorted([50, 100, 150, 200, 300], aqi, side='left')
+
+
+def score(history, origins, forecasts, horizon):
+    """MAE, persistence MAE and category hit rate per horizon"""
+    aqi = history['aqi'].to_numpy(dtype=np.float64)
+    ordinals = history['date'].map(pd.Timestamp.toordinal).to_numpy()
+    position = {ordinal: i for i, ordinal in enumerate(ordinals)}
+
+    results = []
+    for h in range(1, horizon + 1):
+        # Actuals for origin + h days, where that date is in the history
+        targets = np.array([position.get(ordinals[o] + h, -1) for o in origins])
+        known = targets >= 0
+        known &= np.isfinite(aqi[np.where(known, targets, 0)])
+        if not known.any():
+            continue
+        actual = aqi[targets[known]]
+        predicted = forecasts[known, h - 1]
+        persistence = aqi[np.asarray(origins)[known]]
+        results.append({
+            'horizon': h,
+            'n': int(known.sum()),
+            'mae': float(np.mean(np.abs(predicted - actual))),
+            'persistence_mae': float(np.nanmean(np.abs(persistence - actual))),
+            'category_hit_rate': float(np.mean(category_index(predicted) == category_index(actual)))
+        })
+    return results
+
+
+def backtest(city=None, horizon=14, start=None, end=None, step=1, workers=None, fold_size=None):
+    """Run the backtest; returns (per-horizon results, run details)"""
+    path = Config.get_city_paths(city)['history']
+    history = load_history(path)
+
+    # Default to the last 20% of history, which training holds out
+    first = int(len(history) * 0.8) if start is None else int(history['date'].searchsorted(pd.Timestamp(start)))
+    last = len(history) - 1 if end is None else int(history['date'].searchsorted(pd.Timestamp(end), side='right')) - 1
+    origins = list(range(max(first, 1), last, step))
+    if not origins:
+        raise ValueError("No forecast origins in the selected range")
+
+    workers = workers or os.cpu_count() or 1
+    fold_size = fold_size or max(1, -(-len(origins) // workers))
+    folds = [origins[i:i + fold_size] for i in range(0, len(origins), fold_size)]
+
+    started = time.perf_counter()
+    key = Config.get_city(city)['key']
+    if workers == 1:
+        init_worker(key)
+        forecasts = [run_fold(history, fold, horizon) for fold in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(key,)) as pool:
+            forecasts = list(pool.map(run_fold, [history] * len(folds), folds, [horizon] * len(folds)))
+    elapsed = time.perf_counter() - started
+
+    results = score(history, origins, np.vstack(forecasts), horizon)
+    details = {
+        'city': key,
+        'history': path,
+        'origins': len(origins),
+        'first_origin': history['date'].iloc[origins[0]].strftime('%Y-%m-%d'),
+        'last_origin': history['date'].iloc[origins[-1]].strftime('%Y-%m-%d'),
+        'folds': len(folds),
+        'workers': workers,
+        'seconds': round(elapsed, 2)
+    }
+    return results, details
+
+
+def format_report(results, details):
+    lines = [f"{details['city']}: {details['origins']} origins {details['first_origin']} to "
+             f"{details['last_origin']}, {details['folds']} folds on {details['workers']} workers "
+             f"in {details['seconds']}s\n",
+             f"{'horizon':>7s} {'n':>6s} {'MAE':>8s} {'persist':>8s} {'category hit':>13s}"]
+    for row in results:
+        lines.append(f"{row['horizon']:6d}d {row['n']:6d} {row['mae']:8.1f} {row['persistence_mae']:8.1f} "
+                     f"{row['category_hit_rate']:13.1%}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the daily forecast')
+    parser.add_argument('--city', default=None, help='City key (default: DEFAULT_CITY)')
+    parser.add_argument('--horizon', type=int, default=14, help='Days rolled out from each origin')
+    parser.add_argument('--start', help='First origin date (default: start of the last 20%% of history)')
+    parser.add_argument('--end', help='Last origin date (default: end of history)')
+    parser.add_argument('--step', type=int, default=1, help='Days between origins')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if not os.path.exists(Config.get_city_paths(args.city)['model']):
+        raise SystemExit("No trained model; run the app once or train before backtesting")
+
+    results, details = backtest(args.city, args.horizon, args.start, args.end, args.step, args.workers)
+    print(format_report(results, details))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({**details, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Offline batch forecasts for (date, conditions) rows"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from config import Config
+from rollout import Rollout
+
+CONDITION_COLUMNS = ['temp', 'humidity', 'pressure', 'wind_speed', 'wind_deg', 'clouds',
+                     'pm25', 'pm10', 'o3', 'no2', 'so2', 'co']
+
+# Loaded once per worker process
+predictor = None
+
+
+def init_worker(city):
+    global predictor
+    from ml_model import AQIPredictor
+    predictor = AQIPredictor(city)
+
+
+def predict_chunk(chunk):
+    """Point forecast, interval and category for every row of a chunk"""
+    from ml_model import AQIPredictor
+    dates = pd.to_datetime(chunk['date']).dt.normalize().tolist()
+    conditions = chunk[CONDITION_COLUMNS].to_dict('records')
+    # Each row is its own origin: its conditions are the target day's
+    X = predictor.feature_matrix([predictor.build_features(row, date, date, adjust=False)
+                                  for row, date in zip(conditions, dates)])
+
+    # Lags from the days before each row's date, looked up once per date
+    recent = {date: predictor.recent_values(date - timedelta(days=1)) for date in set(dates)}
+    histories = [recent[date] for date in dates]
+    point, lower, upper = Rollout(predictor).run_matrix(X[None], histories)
+    point = point[:, 0]
+    result = chunk.copy()
+    result['aqi'] = np.round(point, 1)
+    result['lower'] = np.round(lower[:, 0], 1) if lower is not None else np.nan
+    result['upper'] = np.round(upper[:, 0], 1) if upper is not None else np.nan
+    result['category'] = [AQIPredictor.get_aqi_category(value)[0] for value in point]
+    return result
+
+
+def input_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of up to chunk_size input rows"""
+    if input_format(path) == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+        return
+    with open(path) as f:
+        records = []
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+            if len(records) == chunk_size:
+                yield pd.DataFrame(records)
+                records = []
+        if records:
+            yield pd.DataFrame(records)
+
+
+def check_columns(chunk, first_row=1):
+    """Exit with a clear message if the chunk lacks a column or a row lacks a value"""
+    required = ['date', *CONDITION_COLUMNS]
+    missing = [column for column in required if column not in chunk.columns]
+    if missing:
+        raise SystemExit(f"Input is missing columns: {', '.join(missing)}")
+    # A JSONL record without a key, or an empty CSV cell, reads as NaN
+    incomplete = chunk[required].isna().to_numpy()
+    if incomplete.any():
+        row = int(np.argmax(incomplete.any(axis=1)))
+        columns = [column for column, empty in zip(required, incomplete[row]) if empty]
+        raise SystemExit(f"Input row {first_row + row} is missing: {', '.join(columns)}")
+
+
+class Writer:
+    """Appends result chunks to a CSV or JSONL file"""
+
+    def __init__(self, path):
+        self.format = input_format(path)
+        self.file = open(path, 'w', newline='')
+        self.first = True
+
+    def write(self, chunk):
+        if self.format == 'csv':
+            chunk.to_csv(self.file, header=self.first, index=False)
+        else:
+            text = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+            self.file.write(text if text.endswith('\n') or not text else text + '\n')
+        self.first = False
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(input_path, output_path, city=None, workers=None, chunk_size=1000):
+    """Forecast every input row; returns (rows, seconds)"""
+    workers = workers or os.cpu_count() or 1
+    key = Config.get_city(city)['key']
+    writer = Writer(output_path)
+    rows = 0
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(key,)) as pool:
+            # Keep a bounded window of chunks in flight and write them in
+            # input order, so neither input nor results pile up in memory
+            pending = deque()
+            read = 0
+            for chunk in read_chunks(input_path, chunk_size):
+                check_columns(chunk, read + 1)
+                read += len(chunk)
+                pending.append(pool.submit(predict_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    result = pending.popleft().result()
+                    writer.write(result)
+                    rows += len(result)
+            while pending:
+                result = pending.popleft().result()
+                writer.write(result)
+                rows += len(result)
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch AQI forecasts for a CSV or JSONL file of conditions')
+    parser.add_argument('input', help='Input .csv or .jsonl with date and condition columns')
+    parser.add_argument('output', help='Output .csv or .jsonl')
+    parser.add_argument('--city', default=None, help='City key (default: DEFAULT_CITY)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per worker task')
+    args = parser.parse_args()
+
+    if not os.path.exists(Config.get_city_paths(args.city)['model']):
+        raise SystemExit("No trained model; run the app once or train before batch forecasting")
+
+    rows, seconds = run(args.input, args.output, args.city, args.workers, args.chunk_size)
+    print(f"Wrote {rows} forecasts to {args.output} in {seconds:.1f}s ({rows / max(seconds, 1e-9):.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
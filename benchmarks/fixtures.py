@@ -0,0 +1,57 @@
+"""Recorded WAQI, OpenWeather and OpenAQ responses served without network access"""
+import json
+import os
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    """Load a recorded JSON response by file name"""
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def fixture_for_url(url):
+    """Pick the recorded response matching an upstream URL"""
+    if '/map/bounds' in url:
+        return 'waqi_bounds.json'
+    if 'waqi.info' in url or '/feed/' in url:
+        return 'waqi_feed.json'
+    if 'openaq' in url or '/measurements' in url:
+        return 'openaq_measurements.json'
+    if '/forecast' in url:
+        return 'openweather_forecast.json'
+    if '/weather' in url:
+        return 'openweather_weather.json'
+    return None
+
+
+class FixtureResponse:
+    """Minimal stand-in for requests.Response backed by a recorded payload"""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+def install_fixtures():
+    """Route requests.get (and Session.get) to the recorded fixtures"""
+    payloads = {name: load_fixture(name) for name in os.listdir(FIXTURES_DIR) if name.endswith('.json')}
+
+    def fake_get(url, *args, **kwargs):
+        name = fixture_for_url(url)
+        if name is None:
+            return FixtureResponse({'status': 'error', 'data': 'Unknown endpoint'}, 404)
+        return FixtureResponse(payloads[name])
+
+    requests.get = fake_get
+    requests.Session.get = lambda self, url, *args, **kwargs: fake_get(url, *args, **kwargs)
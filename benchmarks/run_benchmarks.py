@@ -0,0 +1,266 @@
+"""Offline benchmarks for the chat, inference and training hot paths"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import install_fixtures
+
+CHAT_MESSAGES = {
+    'greeting': ['hello', 'hi there'],
+    'help': ['help', 'what can you do?'],
+    'current': ["what's the aqi now?", 'air quality right now'],
+    'prediction': ['what will the aqi be tomorrow?', 'predict aqi for friday', 'aqi in 3 days'],
+    'hourly': ['aqi in 5 hours', 'hourly forecast for the next 48 hours'],
+    'comparison': ['compare air quality vs yesterday'],
+    'probability': ["what's the chance aqi goes above 200 tomorrow?"],
+    'trend': ['show me the pattern'],
+    'graph': ['show me a graph'],
+    'smart': ['should I go for a run?', 'is it safe outside?'],
+}
+
+CURRENT_DATA = {
+    'aqi': 212, 'pm25': 212, 'pm10': 187, 'o3': 14.1, 'no2': 28.3, 'so2': 4.6, 'co': 6.4,
+    'temp': 24.05, 'humidity': 60, 'pressure': 1013, 'wind_speed': 1.54, 'wind_deg': 290, 'clouds': 0
+}
+
+
+def summarize(samples, unit='ms'):
+    """Summary statistics for a list of timings in seconds"""
+    values = np.asarray(samples) * (1000 if unit == 'ms' else 1)
+    return {
+        'unit': unit,
+        'n': int(len(values)),
+        'mean': float(values.mean()),
+        'median': float(np.median(values)),
+        'p95': float(np.percentile(values, 95)),
+        'min': float(values.min()),
+        'max': float(values.max())
+    }
+
+
+def time_calls(fn, repeat, warmup=1):
+    """Time repeated calls of fn, after warm-up calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def prepare_workdir():
+    """Scratch copy of data/ and models/ so benchmarks never touch the real ones"""
+    workdir = tempfile.mkdtemp(prefix='aqi-bench-')
+    for name in ('data', 'models'):
+        src = os.path.join(REPO_ROOT, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(workdir, name))
+    return workdir
+
+
+def synthetic_history(n_rows):
+    """Daily history of n_rows ending yesterday"""
+    import pandas as pd
+    dates = pd.date_range(end=datetime.now() - timedelta(days=1), periods=n_rows, freq='D')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': dates,
+        'aqi': rng.uniform(50, 400, n_rows),
+        'pm25': rng.uniform(30, 300, n_rows)
+    })
+
+
+def bench_chat(results, repeat):
+    from chatbot import AQIChatbot
+    from city_registry import CityRegistry
+    chatbot = AQIChatbot(registry=CityRegistry())
+    for intent, messages in CHAT_MESSAGES.items():
+        samples = []
+        for message in messages:
+            samples += time_calls(lambda: chatbot.process_message(message), repeat)
+        results[f'chat.process_message.{intent}'] = summarize(samples)
+    return chatbot
+
+
+def bench_inference(results, predictor, repeat):
+    target = datetime.now() + timedelta(days=3)
+    samples = time_calls(lambda: predictor.predict_for_date(CURRENT_DATA, target), repeat)
+    results['predictor.predict_for_date'] = summarize(samples)
+    results['predictor.predict_for_date.throughput'] = {
+        'unit': 'calls/s', 'n': repeat, 'mean': float(len(samples) / sum(samples))
+    }
+
+    # Serving engines side by side on the same single-row input
+    rows = [predictor.build_features(CURRENT_DATA, target)]
+    compiled = predictor.compiled
+    try:
+        for engine, value in (('sklearn', None), ('compiled', compiled)):
+            if engine == 'compiled' and compiled is None:
+                continue
+            predictor.compiled = value
+            samples = time_calls(lambda: predictor.predict_batch(rows), repeat)
+            results[f'predictor.predict_batch.{engine}'] = summarize(samples)
+    finally:
+        predictor.compiled = compiled
+
+    for n_days in (7, 14, 30):
+        samples = time_calls(lambda: predictor.predict_next_n_days(CURRENT_DATA, n_days), repeat)
+        results[f'predictor.predict_next_n_days.{n_days}'] = summarize(samples)
+        results[f'predictor.predict_next_n_days.{n_days}.throughput'] = {
+            'unit': 'days/s', 'n': repeat, 'mean': float(n_days * len(samples) / sum(samples))
+        }
+
+    # Many scenarios rolled out together, one model call per day
+    scenarios = [dict(CURRENT_DATA, pm25=pm25) for pm25 in np.linspace(50, 300, 64)]
+    samples = time_calls(lambda: predictor.rollout(scenarios, 14), repeat)
+    results['predictor.rollout.64x14'] = summarize(samples)
+
+    samples = time_calls(lambda: predictor.get_scenario_forecast(CURRENT_DATA, 1), repeat)
+    results['predictor.get_scenario_forecast.1day'] = summarize(samples)
+
+
+def bench_history(results, predictor, repeat, sizes):
+    from history import compact_history
+    original = predictor.historical_data
+    try:
+        for size in sizes:
+            predictor.historical_data = compact_history(synthetic_history(size))
+            samples = time_calls(lambda: predictor.get_past_n_days(7), repeat)
+            results[f'predictor.get_past_n_days.rows_{size}'] = summarize(samples)
+    finally:
+        predictor.historical_data = original
+
+
+def bench_training(results, predictor):
+    start = time.perf_counter()
+    predictor.train_model_with_real_data()
+    results['predictor.train_model_with_real_data'] = summarize([time.perf_counter() - start], unit='s')
+
+
+def bench_startup(results, workdir, repeat):
+    """Cold import of the app and first model load, each in a fresh interpreter"""
+    script = (
+        "import sys, time, json\n"
+        f"sys.path.insert(0, {REPO_ROOT!r})\n"
+        "start = time.perf_counter()\n"
+        "import app\n"
+        "imported = time.perf_counter()\n"
+        "app.registry.get_predictor()\n"
+        "loaded = time.perf_counter()\n"
+        "print(json.dumps({'import': imported - start, 'load': loaded - imported}))\n"
+    )
+    imports, loads = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], cwd=workdir,
+                                capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        imports.append(timings['import'])
+        loads.append(timings['load'])
+    results['startup.import_app'] = summarize(imports)
+    results['startup.first_model_load'] = summarize(loads)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args):
+    workdir = prepare_workdir()
+    os.chdir(workdir)
+    install_fixtures()
+    repeat = 3 if args.quick else args.repeat
+    sizes = [1_000, 10_000] if args.quick else [1_000, 10_000, 100_000]
+
+    results = {}
+    try:
+        # Start-up first, before this process has imported the app
+        bench_startup(results, workdir, 1 if args.quick else 3)
+        chatbot = bench_chat(results, repeat)
+        predictor = chatbot.predictor
+        bench_inference(results, predictor, repeat * 5)
+        bench_history(results, predictor, repeat, sizes)
+        if not args.skip_training:
+            bench_training(results, predictor)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        value = stats.get('median', stats['mean'])
+        print(f"{name:55s} {value:12.3f} {stats['unit']}")
+    print(f"\nResults written to {output}")
+
+
+def compare(old_path, new_path, threshold):
+    """Print the change per benchmark and flag regressions over the threshold"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'benchmark':55s} {old['commit']:>10s} {new['commit']:>10s}   change")
+    regressions = 0
+    for name, stats in new['results'].items():
+        if name not in old['results']:
+            continue
+        before = old['results'][name].get('median', old['results'][name]['mean'])
+        after = stats.get('median', stats['mean'])
+        change = (after - before) / before if before else 0.0
+        # Throughput benchmarks regress when they go down
+        worse = -change if stats['unit'].endswith('/s') else change
+        flag = '  REGRESSION' if worse > threshold else ''
+        regressions += bool(flag)
+        print(f"{name:55s} {before:10.3f} {after:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed calls per benchmark')
+    parser.add_argument('--quick', action='store_true', help='Fewer repeats and history sizes')
+    parser.add_argument('--skip-training', action='store_true', help='Skip the model fit benchmark')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Regression threshold for --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Calendar feature table: one row of date features per day, looked up by day ordinal"""
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Diwali (Lakshmi Puja) and Holi dates; festival flags are 0 outside these years
+DIWALI = {
+    2015: (11, 11), 2016: (10, 30), 2017: (10, 19), 2018: (11, 7), 2019: (10, 27),
+    2020: (11, 14), 2021: (11, 4), 2022: (10, 24), 2023: (11, 12), 2024: (10, 31),
+    2025: (10, 20), 2026: (11, 8), 2027: (10, 29), 2028: (10, 17), 2029: (11, 5),
+    2030: (10, 26),
+}
+HOLI = {
+    2015: (3, 6), 2016: (3, 24), 2017: (3, 13), 2018: (3, 2), 2019: (3, 21),
+    2020: (3, 10), 2021: (3, 29), 2022: (3, 18), 2023: (3, 8), 2024: (3, 25),
+    2025: (3, 14), 2026: (3, 4), 2027: (3, 22), 2028: (3, 11), 2029: (3, 1),
+    2030: (3, 20),
+}
+# Republic Day, Independence Day, Gandhi Jayanti, Christmas
+FIXED_HOLIDAYS = [(1, 26), (8, 15), (10, 2), (12, 25)]
+# Peak stubble-burning weeks (month, day), inclusive
+STUBBLE_SEASON = ((10, 10), (11, 20))
+# Days relative to Diwali night when firecracker smoke lingers
+DIWALI_WINDOW = (-1, 3)
+
+# Episode name (as listed in a city's 'episodes') -> flag column
+EPISODE_COLUMNS = {'stubble_burning': 'is_stubble_burning', 'diwali': 'is_diwali'}
+
+COLUMNS = ['month', 'day_of_week', 'day_of_year', 'is_winter', 'is_monsoon', 'is_summer',
+           'month_sin', 'month_cos', 'dow_sin', 'dow_cos', 'doy_sin', 'doy_cos',
+           'is_stubble_burning', 'is_diwali', 'is_holiday']
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_ordinals(dates):
+    """Day ordinals (date.toordinal) for anything pandas reads as dates"""
+    days = pd.DatetimeIndex(pd.to_datetime(dates)).to_numpy().astype('datetime64[D]').astype(np.int64)
+    return days + EPOCH_ORDINAL
+
+
+class CalendarTable:
+    """Float64 [n_days, len(COLUMNS)] feature array for whole years"""
+
+    def __init__(self, first_year=None, last_year=None):
+        first_year = min(DIWALI) if first_year is None else first_year
+        last_year = max(DIWALI) if last_year is None else last_year
+        dates = pd.date_range(f'{first_year}-01-01', f'{last_year}-12-31', freq='D')
+        self.first_year, self.last_year = first_year, last_year
+        self.first = date(first_year, 1, 1).toordinal()
+        self.last = date(last_year, 12, 31).toordinal()
+
+        month = dates.month.to_numpy()
+        dow = dates.dayofweek.to_numpy()
+        doy = dates.dayofyear.to_numpy()
+        month_day = month * 100 + dates.day.to_numpy()
+        ordinals = np.arange(self.first, self.last + 1)
+
+        diwali = np.zeros(len(dates), dtype=bool)
+        holiday = np.isin(month_day, [m * 100 + d for m, d in FIXED_HOLIDAYS])
+        for year in range(first_year, last_year + 1):
+            if year in DIWALI:
+                night = date(year, *DIWALI[year]).toordinal()
+                diwali |= (ordinals >= night + DIWALI_WINDOW[0]) & (ordinals <= night + DIWALI_WINDOW[1])
+                holiday |= ordinals == night
+            if year in HOLI:
+                holiday |= ordinals == date(year, *HOLI[year]).toordinal()
+        (start_month, start_day), (end_month, end_day) = STUBBLE_SEASON
+        stubble = (month_day >= start_month * 100 + start_day) & (month_day <= end_month * 100 + end_day)
+
+        columns = {
+            'month': month,
+            'day_of_week': dow,
+            'day_of_year': doy,
+            'is_winter': np.isin(month, [11, 12, 1, 2]),
+            'is_monsoon': np.isin(month, [7, 8, 9]),
+            'is_summer': np.isin(month, [4, 5, 6]),
+            'month_sin': np.sin(2 * np.pi * month / 12),
+            'month_cos': np.cos(2 * np.pi * month / 12),
+            'dow_sin': np.sin(2 * np.pi * dow / 7),
+            'dow_cos': np.cos(2 * np.pi * dow / 7),
+            'doy_sin': np.sin(2 * np.pi * doy / 365.25),
+            'doy_cos': np.cos(2 * np.pi * doy / 365.25),
+            'is_stubble_burning': stubble,
+            'is_diwali': diwali,
+            'is_holiday': holiday,
+        }
+        self.values = np.column_stack([columns[name].astype(np.float64) for name in COLUMNS])
+
+    def covers(self, ordinals):
+        return len(ordinals) == 0 or (np.min(ordinals) >= self.first and np.max(ordinals) <= self.last)
+
+    def rows(self, ordinals):
+        """[len(ordinals), len(COLUMNS)] features for in-range day ordinals"""
+        return self.values[np.asarray(ordinals) - self.first]
+
+
+table = CalendarTable()
+lock = threading.Lock()
+
+
+def lookup(ordinals):
+    """Feature rows for day ordinals, widening the table for dates outside it"""
+    global table
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    current = table
+    if not current.covers(ordinals):
+        with lock:
+            current = table
+            if not current.covers(ordinals):
+                first = min(current.first_year, date.fromordinal(int(ordinals.min())).year)
+                last = max(current.last_year, date.fromordinal(int(ordinals.max())).year)
+                current = table = CalendarTable(first, last)
+    return current.rows(ordinals)
+
+
+def excluded_episodes(episodes):
+    """Flag columns to zero for a city with the given episodes (None keeps them all)"""
+    if episodes is None:
+        return []
+    return [column for name, column in EPISODE_COLUMNS.items() if name not in episodes]
+
+
+def calendar_frame(dates, episodes=None):
+    """Calendar features for a column of dates, as a DataFrame on the same index"""
+    index = dates.index if isinstance(dates, pd.Series) else None
+    frame = pd.DataFrame(lookup(to_ordinals(dates)), columns=COLUMNS, index=index)
+    for column in excluded_episodes(episodes):
+        frame[column] = 0.0
+    return frame
+
+
+def calendar_row(target_date, episodes=None):
+    """Calendar features for one date, as a dict"""
+    ordinal = target_date.toordinal()
+    current = table
+    if current.first <= ordinal <= current.last:
+        row = dict(zip(COLUMNS, current.values[ordinal - current.first].tolist()))
+    else:
+        row = dict(zip(COLUMNS, lookup([ordinal])[0].tolist()))
+    for column in excluded_episodes(episodes):
+        row[column] = 0.0
+    return row
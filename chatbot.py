@@ -1,50 +1,175 @@
+import asyncio
+import contextvars
 import re
 from datetime import datetime, timedelta
-from data_fetcher import DataFetcher
+from city_registry import CityRegistry
+from config import Config
+from http_cache import make_etag
 from ml_model import AQIPredictor
+from metrics import metrics
+from scenarios import CATEGORY_THRESHOLDS, PERCENTILES
+from stations import find_area
 import dateparser
 
+ACTIVITY_WORDS = ['run', 'jog', 'exercise', 'workout', 'cycling']
+SAFETY_WORDS = ['safe', 'okay', 'fine', 'good to go']
+PROBABILITY_WORDS = ['chance', 'probability', 'odds', 'how likely', 'likelihood']
+# "above 200", "over 150", "exceed 300"
+THRESHOLD_PATTERN = r'(?:above|over|exceeds?|exceeding|more than|higher than|cross(?:es)?|>)\s*(\d{2,3})'
+# Category names a probability question may use, most specific first
+CATEGORY_WORDS = [('very unhealthy', 'Very Unhealthy'), ('sensitive', 'Unhealthy for Sensitive Groups'),
+                  ('unhealthy', 'Unhealthy'), ('hazardous', 'Hazardous'), ('moderate', 'Moderate')]
+# Intents that parse dates or call a model; the async path runs these on the executor
+MODEL_INTENTS = ('prediction', 'hourly', 'comparison', 'graph', 'probability')
+
 class AQIChatbot:
-    def __init__(self):
-        self.data_fetcher = DataFetcher()
-        self.predictor = AQIPredictor()
+    def __init__(self, city=None, registry=None):
+        self.registry = registry or CityRegistry()
+        self.city = self.registry.resolve_city(city)
+        self.city_name = Config.get_city(self.city)['name']
         self.greetings = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good evening']
-        
-    def process_message(self, message):
-        """Process user message and return response"""
-        message_lower = message.lower().strip()
-        
+    
+    @property
+    def data_fetcher(self):
+        """DataFetcher for this chatbot's city"""
+        return self.registry.get_fetcher(self.city)
+    
+    @property
+    def predictor(self):
+        """Predictor for this chatbot's city, loaded lazily by the registry"""
+        return self.registry.get_predictor(self.city)
+    
+    @property
+    def hourly_predictor(self):
+        """Hourly predictor for this chatbot's city, loaded lazily by the registry
+        
+        None if it is unavailable or scores below HOURLY_MIN_SCORE, so hour
+        questions fall back to the daily model.
+        """
+        try:
+            predictor = self.registry.get_hourly_predictor(self.city)
+        except Exception as e:
+            print(f"Hourly model unavailable for {self.city}: {e}")
+            return None
+        return predictor if predictor.is_reliable() else None
+        
+    def classify_intent(self, message_lower):
+        """Return the intent name for a lower-cased message"""
         # Greetings
         if any(greet in message_lower for greet in self.greetings):
-            return self.get_greeting_response()
+            return 'greeting'
         
         # Help
         if 'help' in message_lower or 'what can you' in message_lower:
-            return self.get_help_response()
+            return 'help'
+        
+        # Chance of exceeding a level ("what's the chance AQI goes above 200
+        # tomorrow?"); checked before current, which matches "what's the"
+        if any(word in message_lower for word in PROBABILITY_WORDS):
+            return 'probability'
+        
+        # A locality with a monitoring station ("AQI in Anand Vihar"); the
+        # model forecasts the city as a whole, so predictions take precedence
+        if self.find_locality(message_lower) and not self.is_prediction_query(message_lower):
+            return 'locality'
         
         # Current AQI
         if self.is_current_query(message_lower):
-            return self.get_current_aqi_response()
+            return 'current'
         
         # Prediction with date parsing
         if self.is_prediction_query(message_lower):
-            target_date = self.extract_date(message)
-            return self.get_prediction_response(target_date)
+            if 'hourly' in message_lower or re.search(r'next\s+\d+\s+hours?', message_lower):
+                return 'hourly'
+            return 'prediction'
         
         # Comparison queries
         if 'compare' in message_lower or 'vs' in message_lower or 'versus' in message_lower:
-            return self.get_comparison_response(message)
+            return 'comparison'
         
         # Trend queries
         if 'trend' in message_lower or 'pattern' in message_lower or 'history' in message_lower:
-            return self.get_trend_response()
+            return 'trend'
         
         # Graph/Chart request
         if any(word in message_lower for word in ['graph', 'chart', 'trend', 'visualization', 'visual', 'show me']):
-            return self.get_graph_response()
+            return 'graph'
         
         # Default - try to understand intent
-        return self.get_smart_response(message)
+        return 'smart'
+    
+    def process_message(self, message, intent=None):
+        """Process user message and return response; intent skips classifying it again"""
+        message_lower = message.lower().strip()
+        intent = intent or self.classify_intent(message_lower)
+        metrics.annotate(intent=intent, city=self.city)
+        
+        with metrics.span('process_message') as span:
+            response = self.dispatch(intent, message, message_lower)
+        
+        # Time not spent in upstream calls, date parsing or the model is
+        # response building
+        metrics.observe('format', span.self_time)
+        return response
+    
+    def dispatch(self, intent, message, message_lower, data=None):
+        """Run the handler for an intent; data is live conditions if already fetched"""
+        if intent == 'greeting':
+            return self.get_greeting_response()
+        if intent == 'help':
+            return self.get_help_response()
+        if intent == 'current':
+            return self.get_current_aqi_response(data)
+        if intent == 'locality':
+            return self.get_locality_response(message_lower, data)
+        if intent == 'hourly':
+            return self.get_hourly_curve_response(message_lower, data)
+        if intent == 'prediction':
+            target_date = self.extract_date(message)
+            return self.get_prediction_response(target_date, hourly='hour' in message_lower, data=data)
+        if intent == 'comparison':
+            return self.get_comparison_response(message, data)
+        if intent == 'probability':
+            return self.get_probability_response(message, data)
+        if intent == 'trend':
+            return self.get_trend_response()
+        if intent == 'graph':
+            return self.get_graph_response(data)
+        return self.get_smart_response(message, data)
+    
+    def needs_live_data(self, intent, message_lower):
+        """Whether answering this intent needs current conditions"""
+        if intent in ('current', 'locality', 'hourly', 'prediction', 'comparison', 'graph', 'probability'):
+            return True
+        if intent == 'smart':
+            return any(word in message_lower for word in ACTIVITY_WORDS + SAFETY_WORDS)
+        return False
+    
+    async def process_message_async(self, message, session, executor):
+        """Process a message without blocking the event loop"""
+        # Upstream calls are awaited on the aiohttp session; the CPU-bound rest
+        # (date parsing, model loading and inference, formatting) runs on the
+        # bounded executor
+        message_lower = message.lower().strip()
+        intent = self.classify_intent(message_lower)
+        metrics.annotate(intent=intent, city=self.city)
+        
+        with metrics.span('process_message') as span:
+            data = None
+            if self.needs_live_data(intent, message_lower):
+                # An empty dict tells the handlers the fetch failed, so they
+                # reply with their error message instead of fetching again
+                data = await self.data_fetcher.get_combined_data_async(session) or {}
+            if intent in MODEL_INTENTS:
+                context = contextvars.copy_context()
+                response = await asyncio.get_running_loop().run_in_executor(
+                    executor, context.run, self.dispatch, intent, message, message_lower, data)
+            else:
+                # Canned replies and formatting only; not worth a thread hop
+                response = self.dispatch(intent, message, message_lower, data)
+        
+        metrics.observe('format', span.self_time)
+        return response
     
     def is_current_query(self, message):
         """Check if query is about current AQI"""
@@ -59,10 +184,19 @@ class AQIChatbot:
                               'coming', 'upcoming', 'ahead', 'aqi on', 'on jan', 'on feb',
                               'on mar', 'on apr', 'on may', 'on jun', 'on jul', 'on aug',
                               'on sep', 'on oct', 'on nov', 'on dec']
+        if re.search(r'in\s+\d+\s+(?:hours?|days?)', message):
+            return True
         return any(keyword in message for keyword in prediction_keywords)
     
     def extract_date(self, message):
         """Extract date from natural language query"""
+        with metrics.span('dateparser'):
+            target_date = self.parse_date(message)
+        metrics.annotate(target_date=target_date)
+        return target_date
+    
+    def parse_date(self, message):
+        """Parse a date from natural language using dateparser and fallbacks"""
         # Use dateparser for natural language date parsing
         parsed_date = dateparser.parse(message, settings={
             'PREFER_DATES_FROM': 'future',
@@ -164,7 +298,7 @@ class AQIChatbot:
     
     def get_greeting_response(self):
         """Return greeting message"""
-        return """Hello! 👋 I'm your Delhi AQI prediction assistant.
+        return f"""Hello! 👋 I'm your {self.city_name} AQI prediction assistant.
 
 I can help you with:
 • Current air quality - "What's the AQI now?"
@@ -176,7 +310,7 @@ Just ask me naturally! 😊"""
     
     def get_help_response(self):
         """Return help message"""
-        return """🤖 Here's what I can understand:
+        return f"""🤖 Here's what I can understand:
 
 **Current AQI:**
 • "What's the current AQI?"
@@ -190,26 +324,35 @@ Just ask me naturally! 😊"""
 • "AQI on December 25"
 • "What's the AQI in 3 days?"
 
+**Localities:**
+• "What's the AQI in Anand Vihar?"
+• "How's the air in Dwarka?"
+
+**Chances:**
+• "What's the chance AQI goes above 200 tomorrow?"
+• "How likely is unhealthy air on Friday?"
+
 **Smart Queries:**
 • "Will the air be good this weekend?"
 • "Should I go for a run tomorrow?"
 • "Is it safe to go outside today?"
 
-Try asking me anything about Delhi's air quality!"""
+Try asking me anything about {self.city_name}'s air quality!"""
     
-    def get_current_aqi_response(self):
+    def get_current_aqi_response(self, data=None):
         """Get current AQI information"""
-        data = self.data_fetcher.get_combined_data()
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
         
         if not data:
             return "Sorry, I couldn't fetch the current AQI data. Please try again later."
         
         aqi = data.get('aqi', 0)
-        category, message = self.predictor.get_aqi_category(aqi)
+        category, message = AQIPredictor.get_aqi_category(aqi)
         
         current_time = datetime.now().strftime('%B %d, %Y at %I:%M %p')
         
-        response = f"📍 **Delhi Air Quality - {current_time}**\n\n"
+        response = f"📍 **{self.city_name} Air Quality - {current_time}**\n\n"
         response += f"📊 **Current AQI**: {aqi:.0f}\n"
         response += f"📈 **Category**: {category}\n"
         response += f"💡 **Health Advice**: {message}\n\n"
@@ -220,14 +363,65 @@ Try asking me anything about Delhi's air quality!"""
         response += f"🔬 PM2.5: {data.get('pm25', 'N/A')}\n"
         response += f"🔬 PM10: {data.get('pm10', 'N/A')}"
         
+        summary = data.get('station_summary')
+        if summary:
+            response += (f"\n\n📡 **Stations**: {summary['stations']} reporting, "
+                         f"{summary['min']:.0f} ({summary['best_area']}) to "
+                         f"{summary['max']:.0f} ({summary['worst_area']})")
+        
         # Add contextual advice
         response += f"\n\n{self.get_contextual_advice(aqi, category)}"
+        response += self.stale_note(data)
         
         return response
     
-    def get_prediction_response(self, target_date=None):
-        """Get AQI prediction for specific date"""
-        data = self.data_fetcher.get_combined_data()
+    def find_locality(self, message_lower):
+        """Area key named in the message, from the stations in the last snapshot"""
+        snapshot = self.data_fetcher.get_snapshot()
+        if not snapshot:
+            return None
+        return find_area(message_lower, snapshot['data'].get('areas'))
+    
+    def get_locality_response(self, message_lower, data=None):
+        """Current AQI at the monitoring stations in one area"""
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
+        
+        areas = (data or {}).get('areas')
+        key = find_area(message_lower, areas)
+        if key is None:
+            return (f"Sorry, I don't have station readings for that area right now. "
+                    f"Ask about {self.city_name} as a whole instead.")
+        
+        area = areas[key]
+        aqi = area['aqi']
+        category, message = AQIPredictor.get_aqi_category(aqi)
+        stations = 'station' if area['stations'] == 1 else 'stations'
+        
+        response = f"📍 **{area['name']}, {self.city_name}**\n\n"
+        response += f"📊 **AQI**: {aqi:.0f} ({area['stations']} {stations})\n"
+        response += f"📈 **Category**: {category}\n"
+        response += f"💡 **Health Advice**: {message}\n"
+        if area.get('pm25') is not None:
+            response += f"🔬 PM2.5: {area['pm25']}\n"
+        
+        summary = data.get('station_summary')
+        if summary and summary['stations'] > 1:
+            difference = aqi - summary['median']
+            if abs(difference) < 5:
+                relative = "about the same as"
+            else:
+                relative = f"{abs(difference):.0f} {'above' if difference > 0 else 'below'}"
+            response += (f"\nThat is {relative} the {self.city_name} median of {summary['median']:.0f} "
+                         f"across {summary['stations']} stations.")
+        
+        response += self.stale_note(data)
+        return response
+    
+    def get_prediction_response(self, target_date=None, hourly=False, data=None):
+        """Get AQI prediction for specific date (or hour, within the hourly horizon)"""
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
         
         if not data:
             return "Sorry, I couldn't fetch data for prediction. Please try again later."
@@ -236,23 +430,36 @@ Try asking me anything about Delhi's air quality!"""
         if target_date is None:
             target_date = datetime.now() + timedelta(days=1)
         
-        days_ahead = (target_date - datetime.now()).days
+        days_ahead = (target_date.date() - datetime.now().date()).days
         hours_ahead = (target_date - datetime.now()).total_seconds() / 3600
         
-        # Use the improved date-specific prediction
-        predicted_aqi = self.predictor.predict_for_date(data, target_date)
+        # Same-day and hour-based questions are answered by the hourly model,
+        # or the daily one when the city has no hourly model
+        use_hourly = (hourly or days_ahead == 0) and \
+            0.5 <= hours_ahead <= Config.HOURLY_MAX_HORIZON
+        hourly_predictor = self.hourly_predictor if use_hourly else None
+        use_hourly = hourly_predictor is not None
+        
+        interval = None
+        if use_hourly:
+            predicted_aqi = hourly_predictor.predict_for_time(data, target_date)
+        else:
+            # Date-specific prediction with its interval, from the forecast table
+            result = self.predictor.get_forecast(data, target_date)
+            predicted_aqi = result['aqi'] if result else None
+            if result and result['lower'] is not None:
+                interval = (result['lower'], result['upper'])
         
         if predicted_aqi is None:
             return "Sorry, prediction failed. Please try again."
         
-        # Reduce uncertainty for better accuracy
-        uncertainty = min(days_ahead * 3, 25)
-        
-        category, health_message = self.predictor.get_aqi_category(predicted_aqi)
+        category, health_message = AQIPredictor.get_aqi_category(predicted_aqi)
         
         # Format the date
-        if days_ahead == 0 and hours_ahead < 24:
-            date_str = f"in {int(hours_ahead)} hours"
+        if use_hourly and hours_ahead < 24:
+            date_str = f"in {max(1, int(round(hours_ahead)))} hours"
+        elif use_hourly:
+            date_str = target_date.strftime('%A at %I %p')
         elif days_ahead == 1:
             date_str = "tomorrow"
         elif days_ahead == 2:
@@ -260,11 +467,11 @@ Try asking me anything about Delhi's air quality!"""
         else:
             date_str = target_date.strftime('%A, %B %d, %Y')
         
-        response = f"🔮 **AQI Prediction for Delhi - {date_str}**\n\n"
+        response = f"🔮 **AQI Prediction for {self.city_name} - {date_str}**\n\n"
         response += f"📊 **Predicted AQI**: {predicted_aqi:.0f}"
         
-        if uncertainty > 5:
-            response += f" (±{uncertainty:.0f})"
+        if interval:
+            response += f" (likely {interval[0]:.0f}–{interval[1]:.0f})"
         
         response += f"\n📈 **Expected Category**: {category}\n"
         response += f"💡 **Health Advice**: {health_message}\n\n"
@@ -281,9 +488,112 @@ Try asking me anything about Delhi's air quality!"""
         
         # Add recommendation
         response += f"\n\n{self.get_activity_recommendation(predicted_aqi, date_str)}"
+        response += self.stale_note(data)
+        
+        return response
+    
+    def extract_threshold(self, message_lower):
+        """AQI level and label a probability question asks about, or (None, None)"""
+        match = re.search(THRESHOLD_PATTERN, message_lower)
+        if match:
+            return int(match.group(1)), f"above {match.group(1)}"
+        for word, category in CATEGORY_WORDS:
+            if word in message_lower:
+                return CATEGORY_THRESHOLDS[category], f"{category} or worse"
+        return None, None
+    
+    def get_probability_response(self, message, data=None):
+        """Chances of exceeding AQI levels on a date, from the scenario ensemble"""
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
+        
+        if not data:
+            return "Sorry, I couldn't fetch data for prediction. Please try again later."
+        
+        message_lower = message.lower()
+        threshold, label = self.extract_threshold(message_lower)
+        # Keep the level out of date parsing ("above 200" is not a year)
+        target_date = self.extract_date(re.sub(THRESHOLD_PATTERN, ' ', message_lower))
+        days_ahead = 1
+        if target_date is not None:
+            days_ahead = max(1, (target_date.date() - datetime.now().date()).days)
+        if days_ahead > Config.FORECAST_WINDOW_DAYS:
+            return f"Sorry, I can only estimate chances up to {Config.FORECAST_WINDOW_DAYS} days ahead."
+        
+        thresholds = dict(CATEGORY_THRESHOLDS)
+        if threshold is not None:
+            thresholds[label] = threshold
+        forecast = self.predictor.get_scenario_forecast(data, days_ahead, thresholds=thresholds)
+        if not forecast:
+            return "Sorry, prediction failed. Please try again."
+        day = forecast[-1]
+        
+        if days_ahead == 1:
+            date_str = "tomorrow"
+        elif days_ahead == 2:
+            date_str = "day after tomorrow"
+        else:
+            date_str = datetime.strptime(day['date'], '%Y-%m-%d').strftime('%A, %B %d, %Y')
+        
+        percentiles = day['percentiles']
+        response = f"🎲 **AQI Chances for {self.city_name} - {date_str}**\n\n"
+        if threshold is not None:
+            response += f"📊 **Chance of AQI {label}**: {day['exceedance'][label]:.0%}\n\n"
+        
+        response += f"**Chance of each level or worse:**\n"
+        for category, threshold_value in CATEGORY_THRESHOLDS.items():
+            response += f"{self.get_aqi_emoji(threshold_value + 1)} {category} (above {threshold_value}): " \
+                        f"{day['exceedance'][category]:.0%}\n"
+        
+        response += f"\n📈 **Most likely**: {percentiles[25]:.0f}–{percentiles[75]:.0f} " \
+                    f"(90% of scenarios between {percentiles[PERCENTILES[0]]:.0f} and {percentiles[PERCENTILES[-1]]:.0f})\n"
+        response += f"🧪 Based on {Config.SCENARIO_COUNT:,} simulated weather and pollution scenarios."
+        response += self.stale_note(data)
         
         return response
     
+    def get_hourly_curve_response(self, message_lower, data=None):
+        """Get the hourly AQI curve for the next N hours"""
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
+        
+        if not data:
+            return "Sorry, I couldn't fetch data for prediction. Please try again later."
+        
+        hours_match = re.search(r'(\d+)\s+hours?', message_lower)
+        n_hours = int(hours_match.group(1)) if hours_match else 48
+        n_hours = max(1, min(n_hours, Config.HOURLY_MAX_HORIZON))
+        
+        hourly_predictor = self.hourly_predictor
+        if hourly_predictor is None:
+            return self.get_prediction_response(data=data)
+        curve = hourly_predictor.predict_next_n_hours(data, n_hours)
+        
+        best = min(curve, key=lambda entry: entry['aqi'])
+        worst = max(curve, key=lambda entry: entry['aqi'])
+        
+        response = f"⏱️ **Hourly AQI Forecast for {self.city_name} - next {n_hours} hours**\n\n"
+        response += f"🟢 **Best hour**: {best['time']} - AQI {best['aqi']:.0f}\n"
+        response += f"🔴 **Worst hour**: {worst['time']} - AQI {worst['aqi']:.0f}\n\n"
+        
+        # Summarise every third hour to keep the reply short
+        for entry in curve[::3]:
+            emoji = self.get_aqi_emoji(entry['aqi'])
+            response += f"{emoji} {entry['time']}: {entry['aqi']:.0f}\n"
+        response += self.stale_note(data)
+        
+        return {
+            'text': response,
+            'graph_data': {'past': [], 'future': curve}
+        }
+    
+    def stale_note(self, data):
+        """Note added to replies built from a saved snapshot instead of live data"""
+        if not data or not data.get('stale'):
+            return ""
+        fetched_at = datetime.fromisoformat(data['fetched_at']).strftime('%I:%M %p on %B %d')
+        return f"\n\n⏳ *Live data is unavailable right now; this uses readings from {fetched_at}.*"
+    
     def get_contextual_advice(self, aqi, category):
         """Get contextual advice based on AQI"""
         if aqi <= 50:
@@ -312,15 +622,18 @@ Try asking me anything about Delhi's air quality!"""
         else:
             return f"⛔ **Recommendation for {date_str}**: Minimize outdoor exposure. Work from home if possible."
     
-    def get_comparison_response(self, message):
+    def get_comparison_response(self, message, data=None):
         """Compare current vs predicted AQI"""
-        current_data = self.data_fetcher.get_combined_data()
+        current_data = self.data_fetcher.get_combined_data() if data is None else data
         
         if not current_data:
             return "Sorry, I couldn't fetch comparison data."
         
         current_aqi = current_data.get('aqi', 0)
-        predicted_aqi = self.predictor.predict(current_data)
+        forecast = self.predictor.get_forecast(current_data, datetime.now() + timedelta(days=1))
+        if not forecast:
+            return "Sorry, prediction failed. Please try again."
+        predicted_aqi = forecast['aqi']
         
         diff = predicted_aqi - current_aqi
         percent_change = (diff / current_aqi) * 100 if current_aqi > 0 else 0
@@ -336,11 +649,12 @@ Try asking me anything about Delhi's air quality!"""
         else:
             response += f"📉 **Trend**: Improving (↓ {abs(diff):.0f} or {percent_change:.1f}%)\n"
         
+        response += self.stale_note(current_data)
         return response
     
     def get_trend_response(self):
         """Get AQI trend information"""
-        return """📊 **Delhi AQI Trends**
+        return f"""📊 **{self.city_name} AQI Trends**
 
 **Seasonal Patterns:**
 🥶 **Winter (Nov-Feb)**: Highest AQI (150-400)
@@ -358,29 +672,33 @@ Try asking me anything about Delhi's air quality!"""
 
 Want a specific date prediction? Just ask!"""
     
-    def get_smart_response(self, message):
+    def get_smart_response(self, message, data=None):
         """Handle miscellaneous queries intelligently"""
         message_lower = message.lower()
         
         # Activity-based queries
-        if any(word in message_lower for word in ['run', 'jog', 'exercise', 'workout', 'cycling']):
-            data = self.data_fetcher.get_combined_data()
+        if any(word in message_lower for word in ACTIVITY_WORDS):
+            if data is None:
+                data = self.data_fetcher.get_combined_data()
             if data:
                 aqi = data.get('aqi', 0)
                 if aqi <= 100:
-                    return f"🏃 Current AQI is {aqi:.0f}. Safe for outdoor exercise! Enjoy your workout!"
+                    reply = f"🏃 Current AQI is {aqi:.0f}. Safe for outdoor exercise! Enjoy your workout!"
                 elif aqi <= 150:
-                    return f"⚠️ Current AQI is {aqi:.0f}. Consider indoor exercise or shorter outdoor sessions."
+                    reply = f"⚠️ Current AQI is {aqi:.0f}. Consider indoor exercise or shorter outdoor sessions."
                 else:
-                    return f"🚫 Current AQI is {aqi:.0f}. Recommend indoor exercise only."
+                    reply = f"🚫 Current AQI is {aqi:.0f}. Recommend indoor exercise only."
+                return reply + self.stale_note(data)
         
         # Safety queries
-        if any(word in message_lower for word in ['safe', 'okay', 'fine', 'good to go']):
-            data = self.data_fetcher.get_combined_data()
+        if any(word in message_lower for word in SAFETY_WORDS):
+            if data is None:
+                data = self.data_fetcher.get_combined_data()
             if data:
                 aqi = data.get('aqi', 0)
-                category, _ = self.predictor.get_aqi_category(aqi)
-                return f"Current AQI: {aqi:.0f} ({category})\n\n{self.get_contextual_advice(aqi, category)}"
+                category, _ = AQIPredictor.get_aqi_category(aqi)
+                return f"Current AQI: {aqi:.0f} ({category})\n\n{self.get_contextual_advice(aqi, category)}" + \
+                    self.stale_note(data)
         
         # Default
         return """I'm not sure I understood that. Try asking:
@@ -391,9 +709,10 @@ Want a specific date prediction? Just ask!"""
 
 Type 'help' to see all I can do!"""
     
-    def get_graph_response(self):
+    def get_graph_response(self, data=None):
         """Generate 7-day past and future AQI graph"""
-        data = self.data_fetcher.get_combined_data()
+        if data is None:
+            data = self.data_fetcher.get_combined_data()
         
         if not data:
             return "Sorry, I couldn't fetch data for the graph. Please try again later."
@@ -402,7 +721,7 @@ Type 'help' to see all I can do!"""
         past_data = self.predictor.get_past_n_days(7)
         
         # Get future 7 days predictions
-        future_data = self.predictor.predict_next_n_days(data, 7)
+        future_data = self.predictor.get_forecast_next_n_days(data, 7)
         
         # Generate graph data for frontend
         graph_data = {
@@ -411,12 +730,12 @@ Type 'help' to see all I can do!"""
         }
         
         # Create text response
-        response = "📊 **14-Day AQI Trend for Delhi**\n\n"
+        response = f"📊 **14-Day AQI Trend for {self.city_name}**\n\n"
         
         response += "**Past 7 Days:**\n"
         if past_data:
             for entry in past_data:
-                category, _ = self.predictor.get_aqi_category(entry['aqi'])
+                category, _ = AQIPredictor.get_aqi_category(entry['aqi'])
                 emoji = self.get_aqi_emoji(entry['aqi'])
                 response += f"{emoji} {entry['day_name'][:3]} ({entry['date']}): {entry['aqi']:.0f} - {category}\n"
         else:
@@ -426,11 +745,13 @@ Type 'help' to see all I can do!"""
         
         response += "**Next 7 Days (Predicted):**\n"
         for entry in future_data:
-            category, _ = self.predictor.get_aqi_category(entry['aqi'])
+            category, _ = AQIPredictor.get_aqi_category(entry['aqi'])
             emoji = self.get_aqi_emoji(entry['aqi'])
-            response += f"{emoji} {entry['day_name'][:3]} ({entry['date']}): {entry['aqi']:.0f} - {category}\n"
+            interval = f" ({entry['lower']:.0f}–{entry['upper']:.0f})" if 'lower' in entry else ""
+            response += f"{emoji} {entry['day_name'][:3]} ({entry['date']}): {entry['aqi']:.0f}{interval} - {category}\n"
         
         response += "\n💡 **Tip**: Type 'predict for [date]' for specific day details!"
+        response += self.stale_note(data)
         
         # Return both text and graph data
         return {
@@ -438,6 +759,17 @@ Type 'help' to see all I can do!"""
             'graph_data': graph_data
         }
     
+    def forecast_validators(self, data):
+        """ETag and Last-Modified time for the forecast built from this snapshot, model and weather grid"""
+        snapshot = self.data_fetcher.get_snapshot() or {}
+        fetched_at = snapshot.get('fetched_at', 0)
+        model_version = self.predictor.model_version
+        weather = self.predictor.weather_forecast
+        # The date is part of the tag because "next 7 days" moves at midnight
+        etag = make_etag(self.city, fetched_at, model_version, weather.updated_at, bool(data.get('stale')),
+                         datetime.now().date().isoformat())
+        return etag, max(fetched_at, model_version, weather.updated_at)
+    
     def get_aqi_emoji(self, aqi):
         """Get emoji based on AQI value"""
         if aqi <= 50:
@@ -471,7 +803,7 @@ Type 'help' to see all I can do!"""
             try:
                 predicted_aqi = self.predictor.predict_for_date(self.current_data, date_match)
                 if predicted_aqi:
-                    category, health_msg = self.predictor.get_aqi_category(predicted_aqi)
+                    category, health_msg = AQIPredictor.get_aqi_category(predicted_aqi)
                     date_str = date_match.strftime('%B %d, %Y')
                     day_name = date_match.strftime('%A')
                     
@@ -0,0 +1,48 @@
+import threading
+import time
+from config import Config
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures, letting one trial call through after a cool-down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.CIRCUIT_RESET_SECONDS
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream right now"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # One trial call decides whether to close again
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record(self, success):
+        """Record the outcome of a call that allow() let through"""
+        with self.lock:
+            if success:
+                if self.state != self.CLOSED:
+                    print(f"Circuit {self.name} closed")
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit {self.name} open after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
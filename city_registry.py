@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from data_fetcher import DataFetcher
+from hourly_model import HourlyAQIPredictor
+from metrics import metrics
+from ml_model import AQIPredictor
+
+class CityRegistry:
+    """City-keyed registry of data fetchers and lazily loaded predictors"""
+
+    def __init__(self, max_memory_mb=None, predictor_factory=None, hourly_factory=None):
+        self.max_memory_bytes = int((max_memory_mb or Config.CITY_CACHE_MAX_MB) * 1024 * 1024)
+        self.factories = {
+            'daily': predictor_factory or AQIPredictor,
+            'hourly': hourly_factory or HourlyAQIPredictor
+        }
+        self.fetchers = {}
+        self.predictors = OrderedDict()  # (city, kind) -> predictor, least recently used first
+        self.footprints = {}  # (city, kind) -> estimated bytes
+        self.lock = threading.RLock()
+        self.loading = {}  # (city, kind) -> Event while a predictor is being loaded
+        self.snapshot_listeners = []  # shared with every fetcher
+        self.refresher = None  # background refresh thread, once started
+
+    def resolve_city(self, city=None):
+        """Normalise a city key, falling back to the default city"""
+        return Config.get_city(city)['key']
+
+    def match_city(self, message):
+        """Find a configured city mentioned in a message"""
+        message_lower = message.lower()
+        for key, city_config in Config.CITIES.items():
+            names = [key, city_config['name'].lower()] + city_config.get('aliases', [])
+            if any(name in message_lower for name in names):
+                return key
+        return None
+
+    def get_fetcher(self, city=None):
+        """Return the DataFetcher for a city (cheap, never evicted)"""
+        key = self.resolve_city(city)
+        with self.lock:
+            if key not in self.fetchers:
+                fetcher = DataFetcher(key)
+                fetcher.listeners = self.snapshot_listeners
+                self.fetchers[key] = fetcher
+            return self.fetchers[key]
+
+    def add_snapshot_listener(self, listener):
+        """Call listener(city, data) whenever any city's fetcher stores a new snapshot"""
+        with self.lock:
+            self.snapshot_listeners.append(listener)
+
+    def get_predictor(self, city=None):
+        """Return the daily predictor for a city, loading it on first use"""
+        return self.get_model(city, 'daily')
+
+    def get_hourly_predictor(self, city=None):
+        """Return the hourly predictor for a city, loading it on first use"""
+        return self.get_model(city, 'hourly')
+
+    def get_model(self, city, kind):
+        """Return a predictor of the given kind for a city, loading it on first use"""
+        key = (self.resolve_city(city), kind)
+
+        while True:
+            with self.lock:
+                if key in self.predictors:
+                    self.predictors.move_to_end(key)
+                    return self.predictors[key]
+
+                event = self.loading.get(key)
+                if event is None:
+                    # This thread loads the model; others wait on the event
+                    event = threading.Event()
+                    self.loading[key] = event
+                    break
+            event.wait()
+
+        try:
+            with metrics.span('model_load'):
+                predictor = self.factories[kind](key[0])
+                footprint = predictor.memory_footprint()
+            with self.lock:
+                self.predictors[key] = predictor
+                self.footprints[key] = footprint
+                self.evict_if_needed(keep=key)
+            print(f"Loaded {kind} model for {key[0]} (~{footprint / 1024 / 1024:.1f} MB)")
+            return predictor
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+            event.set()
+
+    def evict_if_needed(self, keep=None):
+        """Evict least recently used city models until under the memory budget"""
+        with self.lock:
+            for key in list(self.predictors.keys()):
+                if self.memory_usage() <= self.max_memory_bytes:
+                    break
+                if key != keep:
+                    self.evict(*key)
+
+    def evict(self, city, kind=None):
+        """Drop a city's models (or one kind of model) and history from memory"""
+        city = self.resolve_city(city)
+        with self.lock:
+            for key in list(self.predictors.keys()):
+                if key[0] == city and kind in (None, key[1]):
+                    self.predictors.pop(key)
+                    self.footprints.pop(key, None)
+                    print(f"Evicted {key[1]} model for {city}")
+
+    def memory_usage(self):
+        """Estimated bytes held by loaded city models"""
+        with self.lock:
+            return sum(self.footprints.values())
+
+    def loaded_cities(self):
+        """Cities with a model currently in memory, most recently used last"""
+        with self.lock:
+            return list(OrderedDict.fromkeys(city for city, _ in self.predictors))
+
+    def refresh_snapshots(self, cities=None, max_workers=None):
+        """Refresh current conditions for several cities concurrently (default: loaded cities)
+
+        Each city goes through its fetcher's single in-flight refresh, so one
+        already running for a request is not repeated. Returns the cities
+        refreshed.
+        """
+        keys = [self.resolve_city(city) for city in cities] if cities is not None else self.loaded_cities()
+        if not keys:
+            return []
+        workers = max(1, min(max_workers or Config.CITY_REFRESH_WORKERS, len(keys)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [key for key in executor.map(self.refresh_city, keys) if key]
+
+    def refresh_city(self, key):
+        fetcher = self.get_fetcher(key)
+        if not fetcher.start_refresh():
+            return None
+        fetcher.background_refresh()
+        with self.lock:
+            predictor = self.predictors.get((key, 'daily'))
+        snapshot = fetcher.get_snapshot()
+        # Materialize forecasts for loaded cities ahead of requests
+        if predictor is not None and snapshot is not None:
+            predictor.forecast_table.refresh(fetcher.serve(snapshot))
+        return key
+
+    def start_background_refresh(self, interval=None):
+        """Run refresh_snapshots every interval seconds on a daemon thread"""
+        interval = Config.CITY_REFRESH_INTERVAL if interval is None else interval
+        with self.lock:
+            if interval <= 0 or self.refresher is not None:
+                return
+            self.refresher = threading.Thread(target=self.refresh_loop, args=(interval,),
+                                              name='city-refresh', daemon=True)
+        self.refresher.start()
+
+    def refresh_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh_snapshots()
+            except Exception as e:
+                print(f"Error refreshing city snapshots: {e}")
@@ -7,5 +7,204 @@ class Config:
     WAQI_API_KEY = os.getenv('WAQI_API_KEY')
     OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
     DELHI_COORDS = {'lat': 28.6139, 'lon': 77.2090}
+
+    # Upstream API base URLs; point these at loadtest/upstream_stub.py for
+    # load tests
+    WAQI_BASE_URL = os.getenv('WAQI_BASE_URL', 'https://api.waqi.info').rstrip('/')
+    OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org').rstrip('/')
+    OPENAQ_BASE_URL = os.getenv('OPENAQ_BASE_URL', 'https://api.openaq.org').rstrip('/')
+
+    # OpenAQ history is streamed a page at a time into daily accumulators
+    OPENAQ_PAGE_SIZE = int(os.getenv('OPENAQ_PAGE_SIZE', 10000))
+    OPENAQ_MAX_PAGES = int(os.getenv('OPENAQ_MAX_PAGES', 100))
+
     MODEL_PATH = 'models/aqi_model.pkl'
     SCALER_PATH = 'models/scaler.pkl'
+    FEATURE_NAMES_PATH = 'models/feature_names.pkl'
+    HISTORICAL_DATA_PATH = 'data/historical_data.csv'
+    QUANTILE_MODEL_PATH = 'models/aqi_quantile_models.pkl'
+    HOURLY_MODEL_PATH = 'models/aqi_hourly_model.pkl'
+    HOURLY_DATA_PATH = 'data/hourly_data.csv'
+    COMPILED_MODEL_PATH = 'models/aqi_model_compiled.npz'
+    SNAPSHOT_PATH = 'data/snapshot.json'
+    TIMESERIES_PATH = 'data/timeseries.sqlite'
+
+    # Serving engine for the tree models: 'sklearn' calls the fitted
+    # estimators, 'compiled' evaluates the flat-array export from
+    # tree_compiler.py with the scaler folded into the thresholds.
+    INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'compiled').lower()
+
+    # Quantiles trained next to the point model; the outer two bound the
+    # prediction interval shown to users.
+    PREDICTION_QUANTILES = [0.1, 0.5, 0.9]
+
+    # Days ahead materialized in the forecast table on each new conditions
+    # snapshot; dates further out fall back to live inference.
+    FORECAST_WINDOW_DAYS = int(os.getenv('FORECAST_WINDOW_DAYS', 30))
+
+    # OpenWeather 5-day forecast grid, refetched with the live conditions once
+    # older than WEATHER_FORECAST_TTL seconds and averaged per day, supplies
+    # the weather features of future dates it covers; later dates use the
+    # current conditions.
+    WEATHER_FORECAST_ENABLED = os.getenv('WEATHER_FORECAST_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    WEATHER_FORECAST_TTL = float(os.getenv('WEATHER_FORECAST_TTL', 3600))
+
+    # Perturbed weather/pollutant scenarios rolled out per forecast
+    # distribution (percentiles and category exceedance probabilities).
+    SCENARIO_COUNT = int(os.getenv('SCENARIO_COUNT', 2000))
+
+    # Hourly forecasting: longest curve the hourly model predicts directly,
+    # how much hourly history it trains on, and the held-out R² it needs
+    # before hour questions use it instead of the daily model.
+    HOURLY_MAX_HORIZON = int(os.getenv('HOURLY_MAX_HORIZON', 72))
+    HOURLY_TRAINING_DAYS = int(os.getenv('HOURLY_TRAINING_DAYS', 365))
+    HOURLY_MIN_SCORE = float(os.getenv('HOURLY_MIN_SCORE', 0.3))
+
+    # Multi-city deployment. Each city has its own WAQI feed, coordinates,
+    # OpenAQ city name, model files and history. The default city keeps the
+    # original single-city paths above so existing models keep working.
+    # 'bounds' (south, west, north, east) selects the WAQI stations read for
+    # locality answers; a 'stations' list of WAQI station uids overrides it.
+    # 'episodes' lists the recurring pollution episodes in calendar_features
+    # that the city's features flag (stubble_burning, diwali).
+    DEFAULT_CITY = os.getenv('DEFAULT_CITY', 'delhi')
+    CITIES = {
+        'delhi': {'name': 'Delhi', 'waqi_feed': 'delhi', 'openaq_city': 'Delhi',
+                  'coords': DELHI_COORDS, 'aliases': ['new delhi'],
+                  'bounds': [28.40, 76.84, 28.88, 77.35], 'episodes': ['stubble_burning', 'diwali']},
+        'mumbai': {'name': 'Mumbai', 'waqi_feed': 'mumbai', 'openaq_city': 'Mumbai',
+                   'coords': {'lat': 19.0760, 'lon': 72.8777}, 'aliases': ['bombay'],
+                   'bounds': [18.89, 72.77, 19.27, 73.00]},
+        'kolkata': {'name': 'Kolkata', 'waqi_feed': 'kolkata', 'openaq_city': 'Kolkata',
+                    'coords': {'lat': 22.5726, 'lon': 88.3639}, 'aliases': ['calcutta'],
+                    'bounds': [22.45, 88.23, 22.65, 88.45]},
+        'chennai': {'name': 'Chennai', 'waqi_feed': 'chennai', 'openaq_city': 'Chennai',
+                    'coords': {'lat': 13.0827, 'lon': 80.2707}, 'aliases': ['madras'],
+                    'bounds': [12.90, 80.12, 13.23, 80.32]},
+        'bengaluru': {'name': 'Bengaluru', 'waqi_feed': 'bangalore', 'openaq_city': 'Bengaluru',
+                      'coords': {'lat': 12.9716, 'lon': 77.5946}, 'aliases': ['bangalore'],
+                      'bounds': [12.83, 77.46, 13.14, 77.78]},
+        'hyderabad': {'name': 'Hyderabad', 'waqi_feed': 'hyderabad', 'openaq_city': 'Hyderabad',
+                      'coords': {'lat': 17.3850, 'lon': 78.4867}, 'aliases': [],
+                      'bounds': [17.30, 78.30, 17.55, 78.60]},
+        'lucknow': {'name': 'Lucknow', 'waqi_feed': 'lucknow', 'openaq_city': 'Lucknow',
+                    'coords': {'lat': 26.8467, 'lon': 80.9462}, 'aliases': [],
+                    'bounds': [26.75, 80.85, 26.95, 81.05]},
+    }
+
+    # Memory budget for loaded city models; least recently used cities are
+    # evicted once the estimated footprint goes over it. Cities with a loaded
+    # model have their conditions refreshed every CITY_REFRESH_INTERVAL
+    # seconds (0 turns it off), CITY_REFRESH_WORKERS cities at a time.
+    CITY_CACHE_MAX_MB = float(os.getenv('CITY_CACHE_MAX_MB', 512))
+    CITY_REFRESH_INTERVAL = float(os.getenv('CITY_REFRESH_INTERVAL', 300))
+    CITY_REFRESH_WORKERS = int(os.getenv('CITY_REFRESH_WORKERS', 8))
+
+    # Live data resilience: upstream request timeout, circuit breaker (open
+    # after N consecutive failures, retry after the cool-down), and how long a
+    # conditions snapshot is served as fresh. Past the TTL the last good
+    # snapshot (persisted to disk) is served marked stale while a background
+    # refresh runs.
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 5))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', 30))
+    SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', 300))
+
+    # Station-level readings fetched with each snapshot: at most STATION_MAX
+    # stations per city, STATION_WORKERS requests at a time over pooled
+    # connections.
+    STATIONS_ENABLED = os.getenv('STATIONS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    STATION_MAX = int(os.getenv('STATION_MAX', 60))
+    STATION_WORKERS = int(os.getenv('STATION_WORKERS', 16))
+
+    # gzip for /chat and /forecast bodies larger than COMPRESS_MIN_BYTES
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # Async serving mode (async_app.py): threads for CPU-bound work (date
+    # parsing, model calls) and the upstream connection pool size
+    ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', 4))
+    ASYNC_UPSTREAM_CONNECTIONS = int(os.getenv('ASYNC_UPSTREAM_CONNECTIONS', 100))
+
+    # Token-bucket rate limits per client and intent for the Flask app, as
+    # 'intent=rate/burst' pairs with rate in requests per second. Intents
+    # without their own entry share the 'default' bucket. Set
+    # RATE_LIMIT_TRUST_PROXY behind a reverse proxy to key on X-Forwarded-For.
+    # Off by default; the default limits leave room for a chat session in the
+    # bundled UI (one /chat call per message) from a shared address.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    RATE_LIMITS = os.getenv('RATE_LIMITS', 'default=5/60,prediction=2/30,hourly=2/30,'
+                                           'comparison=2/30,probability=1/20,graph=1/20,forecast=2/40')
+    RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', 10000))
+
+    # Query log: each /chat request's intent, target date, latency and
+    # forecast-table hit/miss, batch-written to SQLite by a background thread.
+    QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    QUERY_LOG_PATH = os.getenv('QUERY_LOG_PATH', 'data/query_log.sqlite')
+    QUERY_LOG_BATCH_SIZE = int(os.getenv('QUERY_LOG_BATCH_SIZE', 500))
+    QUERY_LOG_FLUSH_SECONDS = float(os.getenv('QUERY_LOG_FLUSH_SECONDS', 1.0))
+    QUERY_LOG_MAX_QUEUED = int(os.getenv('QUERY_LOG_MAX_QUEUED', 10000))
+
+    # Time-series store: every live snapshot appended to SQLite and rolled up
+    # into hourly and daily means, which past-day lookups and lag features
+    # prefer over the training history.
+    TIMESERIES_ENABLED = os.getenv('TIMESERIES_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    TIMESERIES_ROLLUP_SECONDS = float(os.getenv('TIMESERIES_ROLLUP_SECONDS', 60))
+
+    # Threshold alerts: subscriptions stored in ALERTS_PATH, evaluated against
+    # each new snapshot and the forecast up to ALERT_MAX_HORIZON days ahead.
+    ALERTS_ENABLED = os.getenv('ALERTS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    ALERTS_PATH = os.getenv('ALERTS_PATH', 'data/alerts.sqlite')
+    ALERT_MAX_HORIZON = int(os.getenv('ALERT_MAX_HORIZON', 7))
+
+    # Per-stage latency histograms exposed on /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+    # Opt-in request profiling: a sampled fraction of /chat requests runs under
+    # a profiler ('cprofile' or 'sampling'); requests slower than the threshold
+    # are written to PROFILE_DIR, keeping the newest PROFILE_MAX_FILES.
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_MODE = os.getenv('PROFILE_MODE', 'cprofile')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))
+    PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 500))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+
+    @classmethod
+    def get_city(cls, city=None):
+        """Return the settings for a city key (defaults to DEFAULT_CITY)"""
+        key = (city or cls.DEFAULT_CITY).lower()
+        if key not in cls.CITIES:
+            raise KeyError(f"Unknown city: {city}")
+        return {'key': key, **cls.CITIES[key]}
+
+    @classmethod
+    def get_city_paths(cls, city=None):
+        """Return model and history file paths for a city"""
+        key = cls.get_city(city)['key']
+        if key == cls.DEFAULT_CITY:
+            return {
+                'model': cls.MODEL_PATH,
+                'scaler': cls.SCALER_PATH,
+                'feature_names': cls.FEATURE_NAMES_PATH,
+                'quantile_model': cls.QUANTILE_MODEL_PATH,
+                'compiled_model': cls.COMPILED_MODEL_PATH,
+                'snapshot': cls.SNAPSHOT_PATH,
+                'timeseries': cls.TIMESERIES_PATH,
+                'history': cls.HISTORICAL_DATA_PATH,
+                'hourly_model': cls.HOURLY_MODEL_PATH,
+                'hourly_history': cls.HOURLY_DATA_PATH
+            }
+        return {
+            'model': f'models/{key}/aqi_model.pkl',
+            'scaler': f'models/{key}/scaler.pkl',
+            'feature_names': f'models/{key}/feature_names.pkl',
+            'quantile_model': f'models/{key}/aqi_quantile_models.pkl',
+            'compiled_model': f'models/{key}/aqi_model_compiled.npz',
+            'snapshot': f'data/{key}/snapshot.json',
+            'timeseries': f'data/{key}/timeseries.sqlite',
+            'history': f'data/{key}/historical_data.csv',
+            'hourly_model': f'models/{key}/aqi_hourly_model.pkl',
+            'hourly_history': f'data/{key}/hourly_data.csv'
+        }
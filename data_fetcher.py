@@ -1,57 +1,373 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from circuit_breaker import CircuitBreaker
 from config import Config
+from metrics import metrics
+from stations import by_area, parse_bounds, parse_station_feed, summarize
+from timeseries_store import TimeSeriesStore
+from weather_forecast import get_provider
 
 class DataFetcher:
-    def __init__(self):
+    def __init__(self, city=None):
         self.waqi_key = Config.WAQI_API_KEY
         self.openweather_key = Config.OPENWEATHER_API_KEY
-        self.coords = Config.DELHI_COORDS
+        city_config = Config.get_city(city)
+        self.city = city_config['key']
+        self.city_name = city_config['name']
+        self.waqi_feed = city_config['waqi_feed']
+        self.coords = city_config['coords']
+        self.bounds = city_config.get('bounds')
+        self.station_ids = city_config.get('stations')
+        self.snapshot_path = Config.get_city_paths(self.city)['snapshot']
+        self.timeseries = TimeSeriesStore(self.city)
+        self.weather_forecast = get_provider(self.city)  # refreshed with the snapshot, read by predictors
+        self.listeners = []  # called with (city, data) for every new snapshot
+        self.breakers = {
+            'waqi': CircuitBreaker(f"waqi:{self.city}"),
+            'openweather': CircuitBreaker(f"openweather:{self.city}")
+        }
+        self.snapshot = None  # {'data': ..., 'fetched_at': ...}, loaded from disk on first use
+        self.snapshot_loaded = False
+        self.refreshing = False  # a background refresh is in flight
+        self.refresh_task = None
+        self.lock = threading.Lock()
+        # Keep-alive connections shared by the city and station requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.STATION_WORKERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def get_current_aqi(self):
         """Fetch current AQI from WAQI API"""
+        with metrics.span('waqi'):
+            return self.fetch_current_aqi()
+    
+    def fetch_current_aqi(self):
+        """Request and parse the WAQI city feed"""
+        breaker = self.breakers['waqi']
+        if not breaker.allow():
+            return None
         try:
-            url = f"https://api.waqi.info/feed/delhi/?token={self.waqi_key}"
-            response = requests.get(url)
-            data = response.json()
-            
-            if data['status'] == 'ok':
-                return {
-                    'aqi': data['data']['aqi'],
-                    'pm25': data['data']['iaqi'].get('pm25', {}).get('v', 0),
-                    'pm10': data['data']['iaqi'].get('pm10', {}).get('v', 0),
-                    'o3': data['data']['iaqi'].get('o3', {}).get('v', 0),
-                    'no2': data['data']['iaqi'].get('no2', {}).get('v', 0),
-                    'so2': data['data']['iaqi'].get('so2', {}).get('v', 0),
-                    'co': data['data']['iaqi'].get('co', {}).get('v', 0)
-                }
+            response = self.session.get(self.waqi_url(), timeout=Config.HTTP_TIMEOUT)
+            result = self.parse_aqi(response.json())
         except Exception as e:
             print(f"Error fetching WAQI data: {e}")
+            result = None
+        breaker.record(result is not None)
+        return result
+    
+    def waqi_url(self):
+        return f"{Config.WAQI_BASE_URL}/feed/{self.waqi_feed}/?token={self.waqi_key}"
+    
+    def parse_aqi(self, data):
+        """Pollutant readings from a WAQI feed payload"""
+        if data['status'] == 'ok':
+            return {
+                'aqi': data['data']['aqi'],
+                'pm25': data['data']['iaqi'].get('pm25', {}).get('v', 0),
+                'pm10': data['data']['iaqi'].get('pm10', {}).get('v', 0),
+                'o3': data['data']['iaqi'].get('o3', {}).get('v', 0),
+                'no2': data['data']['iaqi'].get('no2', {}).get('v', 0),
+                'so2': data['data']['iaqi'].get('so2', {}).get('v', 0),
+                'co': data['data']['iaqi'].get('co', {}).get('v', 0)
+            }
+        return None
+    
+    def get_station_data(self):
+        """Current readings from every station in the city, fetched concurrently"""
+        with metrics.span('stations'):
+            return self.fetch_station_data()
+    
+    def fetch_station_data(self):
+        """List the city's stations, then request their feeds over the pooled session"""
+        stations = self.list_stations()
+        if not stations:
+            return None
+        with ThreadPoolExecutor(max_workers=Config.STATION_WORKERS) as pool:
+            readings = list(pool.map(self.fetch_station, stations))
+        return self.merge_stations(stations, readings)
+    
+    def list_stations(self):
+        """Configured station uids, or the stations inside the city's bounds"""
+        if self.station_ids:
+            return [{'uid': uid} for uid in self.station_ids[:Config.STATION_MAX]]
+        if not self.bounds or not self.breakers['waqi'].allow():
             return None
+        try:
+            response = self.session.get(self.bounds_url(), timeout=Config.HTTP_TIMEOUT)
+            stations = parse_bounds(response.json())
+        except Exception as e:
+            print(f"Error listing WAQI stations: {e}")
+            stations = None
+        self.breakers['waqi'].record(stations is not None)
+        return stations[:Config.STATION_MAX] if stations else None
+    
+    def fetch_station(self, station):
+        """One station's feed, behind the WAQI breaker; a station that is down is not a WAQI failure"""
+        breaker = self.breakers['waqi']
+        if not breaker.allow():
+            return None
+        try:
+            response = self.session.get(self.station_url(station['uid']), timeout=Config.HTTP_TIMEOUT)
+            payload = response.json()
+        except Exception as e:
+            print(f"Error fetching WAQI station {station['uid']}: {e}")
+            breaker.record(False)
+            return None
+        breaker.record(True)
+        return parse_station_feed(payload)
+    
+    def bounds_url(self):
+        south, west, north, east = self.bounds
+        return f"{Config.WAQI_BASE_URL}/map/bounds/?latlng={south},{west},{north},{east}&token={self.waqi_key}"
+    
+    def station_url(self, uid):
+        return f"{Config.WAQI_BASE_URL}/feed/@{uid}/?token={self.waqi_key}"
+    
+    def merge_stations(self, stations, readings):
+        """Station list entries with their feed readings, aggregated for the snapshot"""
+        merged = []
+        for station, reading in zip(stations, readings):
+            # The bounds listing names the station; the feed adds pollutants
+            station = {**(reading or {}), **station}
+            if 'area' in station and 'aqi' in station:
+                merged.append(station)
+        if not merged:
+            return None
+        return {'stations': merged, 'areas': by_area(merged), 'station_summary': summarize(merged)}
     
     def get_weather_data(self):
         """Fetch weather data from OpenWeather API"""
+        with metrics.span('openweather'):
+            return self.fetch_weather_data()
+    
+    def fetch_weather_data(self):
+        """Request and parse OpenWeather current conditions"""
+        breaker = self.breakers['openweather']
+        if not breaker.allow():
+            return None
         try:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={self.coords['lat']}&lon={self.coords['lon']}&appid={self.openweather_key}&units=metric"
-            response = requests.get(url)
-            data = response.json()
-            
-            return {
-                'temp': data['main']['temp'],
-                'humidity': data['main']['humidity'],
-                'pressure': data['main']['pressure'],
-                'wind_speed': data['wind']['speed'],
-                'wind_deg': data['wind'].get('deg', 0),
-                'clouds': data['clouds']['all']
-            }
+            response = self.session.get(self.weather_url(), timeout=Config.HTTP_TIMEOUT)
+            result = self.parse_weather(response.json())
         except Exception as e:
             print(f"Error fetching weather data: {e}")
-            return None
+            result = None
+        breaker.record(result is not None)
+        return result
+    
+    def weather_url(self):
+        return f"{Config.OPENWEATHER_BASE_URL}/data/2.5/weather?lat={self.coords['lat']}&lon={self.coords['lon']}&appid={self.openweather_key}&units=metric"
+    
+    def parse_weather(self, data):
+        """Weather conditions from an OpenWeather payload"""
+        return {
+            'temp': data['main']['temp'],
+            'humidity': data['main']['humidity'],
+            'pressure': data['main']['pressure'],
+            'wind_speed': data['wind']['speed'],
+            'wind_deg': data['wind'].get('deg', 0),
+            'clouds': data['clouds']['all']
+        }
     
     def get_combined_data(self):
-        """Combine AQI and weather data"""
+        """Current conditions: cached while fresh, stale-while-revalidate after the TTL"""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return self.refresh_snapshot()
+        if self.is_expired(snapshot) and self.start_refresh():
+            threading.Thread(target=self.background_refresh, daemon=True).start()
+        return self.serve(snapshot)
+    
+    def fetch_combined_data(self):
+        """Fetch AQI and weather data from upstream, and the forecast grid once it expires"""
         aqi_data = self.get_current_aqi()
         weather_data = self.get_weather_data()
+        self.weather_forecast.refresh()
         
         if aqi_data and weather_data:
-            return {**aqi_data, **weather_data}
+            data = {**aqi_data, **weather_data}
+            if Config.STATIONS_ENABLED:
+                data.update(self.get_station_data() or {})
+            return data
         return None
+    
+    def refresh_snapshot(self):
+        """Fetch live data, falling back to the last good snapshot if upstream fails"""
+        data = self.fetch_combined_data()
+        if data:
+            self.store_snapshot(data)
+            return data
+        snapshot = self.get_snapshot()
+        return self.serve(snapshot) if snapshot else None
+    
+    def background_refresh(self):
+        try:
+            data = self.fetch_combined_data()
+            if data:
+                self.store_snapshot(data)
+        finally:
+            with self.lock:
+                self.refreshing = False
+    
+    def start_refresh(self):
+        """Claim the single in-flight background refresh; False if one is running"""
+        with self.lock:
+            if self.refreshing:
+                return False
+            self.refreshing = True
+            return True
+    
+    def get_snapshot(self):
+        """Last good snapshot, read from disk the first time"""
+        if not self.snapshot_loaded:
+            with self.lock:
+                if not self.snapshot_loaded:
+                    self.snapshot = self.load_snapshot()
+                    self.snapshot_loaded = True
+        return self.snapshot
+    
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading snapshot for {self.city}: {e}")
+            return None
+    
+    def store_snapshot(self, data):
+        """Keep the snapshot in memory and persist it for restarts and outages"""
+        snapshot = {'data': data, 'fetched_at': time.time()}
+        with self.lock:
+            self.snapshot = snapshot
+            self.snapshot_loaded = True
+        self.timeseries.append(data, snapshot['fetched_at'])
+        for listener in self.listeners:
+            try:
+                listener(self.city, data)
+            except Exception as e:
+                print(f"Error in snapshot listener for {self.city}: {e}")
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Error saving snapshot for {self.city}: {e}")
+    
+    def is_expired(self, snapshot):
+        return time.time() - snapshot['fetched_at'] > Config.SNAPSHOT_TTL
+    
+    def serve(self, snapshot):
+        """Snapshot data, marked stale (with its fetch time) once past the TTL"""
+        data = dict(snapshot['data'])
+        if self.is_expired(snapshot):
+            data['stale'] = True
+            data['fetched_at'] = datetime.fromtimestamp(snapshot['fetched_at']).isoformat(timespec='minutes')
+        return data
+    
+    async def get_current_aqi_async(self, session):
+        """Fetch current AQI from WAQI without blocking the event loop"""
+        with metrics.span('waqi'):
+            return await self.fetch_json_async(session, 'waqi', self.waqi_url(), self.parse_aqi)
+    
+    async def get_weather_data_async(self, session):
+        """Fetch weather data from OpenWeather without blocking the event loop"""
+        with metrics.span('openweather'):
+            return await self.fetch_json_async(session, 'openweather', self.weather_url(), self.parse_weather)
+    
+    async def fetch_json_async(self, session, upstream, url, parse):
+        breaker = self.breakers[upstream]
+        if not breaker.allow():
+            return None
+        try:
+            timeout = aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
+            async with session.get(url, timeout=timeout) as response:
+                result = parse(await response.json(content_type=None))
+        except Exception as e:
+            print(f"Error fetching {upstream} data: {e!r}")
+            result = None
+        breaker.record(result is not None)
+        return result
+    
+    async def fetch_combined_data_async(self, session):
+        """Fetch AQI, weather and station data (and an expired forecast grid) concurrently"""
+        aqi_data, weather_data, station_data, _ = await asyncio.gather(
+            self.get_current_aqi_async(session),
+            self.get_weather_data_async(session),
+            self.get_station_data_async(session),
+            self.weather_forecast.refresh_async(session)
+        )
+        
+        if aqi_data and weather_data:
+            return {**aqi_data, **weather_data, **(station_data or {})}
+        return None
+    
+    async def get_station_data_async(self, session):
+        """Async get_station_data: station feeds share the session's connection pool"""
+        if not Config.STATIONS_ENABLED:
+            return None
+        with metrics.span('stations'):
+            if self.station_ids:
+                stations = [{'uid': uid} for uid in self.station_ids[:Config.STATION_MAX]]
+            elif self.bounds:
+                stations = await self.fetch_json_async(session, 'waqi', self.bounds_url(), parse_bounds)
+                stations = stations[:Config.STATION_MAX] if stations else None
+            else:
+                stations = None
+            if not stations:
+                return None
+            limit = asyncio.Semaphore(Config.STATION_WORKERS)
+            
+            async def fetch(station):
+                async with limit:
+                    return await self.fetch_station_async(session, station)
+            
+            readings = await asyncio.gather(*[fetch(station) for station in stations])
+            return self.merge_stations(stations, readings)
+    
+    async def fetch_station_async(self, session, station):
+        breaker = self.breakers['waqi']
+        if not breaker.allow():
+            return None
+        try:
+            timeout = aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
+            async with session.get(self.station_url(station['uid']), timeout=timeout) as response:
+                payload = await response.json(content_type=None)
+        except Exception as e:
+            print(f"Error fetching WAQI station {station['uid']}: {e!r}")
+            breaker.record(False)
+            return None
+        breaker.record(True)
+        return parse_station_feed(payload)
+    
+    async def get_combined_data_async(self, session):
+        """Async get_combined_data: cached while fresh, revalidated in a background task"""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            data = await self.fetch_combined_data_async(session)
+            if data:
+                self.store_snapshot(data)
+            return data
+        if self.is_expired(snapshot) and self.start_refresh():
+            self.refresh_task = asyncio.ensure_future(self.background_refresh_async(session))
+        return self.serve(snapshot)
+    
+    async def background_refresh_async(self, session):
+        try:
+            data = await self.fetch_combined_data_async(session)
+            if data:
+                self.store_snapshot(data)
+        finally:
+            with self.lock:
+                self.refreshing = False
@@ -0,0 +1,66 @@
+import threading
+from datetime import datetime, timedelta
+from config import Config
+from metrics import metrics
+
+# Keys DataFetcher adds to a served snapshot that are not readings
+SNAPSHOT_META = ('stale', 'fetched_at')
+
+
+class ForecastTable:
+    """Daily forecasts for the next N days, materialized once per conditions snapshot"""
+
+    def __init__(self, predictor, window_days=None):
+        self.predictor = predictor
+        self.window_days = window_days or Config.FORECAST_WINDOW_DAYS
+        self.entries = {}  # date ordinal -> forecast entry
+        self.snapshot_key = None
+        self.built_on = None  # date the table was built, so it rolls over at midnight
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_snapshot_key(current_data):
+        return tuple(sorted((key, value) for key, value in current_data.items()
+                            if isinstance(value, (int, float, str)) and key not in SNAPSHOT_META))
+
+    def refresh(self, current_data, force=False):
+        """Rebuild the table if the snapshot or the day changed; returns True if rebuilt"""
+        # A changed forecast-weather grid changes the rows for the days it covers
+        key = (self.make_snapshot_key(current_data), self.predictor.weather_forecast.updated_at)
+        today = datetime.now().date()
+        if not force and key == self.snapshot_key and today == self.built_on:
+            return False
+
+        with self.lock:
+            # Another thread may have rebuilt it while this one waited
+            if not force and key == self.snapshot_key and today == self.built_on:
+                return False
+            with metrics.span('forecast_table'):
+                forecasts = self.predictor.predict_next_n_days(current_data, self.window_days)
+            if not forecasts:
+                return False
+            entries = {}
+            for entry in forecasts:
+                entries[datetime.strptime(entry['date'], '%Y-%m-%d').toordinal()] = entry
+            # Swap in the new table in one assignment; readers never see it half-built
+            self.entries = entries
+            self.snapshot_key = key
+            self.built_on = today
+        return True
+
+    def invalidate(self):
+        with self.lock:
+            self.entries = {}
+            self.snapshot_key = None
+            self.built_on = None
+
+    def lookup(self, target_date):
+        """Forecast entry for a date, or None outside the window"""
+        return self.entries.get(target_date.toordinal())
+
+    def next_n_days(self, n_days):
+        """Entries for the next n_days, or None if the window does not cover them"""
+        entries = self.entries
+        start = (datetime.now() + timedelta(days=1)).toordinal()
+        rows = [entries.get(start + i) for i in range(n_days)]
+        return rows if all(rows) else None
@@ -4,12 +4,19 @@ from datetime import datetime, timedelta
 import time
 import os
 from config import Config
+from measurement_accumulator import MeasurementAccumulator, period_keys
+from weather_forecast import WEATHER_COLUMNS, ForecastWeatherProvider
 
 class HistoricalDataFetcher:
-    def __init__(self):
+    def __init__(self, city=None):
         self.waqi_key = Config.WAQI_API_KEY
         self.openweather_key = Config.OPENWEATHER_API_KEY
-        self.coords = Config.DELHI_COORDS
+        city_config = Config.get_city(city)
+        self.city = city_config['key']
+        self.waqi_feed = city_config['waqi_feed']
+        self.openaq_city = city_config['openaq_city']
+        self.coords = city_config['coords']
+        self.history_path = Config.get_city_paths(self.city)['history']
         
     def fetch_waqi_historical(self, days=1095):
         """Fetch historical AQI data from WAQI (last 3 years = ~1095 days)"""
@@ -17,10 +24,10 @@ class HistoricalDataFetcher:
         data_list = []
         
         # WAQI provides historical data through their API
-        url = f"https://api.waqi.info/feed/delhi/?token={self.waqi_key}"
+        url = f"{Config.WAQI_BASE_URL}/feed/{self.waqi_feed}/?token={self.waqi_key}"
         
         try:
-            response = requests.get(url)
+            response = requests.get(url, timeout=Config.HTTP_TIMEOUT)
             data = response.json()
             
             if data['status'] == 'ok' and 'data' in data:
@@ -57,8 +64,8 @@ class HistoricalDataFetcher:
         # Get current and forecast
         try:
             # Current weather
-            current_url = f"https://api.openweathermap.org/data/2.5/weather?lat={self.coords['lat']}&lon={self.coords['lon']}&appid={self.openweather_key}&units=metric"
-            response = requests.get(current_url)
+            current_url = f"{Config.OPENWEATHER_BASE_URL}/data/2.5/weather?lat={self.coords['lat']}&lon={self.coords['lon']}&appid={self.openweather_key}&units=metric"
+            response = requests.get(current_url, timeout=Config.HTTP_TIMEOUT)
             current = response.json()
             
             data_list.append({
@@ -72,21 +79,9 @@ class HistoricalDataFetcher:
             })
             
             # 5-day forecast
-            forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?lat={self.coords['lat']}&lon={self.coords['lon']}&appid={self.openweather_key}&units=metric"
-            response = requests.get(forecast_url)
-            forecast = response.json()
-            
-            if 'list' in forecast:
-                for item in forecast['list']:
-                    data_list.append({
-                        'timestamp': item['dt_txt'],
-                        'temp': item['main']['temp'],
-                        'humidity': item['main']['humidity'],
-                        'pressure': item['main']['pressure'],
-                        'wind_speed': item['wind']['speed'],
-                        'wind_deg': item['wind'].get('deg', 0),
-                        'clouds': item['clouds']['all']
-                    })
+            steps = ForecastWeatherProvider(self.city).fetch_steps()
+            if steps is not None:
+                data_list.extend(steps[['timestamp', *WEATHER_COLUMNS]].to_dict('records'))
             
             print(f"Fetched {len(data_list)} weather records")
         except Exception as e:
@@ -94,79 +89,92 @@ class HistoricalDataFetcher:
         
         return pd.DataFrame(data_list) if data_list else None
     
-    def fetch_from_openaq(self, days=1095):
-        """Fetch data from OpenAQ API (free historical data)"""
+    def iter_openaq_chunks(self, days=1095):
+        """Yield OpenAQ measurements one page at a time, as DataFrames"""
         print("Fetching data from OpenAQ...")
-        data_list = []
         
         # OpenAQ provides free historical air quality data
-        base_url = "https://api.openaq.org/v2/measurements"
+        base_url = f"{Config.OPENAQ_BASE_URL}/v2/measurements"
         
         date_to = datetime.now()
         date_from = date_to - timedelta(days=days)
         
         params = {
-            'city': 'Delhi',
+            'city': self.openaq_city,
             'country': 'IN',
             'date_from': date_from.strftime('%Y-%m-%d'),
             'date_to': date_to.strftime('%Y-%m-%d'),
-            'limit': 10000,
+            'limit': Config.OPENAQ_PAGE_SIZE,
             'page': 1
         }
         
-        try:
-            response = requests.get(base_url, params=params)
-            data = response.json()
+        total = 0
+        while params['page'] <= Config.OPENAQ_MAX_PAGES:
+            try:
+                response = requests.get(base_url, params=params, timeout=Config.HTTP_TIMEOUT * 6)
+                results = response.json().get('results', [])
+            except Exception as e:
+                print(f"Error fetching OpenAQ data: {e}")
+                break
             
-            if 'results' in data:
-                for result in data['results']:
-                    data_list.append({
-                        'date': result['date']['utc'],
-                        'parameter': result['parameter'],
-                        'value': result['value'],
-                        'unit': result['unit'],
-                        'location': result['location']
-                    })
-                
-                print(f"Fetched {len(data_list)} OpenAQ records")
-        except Exception as e:
-            print(f"Error fetching OpenAQ data: {e}")
+            if results:
+                total += len(results)
+                yield pd.DataFrame({
+                    'date': [result['date']['utc'] for result in results],
+                    'parameter': [result['parameter'] for result in results],
+                    'value': [result['value'] for result in results],
+                    'unit': [result['unit'] for result in results],
+                    'location': [result['location'] for result in results]
+                })
+            # A short page is the last one
+            if len(results) < params['limit']:
+                break
+            params['page'] += 1
         
-        return pd.DataFrame(data_list) if data_list else None
+        print(f"Fetched {total} OpenAQ records")
     
-    def prepare_training_data(self):
-        """Prepare and merge all historical data"""
+    def fetch_from_openaq(self, days=1095):
+        """Fetch data from OpenAQ API (free historical data)"""
+        chunks = list(self.iter_openaq_chunks(days))
+        return pd.concat(chunks, ignore_index=True) if chunks else None
+    
+    def prepare_training_data(self, freq='D'):
+        """Prepare and merge all historical data, per day (or per hour with freq='h')
+        
+        Measurements are averaged into per-period accumulators a page at a
+        time, so memory does not grow with the number of measurements.
+        """
         print("Preparing training data...")
         
-        # Fetch from multiple sources
-        openaq_data = self.fetch_from_openaq()
-        weather_data = self.fetch_openweather_historical()
+        # Process OpenAQ data
+        pollutants = MeasurementAccumulator(freq)
+        for chunk in self.iter_openaq_chunks():
+            pollutants.add_long(period_keys(chunk['date'], freq), chunk['parameter'], chunk['value'])
+        combined = pollutants.means()
         
-        if openaq_data is None or len(openaq_data) == 0:
+        if len(combined) == 0:
             print("No historical data available, generating enhanced synthetic data...")
             return self.generate_enhanced_synthetic_data()
         
-        # Process OpenAQ data
-        openaq_pivot = openaq_data.pivot_table(
-            index='date',
-            columns='parameter',
-            values='value',
-            aggfunc='mean'
-        ).reset_index()
-        
-        # Merge with weather data if available
+        # Merge with weather data if available, on the integer period key
+        weather_data = self.fetch_openweather_historical()
         if weather_data is not None and len(weather_data) > 0:
-            weather_data['date'] = pd.to_datetime(weather_data['timestamp']).dt.date.astype(str)
-            weather_agg = weather_data.groupby('date').mean(numeric_only=True)
-            
-            combined = pd.merge(openaq_pivot, weather_agg, on='date', how='inner')
-        else:
-            combined = openaq_pivot
+            weather = MeasurementAccumulator(freq)
+            weather.add_wide(period_keys(weather_data['timestamp'], freq), weather_data)
+            combined = combined.join(weather.means(), how='inner')
+            if len(combined) == 0:
+                print("No days with both measurements and weather, generating enhanced synthetic data...")
+                return self.generate_enhanced_synthetic_data()
+        
+        combined.insert(0, 'date', pollutants.to_dates(combined.index))
+        if 'pm25' in combined.columns and 'aqi' not in combined.columns:
+            combined['aqi'] = combined['pm25'].map(self.calculate_aqi_from_pm25)
+        combined = combined.reset_index(drop=True)
         
         # Save raw data
-        os.makedirs('data', exist_ok=True)
-        combined.to_csv('data/historical_data.csv', index=False)
-        print(f"Saved {len(combined)} records to data/historical_data.csv")
+        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+        combined.to_csv(self.history_path, index=False)
+        print(f"Saved {len(combined)} records to {self.history_path}")
         
         return combined
     
@@ -232,8 +240,8 @@ class HistoricalDataFetcher:
             })
         
         df = pd.DataFrame(data)
-        os.makedirs('data', exist_ok=True)
-        df.to_csv('data/historical_data.csv', index=False)
+        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+        df.to_csv(self.history_path, index=False)
         print(f"Generated {len(df)} synthetic records with Delhi patterns")
         
         return df
@@ -0,0 +1,92 @@
+"""Compact in-memory daily history: serving columns as float32 on a sorted date index"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from config import Config
+
+# Columns kept for serving and their dtypes; float32 holds AQI and
+# concentrations to well under 0.01
+HISTORY_SCHEMA = {
+    'aqi': np.float32,
+    'pm25': np.float32,
+}
+
+
+def compact_history(df):
+    """Frame indexed by date with only the serving columns, in compact dtypes"""
+    dates = pd.to_datetime(df['date']).dt.normalize().to_numpy()
+
+    # One row per date (the last one wins), sorted, so lookups can binary
+    # search the index without pandas building a hash table over it
+    order = np.argsort(dates, kind='stable')
+    dates = dates[order]
+    keep = np.append(dates[1:] != dates[:-1], True)
+    rows = order[keep]
+
+    columns = {name: df[name].to_numpy(dtype=dtype)[rows]
+               for name, dtype in HISTORY_SCHEMA.items() if name in df.columns}
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(dates[keep], name='date'))
+
+
+def lookup_dates(history, dates, column):
+    """Values of a column on the given dates (float64), NaN where missing"""
+    dates = pd.DatetimeIndex(dates).to_numpy()
+    values = np.full(len(dates), np.nan)
+    if history is None or len(history) == 0 or column not in history.columns:
+        return values
+    index = history.index.to_numpy()
+    pos = np.minimum(np.searchsorted(index, dates), len(index) - 1)
+    found = index[pos] == dates
+    values[found] = history[column].to_numpy()[pos[found]]
+    return values
+
+
+def load_history(path):
+    """Read a history CSV straight into the compact layout"""
+    usecols = lambda name: name == 'date' or name in HISTORY_SCHEMA
+    return compact_history(pd.read_csv(path, usecols=usecols))
+
+
+def column_bytes(df):
+    """Bytes per column (and the index) of a DataFrame"""
+    usage = df.memory_usage(deep=True, index=True)
+    return {('(index)' if name == 'Index' else name): int(size) for name, size in usage.items()}
+
+
+def memory_report(before, after):
+    """Text table of bytes per column before and after compaction"""
+    before_bytes = column_bytes(before)
+    after_bytes = column_bytes(after)
+    lines = [f"{'column':24s} {'dtype before':>14s} {'bytes before':>13s} {'dtype after':>12s} {'bytes after':>12s}"]
+    for name in dict.fromkeys(list(before_bytes) + list(after_bytes)):
+        dtype_before = str(before[name].dtype) if name in before.columns else ('index' if name == '(index)' else '-')
+        dtype_after = str(after[name].dtype) if name in after.columns else ('index' if name == '(index)' else '-')
+        lines.append(f"{name:24s} {dtype_before:>14s} {before_bytes.get(name, 0):13,d} "
+                     f"{dtype_after:>12s} {after_bytes.get(name, 0):12,d}")
+    total_before, total_after = sum(before_bytes.values()), sum(after_bytes.values())
+    lines.append(f"{'total':24s} {'':>14s} {total_before:13,d} {'':>12s} {total_after:12,d}  "
+                 f"({total_before / max(total_after, 1):.1f}x smaller)")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show history memory use before and after compaction')
+    parser.add_argument('--city', default=None, help='City key (default: DEFAULT_CITY)')
+    args = parser.parse_args()
+
+    path = Config.get_city_paths(args.city)['history']
+    if not os.path.exists(path):
+        raise SystemExit(f"No history at {path}")
+
+    # The frame the predictor used to hold: every CSV column as float64
+    before = pd.read_csv(path)
+    before['date'] = pd.to_datetime(before['date'])
+
+    print(f"{path}: {len(before)} rows\n")
+    print(memory_report(before, load_history(path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+import joblib
+import os
+import pickle
+import threading
+from datetime import datetime, timedelta
+from config import Config
+from historical_data_fetcher import HistoricalDataFetcher
+from metrics import metrics
+from timeseries_store import TimeSeriesStore
+from tree_compiler import CompiledEnsemble
+
+# Typical Delhi diurnal pattern, relative to the daily mean: peaks during the
+# morning and late-evening traffic hours, lowest in the afternoon when mixing
+# height and wind disperse pollutants.
+DIURNAL_PROFILE = np.array([
+    1.10, 1.08, 1.05, 1.02, 1.00, 1.02,   # 00-05
+    1.08, 1.15, 1.20, 1.15, 1.02, 0.92,   # 06-11
+    0.85, 0.80, 0.78, 0.80, 0.86, 0.95,   # 12-17
+    1.05, 1.14, 1.18, 1.17, 1.14, 1.12    # 18-23
+])
+DIURNAL_PROFILE = DIURNAL_PROFILE / DIURNAL_PROFILE.mean()
+
+HOURLY_COLUMNS = ['aqi', 'pm25', 'pm10', 'temp', 'humidity', 'wind_speed']
+# Days with fewer observed hours would be biased towards the hours they cover
+MIN_HOURS_PER_DAY = 18
+
+
+def to_hour_key(timestamp):
+    """Hours since the Unix epoch for a datetime"""
+    return int(pd.Timestamp(timestamp).floor('h').value // 3_600_000_000_000)
+
+
+def from_hour_key(hour_key):
+    """Datetime for an hour key"""
+    return datetime(1970, 1, 1) + timedelta(hours=int(hour_key))
+
+
+class HourlyStore:
+    """Hourly observations kept as sorted hour keys plus one float array per column
+
+    Request threads append live readings while others look values up; the
+    lock keeps the keys and column arrays in step.
+    """
+
+    def __init__(self, hour_keys=None, columns=None):
+        self.hour_keys = np.asarray(hour_keys if hour_keys is not None else [], dtype=np.int64)
+        # float32 is plenty for readings and halves the store's footprint
+        self.columns = {name: np.asarray(values, dtype=np.float32)
+                        for name, values in (columns or {}).items()}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hour_keys)
+
+    @classmethod
+    def from_daily(cls, daily_df, seed=42):
+        """Upsample daily history to hourly values using the diurnal profile"""
+        dates = pd.to_datetime(daily_df['date']).values.astype('datetime64[D]').astype(np.int64)
+        n_days = len(dates)
+        hour_keys = (np.repeat(dates * 24, 24) + np.tile(np.arange(24), n_days)).astype(np.int64)
+
+        rng = np.random.default_rng(seed)
+        profile = np.tile(DIURNAL_PROFILE, n_days)
+        columns = {}
+        for name in HOURLY_COLUMNS:
+            if name not in daily_df.columns:
+                continue
+            values = np.repeat(daily_df[name].to_numpy(dtype=np.float64), 24)
+            if name in ('aqi', 'pm25', 'pm10'):
+                # Pollutants follow the diurnal profile with some hour-to-hour noise
+                values = values * profile * rng.normal(1.0, 0.05, len(values))
+            elif name == 'temp':
+                values = values + 4 * np.sin(2 * np.pi * (np.tile(np.arange(24), n_days) - 9) / 24)
+            columns[name] = values
+
+        order = np.argsort(hour_keys, kind='stable')
+        return cls(hour_keys[order], {name: values[order] for name, values in columns.items()})
+
+    @classmethod
+    def load(cls, path):
+        """Load an hourly store from CSV with a 'timestamp' column"""
+        df = pd.read_csv(path)
+        timestamps = pd.to_datetime(df['timestamp']).values.astype('datetime64[h]').astype(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        columns = {name: df[name].to_numpy(dtype=np.float64)[order]
+                   for name in HOURLY_COLUMNS if name in df.columns}
+        return cls(timestamps[order], columns)
+
+    def save(self, path):
+        """Write the store to CSV"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = pd.DataFrame(self.columns)
+        df.insert(0, 'timestamp', self.hour_keys.astype('datetime64[h]').astype('datetime64[s]'))
+        df.to_csv(path, index=False)
+
+    def append(self, timestamp, values):
+        """Add or replace the reading for one hour"""
+        key = to_hour_key(timestamp)
+        with self.lock:
+            if not self.columns:
+                self.columns = {name: np.full(len(self.hour_keys), np.nan, dtype=np.float32)
+                                for name in HOURLY_COLUMNS if name in values}
+            idx = np.searchsorted(self.hour_keys, key)
+            if idx < len(self.hour_keys) and self.hour_keys[idx] == key:
+                for name, value in values.items():
+                    if name in self.columns:
+                        self.columns[name][idx] = value
+                return
+
+            self.hour_keys = np.insert(self.hour_keys, idx, key)
+            for name in self.columns:
+                self.columns[name] = np.insert(self.columns[name], idx, values.get(name, np.nan))
+
+    def merge(self, hour_keys, columns):
+        """Add or replace readings for many hours; NaN values keep what is already stored"""
+        hour_keys = np.asarray(hour_keys, dtype=np.int64)
+        if len(hour_keys) == 0:
+            return
+        with self.lock:
+            merged_keys = np.union1d(self.hour_keys, hour_keys)
+            old = np.searchsorted(merged_keys, self.hour_keys)
+            new = np.searchsorted(merged_keys, hour_keys)
+            merged = {}
+            for name in set(self.columns) | set(columns):
+                values = np.full(len(merged_keys), np.nan, dtype=np.float32)
+                if name in self.columns:
+                    values[old] = self.columns[name]
+                if name in columns:
+                    known = ~np.isnan(columns[name])
+                    values[new[known]] = columns[name][known]
+                merged[name] = values
+            self.hour_keys, self.columns = merged_keys, merged
+
+    def to_daily(self, min_hours=1):
+        """Daily means with a single bincount pass per column, for days with min_hours of AQI"""
+        with self.lock:
+            hour_keys, columns = self.hour_keys, dict(self.columns)
+        if len(hour_keys) == 0:
+            return pd.DataFrame(columns=['date'] + list(columns))
+
+        day_keys = hour_keys // 24
+        unique_days, inverse = np.unique(day_keys, return_inverse=True)
+        daily = {'date': unique_days.astype('datetime64[D]').astype('datetime64[ns]')}
+        counts = {}
+        for name, values in columns.items():
+            valid = ~np.isnan(values)
+            sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(unique_days))
+            counts[name] = np.bincount(inverse[valid], minlength=len(unique_days))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                daily[name] = sums / counts[name]
+        df = pd.DataFrame(daily)
+        if 'aqi' in counts:
+            df = df[counts['aqi'] >= min_hours].reset_index(drop=True)
+        return df
+
+    def window(self, column, end_key, n_hours):
+        """Values for the n_hours ending at end_key (inclusive), NaN where missing"""
+        wanted = np.arange(end_key - n_hours + 1, end_key + 1, dtype=np.int64)
+        return self.lookup(column, wanted)
+
+    def lookup(self, column, hour_keys):
+        """Values at the given hour keys, NaN where missing"""
+        hour_keys = np.asarray(hour_keys, dtype=np.int64)
+        values = np.full(len(hour_keys), np.nan)
+        with self.lock:
+            if len(self.hour_keys) == 0 or column not in self.columns:
+                return values
+            idx = np.searchsorted(self.hour_keys, hour_keys)
+            idx_clipped = np.minimum(idx, len(self.hour_keys) - 1)
+            found = self.hour_keys[idx_clipped] == hour_keys
+            values[found] = self.columns[column][idx_clipped[found]]
+        return values
+
+
+class HourlyAQIPredictor:
+    """Direct multi-horizon hourly model: one row per lead hour, one predict call per curve"""
+
+    def __init__(self, city=None):
+        self.city = Config.get_city(city)['key']
+        self.paths = Config.get_city_paths(self.city)
+        self.model = None
+        self.scaler = None
+        self.store = None
+        self.compiled = None
+        self.test_score = None  # R² on the held-out hours
+        self.max_horizon = Config.HOURLY_MAX_HORIZON
+        self.feature_names = ['lead_hours', 'hour_sin', 'hour_cos', 'day_of_week',
+                              'month', 'is_winter', 'is_monsoon',
+                              'aqi_lag0', 'aqi_lag1h', 'aqi_lag3h', 'aqi_lag24h',
+                              'aqi_same_hour', 'aqi_rolling_mean_24h',
+                              'pm25', 'temp', 'humidity', 'wind_speed']
+        self.load_or_create_model()
+        if self.model is None:
+            # Raise rather than hand the registry a predictor it would cache
+            raise ValueError(f"No hourly data to train the {self.city} hourly model")
+        if not self.is_reliable():
+            print(f"Hourly model for {self.city} scores R² {self.test_score:.2f} on held-out hours, "
+                  f"below HOURLY_MIN_SCORE; hour questions use the daily model")
+        self.compile_model()
+
+    def is_reliable(self):
+        """Whether the model beats HOURLY_MIN_SCORE on held-out hours"""
+        return self.test_score is not None and self.test_score >= Config.HOURLY_MIN_SCORE
+
+    def load_or_create_model(self):
+        """Load the hourly model and store, training if needed"""
+        self.store = self.load_store()
+
+        if os.path.exists(self.paths['hourly_model']):
+            bundle = joblib.load(self.paths['hourly_model'])
+            self.model = bundle['model']
+            self.scaler = bundle['scaler']
+            self.feature_names = bundle['feature_names']
+            self.max_horizon = bundle['max_horizon']
+            # Models saved before the score was kept are scored on the store now
+            self.test_score = bundle.get('test_score')
+            if self.test_score is None:
+                self.test_score = self.evaluate()
+            print(f"Hourly model loaded successfully for {self.city}")
+        else:
+            self.train()
+
+    def compile_model(self):
+        """Flatten the hourly model for the compiled engine (small enough to do in memory)"""
+        self.compiled = None
+        if Config.INFERENCE_ENGINE != 'compiled' or self.model is None:
+            return
+        try:
+            self.compiled = CompiledEnsemble.from_sklearn(self.model, self.scaler)
+        except Exception as e:
+            print(f"Error compiling hourly model, falling back to sklearn: {e}")
+
+    def load_store(self):
+        """Hourly history with the time-series store's hourly rollups merged in"""
+        store = self.load_history()
+        store.merge(*TimeSeriesStore(self.city).hourly_values(HOURLY_COLUMNS))
+        return store
+
+    def load_history(self):
+        """Load hourly history, deriving it from daily history when absent"""
+        if os.path.exists(self.paths['hourly_history']):
+            return HourlyStore.load(self.paths['hourly_history'])
+
+        print("No hourly history found, deriving it from daily history...")
+        if os.path.exists(self.paths['history']):
+            daily = pd.read_csv(self.paths['history'])
+        else:
+            # A city whose daily model has not been trained yet
+            daily = HistoricalDataFetcher(self.city).prepare_training_data()
+        if daily is None or len(daily) == 0:
+            return HourlyStore()
+
+        store = HourlyStore.from_daily(daily)
+        store.save(self.paths['hourly_history'])
+        return store
+
+    def build_features(self, origin_key, lead_hours, current_data=None):
+        """Feature matrix for forecasts made at origin_key for each lead hour"""
+        lead_hours = np.asarray(lead_hours, dtype=np.int64)
+        target_keys = origin_key + lead_hours
+        n = len(lead_hours)
+        current_data = current_data or {}
+
+        def origin_value(column, offset):
+            return self.store.lookup(column, [origin_key - offset])[0]
+
+        origin_hour = int(origin_key % 24)
+        history = self.store.window('aqi', origin_key, 24)
+        lag0 = current_data.get('aqi', origin_value('aqi', 0))
+        if np.any(~np.isnan(history)):
+            rolling_mean = np.nanmean(history)
+        else:
+            rolling_mean = lag0 / DIURNAL_PROFILE[origin_hour]
+
+        def aqi_lag(offset):
+            # Missing hours are estimated from the daily level and diurnal profile
+            value = origin_value('aqi', offset)
+            if np.isnan(value):
+                value = rolling_mean * DIURNAL_PROFILE[(origin_hour - offset) % 24]
+            return value
+
+        # Same hour on the latest observed day before the origin
+        days_back = (lead_hours + 23) // 24
+        same_hour = self.store.lookup('aqi', target_keys - days_back * 24)
+        same_hour = np.where(np.isnan(same_hour), rolling_mean * DIURNAL_PROFILE[target_keys % 24], same_hour)
+
+        target_times = pd.to_datetime(target_keys, unit='h')
+        hours = target_times.hour.to_numpy()
+        months = target_times.month.to_numpy()
+
+        columns = {
+            'lead_hours': lead_hours,
+            'hour_sin': np.sin(2 * np.pi * hours / 24),
+            'hour_cos': np.cos(2 * np.pi * hours / 24),
+            'day_of_week': target_times.dayofweek.to_numpy(),
+            'month': months,
+            'is_winter': np.isin(months, [11, 12, 1, 2]).astype(int),
+            'is_monsoon': np.isin(months, [7, 8, 9]).astype(int),
+            'aqi_lag0': np.full(n, lag0),
+            'aqi_lag1h': np.full(n, aqi_lag(1)),
+            'aqi_lag3h': np.full(n, aqi_lag(3)),
+            'aqi_lag24h': np.full(n, aqi_lag(24)),
+            'aqi_same_hour': same_hour,
+            'aqi_rolling_mean_24h': np.full(n, rolling_mean),
+        }
+        for name in ['pm25', 'temp', 'humidity', 'wind_speed']:
+            columns[name] = np.full(n, current_data.get(name, origin_value(name, 0)))
+
+        X = np.column_stack([columns[name] for name in self.feature_names]).astype(np.float64)
+        # Fall back to the rolling mean where an hourly lag is missing
+        return np.where(np.isnan(X), rolling_mean, X)
+
+    def training_rows(self, origin_stride=24):
+        """(X, y) for origins through the hourly store, in time order; None without data"""
+        if len(self.store) == 0 or 'aqi' not in self.store.columns:
+            return None
+
+        end_key = self.store.hour_keys[-1]
+        start_key = max(self.store.hour_keys[0] + 24, end_key - Config.HOURLY_TRAINING_DAYS * 24)
+        origins = np.arange(start_key, end_key - self.max_horizon, origin_stride)
+        leads = np.arange(1, self.max_horizon + 1)
+
+        X_parts, y_parts = [], []
+        for origin_key in origins:
+            X_parts.append(self.build_features(origin_key, leads))
+            y_parts.append(self.store.lookup('aqi', origin_key + leads))
+        if not X_parts:
+            return None
+        X = np.vstack(X_parts)
+        y = np.concatenate(y_parts)
+        mask = ~np.isnan(y)
+        return X[mask], y[mask]
+
+    def evaluate(self):
+        """R² of the loaded model on the held-out hours, or None without data"""
+        rows = self.training_rows()
+        if rows is None:
+            return None
+        X, y = rows
+        split_idx = int(len(X) * 0.8)
+        return float(self.model.score(self.scaler.transform(X[split_idx:]), y[split_idx:]))
+
+    def train(self):
+        """Train the direct multi-horizon model from the hourly store"""
+        print("Training hourly model...")
+        rows = self.training_rows()
+        if rows is None:
+            print("Error: No hourly data available for training")
+            return
+        X, y = rows
+        print(f"Training hourly model with {len(X)} rows")
+
+        # Time-ordered split: rows are grouped by origin
+        split_idx = int(len(X) * 0.8)
+        self.scaler = StandardScaler()
+        X_train = self.scaler.fit_transform(X[:split_idx])
+        X_test = self.scaler.transform(X[split_idx:])
+
+        self.model = GradientBoostingRegressor(
+            n_estimators=150,
+            max_depth=5,
+            min_samples_leaf=5,
+            learning_rate=0.05,
+            subsample=0.8,
+            random_state=42,
+            loss='huber',
+            alpha=0.9
+        )
+        self.model.fit(X_train, y[:split_idx])
+        print(f"Hourly training R² score: {self.model.score(X_train, y[:split_idx]):.4f}")
+        self.test_score = float(self.model.score(X_test, y[split_idx:]))
+        print(f"Hourly testing R² score: {self.test_score:.4f}")
+
+        os.makedirs(os.path.dirname(self.paths['hourly_model']), exist_ok=True)
+        joblib.dump({
+            'model': self.model,
+            'scaler': self.scaler,
+            'feature_names': self.feature_names,
+            'max_horizon': self.max_horizon,
+            'test_score': self.test_score
+        }, self.paths['hourly_model'])
+        self.compile_model()
+        print("Hourly model trained and saved successfully")
+
+    def origin_key(self):
+        """Forecast origin: the current hour"""
+        return to_hour_key(datetime.now())
+
+    def predict_next_n_hours(self, current_data, n_hours=48):
+        """Predict the hourly AQI curve for the next n_hours in one batched call"""
+        n_hours = max(1, min(int(n_hours), self.max_horizon))
+        origin_key = self.origin_key()
+        leads = np.arange(1, n_hours + 1)
+
+        # Keep the live reading so later forecasts get real hourly lags
+        if current_data and 'aqi' in current_data and not current_data.get('stale'):
+            self.store.append(from_hour_key(origin_key), current_data)
+
+        with metrics.span('features'):
+            X = self.build_features(origin_key, leads, current_data)
+            if self.compiled is None:
+                X = self.scaler.transform(X)
+        with metrics.span('model'):
+            model = self.compiled if self.compiled is not None else self.model
+            values = np.clip(model.predict(X), 30, 500)
+
+        curve = []
+        for lead, value in zip(leads, values):
+            target_time = from_hour_key(origin_key + lead)
+            curve.append({
+                'time': target_time.strftime('%Y-%m-%d %H:00'),
+                'day_name': target_time.strftime('%A'),
+                'label': target_time.strftime('%Hh'),
+                'hour': target_time.hour,
+                'aqi': round(float(value), 1)
+            })
+        return curve
+
+    def predict_for_time(self, current_data, target_time):
+        """Predict AQI for a specific hour within the hourly horizon"""
+        lead = max(1, to_hour_key(target_time) - self.origin_key())
+        if lead > self.max_horizon:
+            return None
+        return self.predict_next_n_hours(current_data, lead)[-1]['aqi']
+
+    def memory_footprint(self):
+        """Estimate bytes held by the model and hourly store"""
+        total = 0
+        if self.model is not None:
+            total += len(pickle.dumps(self.model, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.compiled is not None:
+            total += self.compiled.nbytes()
+        if self.store is not None:
+            total += self.store.hour_keys.nbytes + sum(v.nbytes for v in self.store.columns.values())
+        return total
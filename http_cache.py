@@ -0,0 +1,50 @@
+import gzip
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from config import Config
+
+
+def make_etag(*parts):
+    """ETag from the values a response was built from
+
+    Weak, because the gzip and identity encodings of a response share it.
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(headers, etag, last_modified):
+    """Whether a conditional request can be answered with 304 Not Modified"""
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison: W/"x" matches "x"
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag.removeprefix('W/') in tags
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def accepts_gzip(headers):
+    return 'gzip' in headers.get('Accept-Encoding', '').lower()
+
+
+def should_compress(headers, body, content_type):
+    """Compress text and JSON bodies above the size threshold for gzip-capable clients"""
+    if len(body) < Config.COMPRESS_MIN_BYTES or not accepts_gzip(headers):
+        return False
+    return content_type.startswith(('application/json', 'text/'))
+
+
+def gzip_body(body):
+    return gzip.compress(body, compresslevel=Config.COMPRESS_LEVEL)
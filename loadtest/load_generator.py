@@ -0,0 +1,130 @@
+"""Concurrent load generator for the /chat endpoint"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# intent -> (weight, messages); weights roughly follow what users ask most
+MESSAGE_MIX = {
+    'current': (30, ["what's the aqi now?", 'air quality right now', 'how is the air today?']),
+    'prediction': (30, ['what will the aqi be tomorrow?', 'predict aqi for friday',
+                        'aqi in 3 days', 'air quality next week', 'aqi on december 25']),
+    'hourly': (8, ['aqi in 5 hours', 'hourly forecast for the next 48 hours']),
+    'graph': (10, ['show me a graph', 'chart of aqi']),
+    'comparison': (5, ['compare air quality vs yesterday']),
+    'smart': (10, ['should I go for a run?', 'is it safe outside?']),
+    'greeting': (4, ['hello', 'hey there']),
+    'help': (3, ['help']),
+}
+
+
+def pick_message(rng):
+    intents = list(MESSAGE_MIX)
+    weights = [MESSAGE_MIX[intent][0] for intent in intents]
+    intent = rng.choices(intents, weights=weights)[0]
+    return intent, rng.choice(MESSAGE_MIX[intent][1])
+
+
+def worker(url, deadline, max_requests, counter, results, lock, timeout, seed, city):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        with lock:
+            if max_requests and counter[0] >= max_requests:
+                return
+            counter[0] += 1
+
+        intent, message = pick_message(rng)
+        payload = {'message': message}
+        if city:
+            payload['city'] = city
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/chat", json=payload, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        latency = time.perf_counter() - start
+        with lock:
+            results.append((intent, latency, status))
+
+
+def percentiles(latencies):
+    values = np.asarray(latencies) * 1000
+    return {
+        'count': int(len(values)),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max())
+    }
+
+
+def report(results, elapsed):
+    """Throughput and latency percentiles overall and per intent"""
+    summary = {
+        'elapsed_s': elapsed,
+        'requests': len(results),
+        'throughput_rps': len(results) / elapsed if elapsed else 0.0,
+        'errors': sum(1 for _, _, status in results if status != 200),
+        'overall': percentiles([latency for _, latency, _ in results]) if results else {},
+        'intents': {}
+    }
+    for intent in MESSAGE_MIX:
+        rows = [(latency, status) for name, latency, status in results if name == intent]
+        if rows:
+            stats = percentiles([latency for latency, _ in rows])
+            stats['errors'] = sum(1 for _, status in rows if status != 200)
+            stats['throughput_rps'] = len(rows) / elapsed
+            summary['intents'][intent] = stats
+    return summary
+
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s, {summary['errors']} errors)\n")
+    print(f"{'intent':12s} {'count':>7s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+    rows = list(summary['intents'].items())
+    if summary['overall']:
+        rows.append(('ALL', {**summary['overall'], 'throughput_rps': summary['throughput_rps'],
+                             'errors': summary['errors']}))
+    for intent, stats in rows:
+        print(f"{intent:12s} {stats['count']:7d} {stats['throughput_rps']:8.1f} {stats['p50_ms']:9.1f} "
+              f"{stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f} {stats['errors']:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive /chat with a realistic message mix')
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the app')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests (0 = no limit)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--city', help='Send this city with every request')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    results, counter, lock = [], [0], threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for i in range(args.concurrency):
+            executor.submit(worker, args.url.rstrip('/'), deadline, args.requests, counter,
+                            results, lock, args.timeout, args.seed + i, args.city)
+    elapsed = time.perf_counter() - start
+
+    summary = report(results, elapsed)
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
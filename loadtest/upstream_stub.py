@@ -0,0 +1,149 @@
+"""Local stand-in for the WAQI, OpenWeather and OpenAQ endpoints used by the fetchers"""
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from flask import Flask, jsonify, request
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(LOADTEST_DIR), 'benchmarks', 'fixtures')
+
+
+class UpstreamBehaviour:
+    """Latency, failure and payload settings shared by all stub endpoints"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, hang_rate=0.0,
+                 hang_ms=30000.0, vary=0.0, fixtures_dir=DEFAULT_FIXTURES):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+        self.vary = vary
+        self.payloads = {}
+        for name in os.listdir(fixtures_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(fixtures_dir, name)) as f:
+                    self.payloads[name[:-len('.json')]] = json.load(f)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def delay(self):
+        """Sleep for the configured latency; occasionally hang much longer"""
+        if self.hang_rate and random.random() < self.hang_rate:
+            time.sleep(self.hang_ms / 1000)
+            return
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self):
+        return self.error_rate and random.random() < self.error_rate
+
+    def jitter(self, value):
+        if not self.vary or not isinstance(value, (int, float)):
+            return value
+        return round(value * random.uniform(1 - self.vary, 1 + self.vary), 1)
+
+    def count(self, endpoint, failed):
+        with self.lock:
+            key = f"{endpoint}{'.error' if failed else ''}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def create_app(behaviour):
+    app = Flask(__name__)
+
+    def respond(endpoint, build_payload, error_payload, error_status=500):
+        behaviour.delay()
+        failed = bool(behaviour.should_fail())
+        behaviour.count(endpoint, failed)
+        if failed:
+            return jsonify(error_payload), error_status
+        return jsonify(build_payload())
+
+    @app.route('/feed/<path:feed>/')
+    @app.route('/feed/<path:feed>')
+    def waqi_feed(feed):
+        def build():
+            payload = copy.deepcopy(behaviour.payloads['waqi_feed'])
+            data = payload['data']
+            data['aqi'] = behaviour.jitter(data['aqi'])
+            for reading in data['iaqi'].values():
+                reading['v'] = behaviour.jitter(reading['v'])
+            data['city']['name'] = feed.strip('/').title()
+            return payload
+        # WAQI reports most errors with HTTP 200 and status "error"
+        return respond('waqi', build, {'status': 'error', 'data': 'Over quota'}, 200)
+
+    @app.route('/map/bounds/')
+    @app.route('/map/bounds')
+    def waqi_bounds():
+        def build():
+            payload = copy.deepcopy(behaviour.payloads['waqi_bounds'])
+            for station in payload['data']:
+                if station['aqi'] != '-':
+                    station['aqi'] = str(behaviour.jitter(float(station['aqi'])))
+            return payload
+        return respond('waqi.bounds', build, {'status': 'error', 'data': 'Over quota'}, 200)
+
+    @app.route('/data/2.5/weather')
+    def openweather_weather():
+        def build():
+            payload = copy.deepcopy(behaviour.payloads['openweather_weather'])
+            payload['main']['temp'] = behaviour.jitter(payload['main']['temp'])
+            payload['main']['humidity'] = behaviour.jitter(payload['main']['humidity'])
+            payload['wind']['speed'] = behaviour.jitter(payload['wind']['speed'])
+            payload['coord'] = {'lat': float(request.args.get('lat', 0)), 'lon': float(request.args.get('lon', 0))}
+            return payload
+        return respond('openweather.weather', build, {'cod': 500, 'message': 'Internal error'})
+
+    @app.route('/data/2.5/forecast')
+    def openweather_forecast():
+        return respond('openweather.forecast', lambda: behaviour.payloads['openweather_forecast'],
+                       {'cod': 500, 'message': 'Internal error'})
+
+    @app.route('/v2/measurements')
+    def openaq_measurements():
+        def build():
+            payload = copy.deepcopy(behaviour.payloads['openaq_measurements'])
+            limit = int(request.args.get('limit', 100))
+            page = int(request.args.get('page', 1))
+            results = payload['results'][(page - 1) * limit:page * limit]
+            payload['results'] = results
+            payload['meta'].update({'page': page, 'limit': limit})
+            return payload
+        return respond('openaq', build, {'message': 'Internal Server Error'})
+
+    @app.route('/_stats')
+    def stats():
+        with behaviour.lock:
+            return jsonify(dict(behaviour.counts))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local WAQI/OpenWeather/OpenAQ stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mean added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Uniform +/- latency jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Fraction of requests that hang')
+    parser.add_argument('--hang-ms', type=float, default=30000.0, help='How long a hanging request takes')
+    parser.add_argument('--vary', type=float, default=0.0,
+                        help='Relative jitter applied to readings, e.g. 0.1 for +/-10%%')
+    parser.add_argument('--fixtures-dir', default=DEFAULT_FIXTURES, help='Directory with payload JSON files')
+    args = parser.parse_args()
+
+    behaviour = UpstreamBehaviour(args.latency_ms, args.jitter_ms, args.error_rate, args.hang_rate,
+                                  args.hang_ms, args.vary, args.fixtures_dir)
+    create_app(behaviour).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
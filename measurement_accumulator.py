@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Integer period keys: days or hours since the Unix epoch
+FREQ_UNITS = {'D': 'datetime64[D]', 'h': 'datetime64[h]'}
+
+
+def period_keys(timestamps, freq='D'):
+    """Integer day (or hour) keys for ISO timestamps, in UTC"""
+    parsed = pd.to_datetime(pd.Series(timestamps), utc=True, format='ISO8601')
+    return parsed.dt.tz_localize(None).to_numpy().astype(FREQ_UNITS[freq]).astype(np.int64)
+
+
+class MeasurementAccumulator:
+    """Running per-period sums and counts for each measured column
+
+    Measurements are added a chunk at a time and never kept, so memory is
+    one (sum, count) pair per period and column however many rows stream
+    through.
+    """
+
+    def __init__(self, freq='D'):
+        self.freq = freq
+        self.columns = {}  # column name -> row in sums/counts
+        self.base = None  # key of the first slot
+        self.sums = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def _ensure(self, keys, n_columns):
+        """Grow the arrays to cover keys and n_columns"""
+        low, high = int(keys.min()), int(keys.max())
+        if self.base is None:
+            self.base = low
+        new_base = min(self.base, low)
+        size = max(self.base + self.sums.shape[1], high + 1) - new_base
+        rows = max(n_columns, self.sums.shape[0])
+        if new_base == self.base and size == self.sums.shape[1] and rows == self.sums.shape[0]:
+            return
+        sums = np.zeros((rows, size))
+        counts = np.zeros((rows, size), dtype=np.int64)
+        offset = self.base - new_base
+        old_rows, old_size = self.sums.shape
+        sums[:old_rows, offset:offset + old_size] = self.sums
+        counts[:old_rows, offset:offset + old_size] = self.counts
+        self.base, self.sums, self.counts = new_base, sums, counts
+
+    def add(self, keys, column, values):
+        """Add values of one column at the given period keys; NaNs are skipped"""
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(values)
+        keys, values = keys[valid], values[valid]
+        if len(keys) == 0:
+            return
+        row = self.columns.setdefault(column, len(self.columns))
+        self._ensure(keys, len(self.columns))
+        slots = keys - self.base
+        size = self.sums.shape[1]
+        self.sums[row] += np.bincount(slots, weights=values, minlength=size)
+        self.counts[row] += np.bincount(slots, minlength=size)
+
+    def add_long(self, keys, columns, values):
+        """Add a chunk in long format (one row per key, column name and value)"""
+        columns = np.asarray(columns)
+        for column in pd.unique(columns):
+            mask = columns == column
+            self.add(np.asarray(keys)[mask], column, np.asarray(values)[mask])
+
+    def add_wide(self, keys, frame):
+        """Add every numeric column of a chunk in wide format"""
+        for column in frame.select_dtypes('number').columns:
+            self.add(keys, column, frame[column].to_numpy())
+
+    def means(self):
+        """Per-period means indexed by integer key, for periods with any data"""
+        if self.base is None:
+            return pd.DataFrame()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts
+        means[self.counts == 0] = np.nan
+        keys = np.arange(self.base, self.base + self.sums.shape[1])
+        frame = pd.DataFrame(means.T, index=pd.Index(keys, name='key'), columns=list(self.columns))
+        return frame[self.counts.any(axis=0)]
+
+    def to_dates(self, index):
+        """Timestamps for integer period keys"""
+        return pd.to_datetime(np.asarray(index).astype(FREQ_UNITS[self.freq]))
@@ -0,0 +1,161 @@
+import bisect
+import contextvars
+import threading
+import time
+from config import Config
+
+# Latency buckets in seconds, from sub-millisecond model calls to slow upstreams
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """Timing span; records its duration and tracks time spent in child spans"""
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self.child_time = 0.0
+        self.duration = 0.0
+
+    @property
+    def self_time(self):
+        return max(0.0, self.duration - self.child_time)
+
+    def __enter__(self):
+        stack = self.metrics.stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        stack = self.metrics.stack()
+        # Concurrent async spans may finish out of order, so remove this
+        # span rather than whatever is on top
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        if self.parent is not None:
+            self.parent.child_time += self.duration
+        self.metrics.observe(self.stage, self.duration)
+        return False
+
+
+class NullSpan:
+    """No-op span used while metrics are disabled"""
+    self_time = 0.0
+    duration = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """Per-stage, per-intent latency histograms with a Prometheus text exporter"""
+
+    def __init__(self, enabled=None, buckets=DEFAULT_BUCKETS):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.buckets = tuple(buckets)
+        self.histograms = {}  # (stage, intent) -> Histogram
+        self.lock = threading.Lock()
+        # Per-request state lives in context variables so it follows a request
+        # across threads (copied context) and asyncio tasks
+        self.stack_var = contextvars.ContextVar('metrics_stack', default=None)
+        self.annotations_var = contextvars.ContextVar('metrics_annotations', default=None)
+
+    def stack(self):
+        stack = self.stack_var.get()
+        if stack is None:
+            stack = []
+            self.stack_var.set(stack)
+        return stack
+
+    def begin_request(self):
+        """Reset per-request state for the current thread or task"""
+        self.stack_var.set([])
+        self.annotations_var.set({})
+
+    def annotate(self, **values):
+        """Attach request details (intent, target date, ...) to the current request"""
+        annotations = self.annotations_var.get()
+        if annotations is None:
+            annotations = {}
+            self.annotations_var.set(annotations)
+        annotations.update(values)
+
+    def annotations(self):
+        """Details attached to the current request"""
+        return dict(self.annotations_var.get() or {})
+
+    def span(self, stage):
+        """Context manager timing one stage of the current request"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    def observe(self, stage, seconds, intent=None):
+        """Record a duration for a stage, labelled with the request's intent"""
+        if not self.enabled:
+            return
+        if intent is None:
+            intent = (self.annotations_var.get() or {}).get('intent', 'unknown')
+        key = (stage, intent)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def render_prometheus(self):
+        """Render all histograms in the Prometheus text exposition format"""
+        name = 'aqi_stage_duration_seconds'
+        lines = [
+            f'# HELP {name} Time spent per request stage, by intent.',
+            f'# TYPE {name} histogram'
+        ]
+        with self.lock:
+            items = sorted(self.histograms.items())
+            snapshot = [(key, list(h.counts), h.sum, h.count) for key, h in items]
+
+        for (stage, intent), counts, total, count in snapshot:
+            labels = f'stage="{stage}",intent="{intent}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared instance used by the app, chatbot, fetchers and predictors
+metrics = Metrics()
@@ -5,12 +5,26 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 import joblib
 import os
+import pickle
 from datetime import datetime, timedelta
+from calendar_features import calendar_frame, calendar_row
 from config import Config
 from historical_data_fetcher import HistoricalDataFetcher
+from forecast_table import ForecastTable
+from history import compact_history, load_history, lookup_dates
+from hourly_model import MIN_HOURS_PER_DAY, HourlyStore
+from metrics import metrics
+from rollout import Rollout, history_features
+from scenarios import ScenarioEnsemble, apply_seasonal_adjustment, central_draws
+from timeseries_store import COLUMNS as TIMESERIES_COLUMNS, TimeSeriesStore
+from tree_compiler import CompiledEnsemble, load_compiled, save_compiled
+from weather_forecast import get_provider
 
 class AQIPredictor:
-    def __init__(self):
+    def __init__(self, city=None):
+        self.city = Config.get_city(city)['key']
+        self.paths = Config.get_city_paths(self.city)
+        self.episodes = Config.get_city(self.city).get('episodes', [])  # pollution episodes flagged in features
         self.model = None
         self.scaler = None
         self.feature_names = ['temp', 'humidity', 'pressure', 'wind_speed', 
@@ -20,33 +34,42 @@ class AQIPredictor:
                               'temp_pm25_interaction', 'wind_pm_interaction']
         self.historical_data = None
         self.recent_aqi_values = []  # Store recent AQI values for lag features
-        self.feature_names_path = 'models/feature_names.pkl'  # Store feature names
+        self.timeseries = TimeSeriesStore(self.city)  # daily rollups of live readings
+        self.weather_forecast = get_provider(self.city)  # forecast weather for future dates, shared with the fetcher
+        self.feature_names_path = self.paths['feature_names']  # Store feature names
+        self.quantile_models = None  # {'quantiles', 'models', 'margin'} for prediction intervals
+        self.compiled = None  # (point, quantile list) when INFERENCE_ENGINE is 'compiled'
+        self.forecast_table = ForecastTable(self)
         self.load_or_create_model()
+        self.compile_models()
+        self.model_version = self.get_model_version()
     
     def load_or_create_model(self):
         """Load existing model or create a new one"""
-        os.makedirs('models', exist_ok=True)
+        os.makedirs(os.path.dirname(self.paths['model']), exist_ok=True)
         
-        if os.path.exists(Config.MODEL_PATH) and os.path.exists(Config.SCALER_PATH):
-            self.model = joblib.load(Config.MODEL_PATH)
-            self.scaler = joblib.load(Config.SCALER_PATH)
+        if os.path.exists(self.paths['model']) and os.path.exists(self.paths['scaler']):
+            self.model = joblib.load(self.paths['model'])
+            self.scaler = joblib.load(self.paths['scaler'])
             
             # Load feature names if available
             if os.path.exists(self.feature_names_path):
                 self.feature_names = joblib.load(self.feature_names_path)
             
-            print("Model loaded successfully")
+            if os.path.exists(self.paths['quantile_model']):
+                self.quantile_models = joblib.load(self.paths['quantile_model'])
+            else:
+                print("Quantile models not found; retrain to enable prediction intervals")
+            
+            print(f"Model loaded successfully for {self.city}")
             print(f"Loaded features: {self.feature_names}")
             
             # Load historical data for trend analysis
-            if os.path.exists('data/historical_data.csv'):
-                self.historical_data = pd.read_csv('data/historical_data.csv')
-                if 'date' in self.historical_data.columns:
-                    self.historical_data['date'] = pd.to_datetime(self.historical_data['date'])
-                    # Store last 14 days of AQI for lag features
-                    recent = self.historical_data.tail(14)
-                    if 'aqi' in recent.columns:
-                        self.recent_aqi_values = recent['aqi'].tolist()
+            if os.path.exists(self.paths['history']):
+                self.historical_data = load_history(self.paths['history'])
+                # Store last 14 days of AQI for lag features
+                if 'aqi' in self.historical_data.columns:
+                    self.recent_aqi_values = self.historical_data['aqi'].tail(14).tolist()
         else:
             self.train_model_with_real_data()
     
@@ -54,22 +77,10 @@ class AQIPredictor:
         """Add temporal features for better predictions"""
         if date_col in df.columns:
             df['date'] = pd.to_datetime(df['date'])
-            df['month'] = df['date'].dt.month
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['day_of_year'] = df['date'].dt.dayofyear
-            
-            # Seasonal indicators
-            df['is_winter'] = df['month'].isin([11, 12, 1, 2]).astype(int)
-            df['is_monsoon'] = df['month'].isin([7, 8, 9]).astype(int)
-            df['is_summer'] = df['month'].isin([4, 5, 6]).astype(int)
-            
-            # Cyclical encoding for month (captures seasonality better)
-            df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-            df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-            
-            # Cyclical encoding for day of week
-            df['dow_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-            df['dow_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
+            # Calendar, season and episode columns from the precomputed table
+            calendar = calendar_frame(df['date'], self.episodes)
+            for column in calendar.columns:
+                df[column] = calendar[column]
         
         return df
     
@@ -107,14 +118,15 @@ class AQIPredictor:
         print("Training model with enhanced features...")
         
         # Load historical data
-        if os.path.exists('data/historical_data.csv'):
+        if os.path.exists(self.paths['history']):
             print("Loading existing historical data...")
-            df = pd.read_csv('data/historical_data.csv')
+            df = pd.read_csv(self.paths['history'])
         else:
             print("Fetching historical data...")
-            fetcher = HistoricalDataFetcher()
+            fetcher = HistoricalDataFetcher(self.city)
             df = fetcher.prepare_training_data()
         
+        df = self.add_observed_days(df)
         if df is None or len(df) == 0:
             print("Error: No data available for training")
             return
@@ -132,8 +144,9 @@ class AQIPredictor:
         if 'date' in df.columns:
             print(f"Date range: {df['date'].min()} to {df['date'].max()}")
         
-        # Store historical data
-        self.historical_data = df.copy()
+        # Store a compact copy of the history for serving
+        if 'date' in df.columns:
+            self.historical_data = compact_history(df)
         
         # Store recent AQI values
         if 'aqi' in df.columns:
@@ -144,6 +157,8 @@ class AQIPredictor:
                               'wind_deg', 'clouds', 'pm25', 'pm10', 'o3', 
                               'no2', 'so2', 'co', 'month', 'day_of_week', 
                               'is_winter', 'is_monsoon', 'day_of_year',
+                              'doy_sin', 'doy_cos', 'is_stubble_burning',
+                              'is_diwali', 'is_holiday',
                               'temp_pm25_interaction', 'wind_pm_interaction',
                               'aqi_lag1', 'aqi_lag3', 'aqi_lag7',
                               'aqi_rolling_mean_7', 'aqi_rolling_std_7']
@@ -205,6 +220,9 @@ class AQIPredictor:
         print(f"Training R² score: {train_score:.4f}")
         print(f"Testing R² score: {test_score:.4f}")
         
+        # Quantile models for prediction intervals
+        self.train_quantile_models(X_train_scaled, y_train, X_test_scaled, y_test)
+        
         # Feature importance
         importance = pd.DataFrame({
             'feature': self.feature_names,
@@ -214,12 +232,100 @@ class AQIPredictor:
         print(importance.head(10))
         
         # Save model, scaler, and feature names
-        joblib.dump(self.model, Config.MODEL_PATH)
-        joblib.dump(self.scaler, Config.SCALER_PATH)
+        joblib.dump(self.model, self.paths['model'])
+        joblib.dump(self.scaler, self.paths['scaler'])
         joblib.dump(self.feature_names, self.feature_names_path)
+        joblib.dump(self.quantile_models, self.paths['quantile_model'])
+        self.compile_models(export=True)
+        self.forecast_table.invalidate()
+        self.model_version = self.get_model_version()
         print("\nModel trained and saved successfully")
         print(f"Feature names saved: {self.feature_names}")
     
+    def add_observed_days(self, df):
+        """Append daily means of the live hourly readings for days the history lacks"""
+        observed = HourlyStore(*self.timeseries.hourly_values(TIMESERIES_COLUMNS)).to_daily(MIN_HOURS_PER_DAY)
+        if len(observed) == 0:
+            return df
+        if df is None or len(df) == 0 or 'date' not in df.columns:
+            return observed
+        dates = pd.to_datetime(df['date'])
+        observed = observed[~observed['date'].isin(dates)]
+        if len(observed) == 0:
+            return df
+        print(f"Adding {len(observed)} days of live readings to the history")
+        df = pd.concat([df.assign(date=dates), observed], ignore_index=True)
+        return df.sort_values('date', kind='stable').reset_index(drop=True)
+    
+    def train_quantile_models(self, X_train, y_train, X_test, y_test):
+        """Train quantile models and calibrate the interval on the test split"""
+        quantiles = sorted(Config.PREDICTION_QUANTILES)
+        print(f"Training quantile models for {quantiles}...")
+        
+        models = []
+        for q in quantiles:
+            model = GradientBoostingRegressor(
+                n_estimators=200,
+                max_depth=4,
+                min_samples_leaf=5,
+                learning_rate=0.05,
+                subsample=0.8,
+                random_state=42,
+                loss='quantile',
+                alpha=q
+            )
+            model.fit(X_train, y_train)
+            models.append(model)
+        
+        # Conformal calibration: widen (or narrow) the raw interval so that it
+        # covers the nominal share of the held-out data
+        y_test = np.asarray(y_test)
+        lower = models[0].predict(X_test)
+        upper = models[-1].predict(X_test)
+        scores = np.maximum(lower - y_test, y_test - upper)
+        nominal = quantiles[-1] - quantiles[0]
+        level = min(1.0, np.ceil((len(y_test) + 1) * nominal) / len(y_test))
+        margin = float(np.quantile(scores, level))
+        
+        raw_coverage = np.mean((y_test >= lower) & (y_test <= upper))
+        calibrated_coverage = np.mean((y_test >= lower - margin) & (y_test <= upper + margin))
+        print(f"Interval coverage (nominal {nominal:.0%}): raw {raw_coverage:.1%}, "
+              f"calibrated {calibrated_coverage:.1%} (margin {margin:+.1f})")
+        
+        self.quantile_models = {'quantiles': quantiles, 'models': models, 'margin': margin}
+    
+    def get_model_version(self):
+        """Model file modification time; identifies the trained model across workers"""
+        if os.path.exists(self.paths['model']):
+            return int(os.path.getmtime(self.paths['model']))
+        return 0
+    
+    def compile_models(self, export=False):
+        """Build (or load) the flat-array ensembles used by the compiled engine"""
+        self.compiled = None
+        if Config.INFERENCE_ENGINE != 'compiled' or self.model is None:
+            return
+        try:
+            path = self.paths['compiled_model']
+            loaded = None
+            if (not export and os.path.exists(path) and os.path.exists(self.paths['model'])
+                    and os.path.getmtime(path) >= os.path.getmtime(self.paths['model'])):
+                loaded = load_compiled(path)
+            if loaded is not None:
+                point, quantiles = loaded
+            else:
+                point = CompiledEnsemble.from_sklearn(self.model, self.scaler)
+                models = self.quantile_models['models'] if self.quantile_models else []
+                quantiles = [CompiledEnsemble.from_sklearn(m, self.scaler) for m in models]
+                if export:
+                    save_compiled(path, point, quantiles)
+            if self.quantile_models and len(quantiles) != len(self.quantile_models['models']):
+                raise ValueError("compiled quantile models are out of date")
+            self.compiled = (point, quantiles)
+        except Exception as e:
+            print(f"Error compiling model, falling back to sklearn: {e}")
+            self.compiled = None
+    
     def calculate_aqi_from_pm25(self, pm25):
         """Calculate AQI from PM2.5 concentration"""
         if pd.isna(pm25):
@@ -240,160 +346,269 @@ class AQIPredictor:
         
         return 500
     
-    def predict_for_date(self, current_data, target_date):
-        """Predict AQI for a specific future date with lag features"""
-        try:
-            features = current_data.copy()
-            
-            # Add temporal features
-            features['month'] = target_date.month
-            features['day_of_week'] = target_date.weekday()
-            features['day_of_year'] = target_date.timetuple().tm_yday
-            features['is_winter'] = 1 if target_date.month in [11, 12, 1, 2] else 0
-            features['is_monsoon'] = 1 if target_date.month in [7, 8, 9] else 0
-            
-            days_ahead = (target_date - datetime.now()).days
-            
-            # Check if model expects lag features
-            has_lag_features = any('aqi_lag' in f or 'aqi_rolling' in f for f in self.feature_names)
-            
-            if has_lag_features:
-                # Use recent AQI values for lag features
-                if len(self.recent_aqi_values) > 0:
-                    features['aqi_lag1'] = self.recent_aqi_values[-1] if len(self.recent_aqi_values) >= 1 else 150
-                    features['aqi_lag3'] = self.recent_aqi_values[-3] if len(self.recent_aqi_values) >= 3 else 150
-                    features['aqi_lag7'] = self.recent_aqi_values[-7] if len(self.recent_aqi_values) >= 7 else 150
-                    features['aqi_rolling_mean_7'] = np.mean(self.recent_aqi_values[-7:]) if len(self.recent_aqi_values) >= 7 else 150
-                    features['aqi_rolling_std_7'] = np.std(self.recent_aqi_values[-7:]) if len(self.recent_aqi_values) >= 7 else 30
-                else:
-                    # Default values if no history
-                    features['aqi_lag1'] = 150
-                    features['aqi_lag3'] = 150
-                    features['aqi_lag7'] = 150
-                    features['aqi_rolling_mean_7'] = 150
-                    features['aqi_rolling_std_7'] = 30
-            
-            # Apply seasonal adjustments to weather features
-            if features['is_winter']:
-                features['pm25'] = features.get('pm25', 100) * (1.2 + np.random.uniform(-0.1, 0.2))
-                features['pm10'] = features.get('pm10', 150) * (1.2 + np.random.uniform(-0.1, 0.2))
-                features['temp'] = max(10, features.get('temp', 20) - days_ahead * 0.5 + np.random.uniform(-2, 2))
-            elif features['is_monsoon']:
-                features['pm25'] = features.get('pm25', 100) * (0.7 + np.random.uniform(-0.1, 0.1))
-                features['pm10'] = features.get('pm10', 150) * (0.7 + np.random.uniform(-0.1, 0.1))
-                features['humidity'] = min(90, features.get('humidity', 70) + np.random.uniform(0, 10))
-            else:
-                features['pm25'] = features.get('pm25', 100) * (1.0 + np.random.uniform(-0.15, 0.15))
-                features['pm10'] = features.get('pm10', 150) * (1.0 + np.random.uniform(-0.15, 0.15))
-            
-            # Add interaction features
-            features['temp_pm25_interaction'] = features.get('temp', 25) * features.get('pm25', 100)
-            features['wind_pm_interaction'] = features.get('wind_speed', 3) * features.get('pm25', 100)
-            
+    def build_features(self, current_data, target_date, origin=None, adjust=True):
+        """Build the feature dict for one target date, forecast from origin (default now)
+        
+        adjust=False takes current_data as the target date's own conditions,
+        with no seasonal adjustment or forecast weather.
+        """
+        features = current_data.copy()
+        
+        # Add temporal features
+        features.update(calendar_row(target_date, self.episodes))
+        
+        days_ahead = (target_date.date() - (origin or datetime.now()).date()).days
+        
+        if self.has_lag_features():
+            # Lags and rolling stats of the recent AQI values, computed the
+            # same way as the rollout's (sample std, as in training)
+            features.update(history_features(tuple(self.recent_aqi_values)))
+        
+        # Apply seasonal adjustments to weather features (the middle of the
+        # ranges the scenario ensemble samples). Days the OpenWeather forecast
+        # covers take its weather instead; only pollutants are adjusted.
+        if adjust:
+            draws = central_draws(target_date.month)
+            weather = self.forecast_weather(target_date, days_ahead, origin)
+            if weather:
+                features.update(weather)
+                draws = {name: draws[name] for name in ('pm25', 'pm10')}
+            apply_seasonal_adjustment(features, days_ahead, draws)
+        
+        # Add interaction features
+        features['temp_pm25_interaction'] = features.get('temp', 25) * features.get('pm25', 100)
+        features['wind_pm_interaction'] = features.get('wind_speed', 3) * features.get('pm25', 100)
+        
+        return features
+    
+    def forecast_weather(self, target_date, days_ahead, origin=None):
+        """Cached forecast weather for a future date when forecasting from now, else None"""
+        if origin is not None or days_ahead < 1:
+            return None
+        return self.weather_forecast.for_date(target_date)
+    
+    def has_lag_features(self):
+        """Check if model expects lag features"""
+        return any('aqi_lag' in f or 'aqi_rolling' in f for f in self.feature_names)
+    
+    def feature_matrix(self, feature_rows):
+        """Raw feature matrix, in feature_names order, for many feature dicts"""
+        with metrics.span('features'):
             # Prepare features for prediction - use only features that model expects
-            feature_values = []
-            for feature_name in self.feature_names:
-                if feature_name in features:
-                    feature_values.append(features[feature_name])
-                else:
-                    # Provide default value for missing features
-                    print(f"Warning: Missing feature {feature_name}, using default")
-                    feature_values.append(0)
-            
-            df = pd.DataFrame([feature_values], columns=self.feature_names)
-            X_scaled = self.scaler.transform(df)
-            
-            # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
-            
-            # Add realistic variability based on rolling std
-            if has_lag_features and len(self.recent_aqi_values) >= 7:
-                variability = np.std(self.recent_aqi_values[-7:])
+            matrix = []
+            for features in feature_rows:
+                row = []
+                for feature_name in self.feature_names:
+                    if feature_name in features:
+                        row.append(features[feature_name])
+                    else:
+                        # Provide default value for missing features
+                        print(f"Warning: Missing feature {feature_name}, using default")
+                        row.append(0)
+                matrix.append(row)
+            return np.asarray(matrix, dtype=np.float64).reshape(len(matrix), len(self.feature_names))
+    
+    def predict_matrix(self, X, trend=None, intervals=True):
+        """Predict point values and intervals for a raw feature matrix
+        
+        trend is the recent AQI change per row; by default it comes from
+        recent_aqi_values. intervals=False skips the quantile models.
+        """
+        with metrics.span('model'):
+            # Point and quantile models share the same matrix
+            if self.compiled is not None:
+                # The scaler is folded into the compiled thresholds
+                point_model, quantile_models = self.compiled
             else:
-                variability = 30
-            
-            noise = np.random.normal(0, variability * 0.3)
-            prediction = prediction + noise
-            
-            # Apply trending adjustment
-            if has_lag_features and len(self.recent_aqi_values) >= 3:
-                recent_trend = self.recent_aqi_values[-1] - self.recent_aqi_values[-3]
-                trend_factor = recent_trend * 0.2  # Dampen the trend
-                prediction += trend_factor
-            
-            # Bound prediction to realistic range
-            prediction = max(30, min(500, prediction))
-            
-            # Update recent values for next prediction
-            if days_ahead == 1:
-                self.recent_aqi_values.append(prediction)
-                if len(self.recent_aqi_values) > 14:
-                    self.recent_aqi_values.pop(0)
-            
-            return prediction
-            
+                X = self.scaler.transform(pd.DataFrame(X, columns=self.feature_names))
+                point_model, quantile_models = self.model, (self.quantile_models or {}).get('models', [])
+            point = point_model.predict(X)
+            lower = upper = None
+            if intervals and self.quantile_models is not None:
+                quantile_preds = np.vstack([m.predict(X) for m in quantile_models])
+                quantile_preds.sort(axis=0)  # guard against quantile crossing
+                margin = self.quantile_models['margin']
+                lower = quantile_preds[0] - margin
+                upper = quantile_preds[-1] + margin
+        
+        # Apply trending adjustment
+        if trend is None and len(self.recent_aqi_values) >= 3:
+            trend = self.recent_aqi_values[-1] - self.recent_aqi_values[-3]
+        if self.has_lag_features() and trend is not None:
+            trend_factor = np.asarray(trend) * 0.2  # Dampen the trend
+            point = point + trend_factor
+            if lower is not None:
+                lower = lower + trend_factor
+                upper = upper + trend_factor
+        
+        # Bound predictions to realistic range
+        point = np.clip(point, 30, 500)
+        if lower is not None:
+            lower = np.clip(np.minimum(lower, point), 0, 500)
+            upper = np.clip(np.maximum(upper, point), 30, 500)
+        
+        return point, lower, upper
+    
+    def predict_batch(self, feature_rows):
+        """Predict point values and intervals for many feature dicts in one pass"""
+        return self.predict_matrix(self.feature_matrix(feature_rows))
+    
+    def rollout(self, scenarios, n_days, histories=None):
+        """Recursive forecasts for many scenarios; see rollout.Rollout.run"""
+        return Rollout(self).run(scenarios, n_days, histories)
+    
+    def predict_with_interval(self, current_data, target_date):
+        """Predict AQI and its prediction interval for a specific date
+        
+        Later dates are rolled out day by day so their lags include the
+        forecasts for the days in between.
+        """
+        try:
+            days_ahead = (target_date.date() - datetime.now().date()).days
+            if self.has_lag_features() and days_ahead > 1:
+                self.reset_recent_values()
+                _, point, lower, upper = self.rollout([current_data], days_ahead)
+                point = point[:, -1]
+                if lower is not None:
+                    lower, upper = lower[:, -1], upper[:, -1]
+            else:
+                point, lower, upper = self.predict_batch([self.build_features(current_data, target_date)])
+            return {
+                'aqi': float(point[0]),
+                'lower': float(lower[0]) if lower is not None else None,
+                'upper': float(upper[0]) if upper is not None else None
+            }
         except Exception as e:
             print(f"Prediction error for date {target_date}: {e}")
             import traceback
             traceback.print_exc()
             return None
     
-    def predict_next_n_days(self, current_data, n_days=7):
-        """Predict AQI for next N days"""
-        predictions = []
-        
-        # Reset recent values to actual recent data
-        if self.historical_data is not None and 'aqi' in self.historical_data.columns:
+    def predict_for_date(self, current_data, target_date):
+        """Predict AQI for a specific future date with lag features"""
+        result = self.predict_with_interval(current_data, target_date)
+        return result['aqi'] if result else None
+    
+    def get_forecast(self, current_data, target_date):
+        """Forecast for a date from the materialized table, falling back to live inference"""
+        self.forecast_table.refresh(current_data)
+        entry = self.forecast_table.lookup(target_date)
+        metrics.annotate(cache='miss' if entry is None else 'hit')
+        if entry is None:
+            return self.predict_with_interval(current_data, target_date)
+        return {'aqi': entry['aqi'], 'lower': entry.get('lower'), 'upper': entry.get('upper')}
+    
+    def get_forecast_next_n_days(self, current_data, n_days=7):
+        """Next n_days from the materialized table, falling back to live inference"""
+        self.forecast_table.refresh(current_data)
+        entries = self.forecast_table.next_n_days(n_days)
+        metrics.annotate(cache='miss' if entries is None else 'hit')
+        if entries is None:
+            return self.predict_next_n_days(current_data, n_days)
+        return entries
+    
+    def get_scenario_forecast(self, current_data, n_days=7, n_scenarios=None, thresholds=None):
+        """Forecast distribution over the next n_days from a scenario ensemble"""
+        try:
+            return ScenarioEnsemble(self, n_scenarios).forecast(current_data, n_days, thresholds)
+        except Exception as e:
+            print(f"Scenario forecast error for next {n_days} days: {e}")
+            return []
+    
+    def reset_recent_values(self):
+        """Reset recent values to actual recent data"""
+        values = self.recent_values(pd.Timestamp(datetime.now().date()))
+        if values:
+            self.recent_aqi_values = values
+        elif self.historical_data is not None and 'aqi' in self.historical_data.columns:
             self.recent_aqi_values = self.historical_data['aqi'].tail(14).tolist()
+    
+    def recent_values(self, end, days=14):
+        """Daily AQI for the days up to end; [] if fewer than 7 of them were observed
+        
+        Missing days take the previous day's value rather than being dropped,
+        so each lag still points at its own date.
+        """
+        observed = pd.Series(self.observed_values(pd.date_range(end=end, periods=days), 'aqi'))
+        if observed.count() < 7:
+            return []
+        return observed.ffill().dropna().tolist()
+    
+    def observed_values(self, dates, column):
+        """Daily values from the time-series rollups, falling back to the history"""
+        stored = self.timeseries.daily_values(dates, column)
+        history = lookup_dates(self.historical_data, dates, column)
+        return np.where(np.isnan(stored), history, stored)
+    
+    def predict_next_n_days(self, current_data, n_days=7):
+        """Predict AQI for next N days, with intervals, each day's lags fed by the days before"""
+        self.reset_recent_values()
+        try:
+            target_dates, point, lower, upper = self.rollout([current_data], n_days)
+        except Exception as e:
+            print(f"Prediction error for next {n_days} days: {e}")
+            return []
         
-        for i in range(n_days):
-            target_date = datetime.now() + timedelta(days=i+1)
-            predicted_aqi = self.predict_for_date(current_data, target_date)
-            
-            if predicted_aqi is not None:
-                predictions.append({
-                    'date': target_date.strftime('%Y-%m-%d'),
-                    'day_name': target_date.strftime('%A'),
-                    'aqi': round(predicted_aqi, 1)
-                })
+        predictions = []
+        for i, target_date in enumerate(target_dates):
+            entry = {
+                'date': target_date.strftime('%Y-%m-%d'),
+                'day_name': target_date.strftime('%A'),
+                'aqi': round(float(point[0, i]), 1)
+            }
+            if lower is not None:
+                entry['lower'] = round(float(lower[0, i]), 1)
+                entry['upper'] = round(float(upper[0, i]), 1)
+            predictions.append(entry)
         
         return predictions
     
     def get_past_n_days(self, n_days=7):
         """Get past N days AQI from historical data"""
-        if self.historical_data is None or len(self.historical_data) == 0:
-            return []
+        with metrics.span('history'):
+            return self.lookup_past_n_days(n_days)
+    
+    def lookup_past_n_days(self, n_days):
+        """Look up the past N days in the time-series rollups and date-indexed history"""
+        today = pd.Timestamp(datetime.now().date())
+        dates = pd.DatetimeIndex([today - pd.Timedelta(days=i) for i in range(n_days, 0, -1)])
+        aqi = self.observed_values(dates, 'aqi')
+        pm25 = self.observed_values(dates, 'pm25')
         
         past_data = []
-        
-        for i in range(n_days, 0, -1):
-            target_date = datetime.now() - timedelta(days=i)
-            
-            if 'date' in self.historical_data.columns:
-                date_str = target_date.strftime('%Y-%m-%d')
-                matching = self.historical_data[
-                    self.historical_data['date'].dt.strftime('%Y-%m-%d') == date_str
-                ]
-                
-                if len(matching) > 0:
-                    aqi = matching['aqi'].iloc[0] if 'aqi' in matching.columns else None
-                    if aqi is None and 'pm25' in matching.columns:
-                        aqi = self.calculate_aqi_from_pm25(matching['pm25'].iloc[0])
-                    
-                    if aqi is not None:
-                        past_data.append({
-                            'date': date_str,
-                            'day_name': target_date.strftime('%A'),
-                            'aqi': round(aqi, 1)
-                        })
+        for target_date, day_aqi, day_pm25 in zip(dates, aqi, pm25):
+            if np.isnan(day_aqi) and not np.isnan(day_pm25):
+                day_aqi = self.calculate_aqi_from_pm25(day_pm25)
+            if not np.isnan(day_aqi):
+                past_data.append({
+                    'date': target_date.strftime('%Y-%m-%d'),
+                    'day_name': target_date.strftime('%A'),
+                    'aqi': round(float(day_aqi), 1)
+                })
         
         return past_data
     
+    def memory_footprint(self):
+        """Estimate bytes held by the model, scaler and history"""
+        total = 0
+        if self.model is not None:
+            total += len(pickle.dumps(self.model, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.quantile_models is not None:
+            total += len(pickle.dumps(self.quantile_models, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.scaler is not None:
+            total += len(pickle.dumps(self.scaler, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.compiled is not None:
+            total += self.compiled[0].nbytes() + sum(q.nbytes() for q in self.compiled[1])
+        if self.historical_data is not None:
+            total += int(self.historical_data.memory_usage(deep=True).sum())
+        return total
+    
     def predict(self, data):
         """Predict AQI from input data (for backward compatibility)"""
         return self.predict_for_date(data, datetime.now() + timedelta(days=1))
     
-    def get_aqi_category(self, aqi):
+    @staticmethod
+    def get_aqi_category(aqi):
         """Get AQI category and health message"""
         if aqi <= 50:
             return "Good", "Air quality is satisfactory, and air pollution poses little or no risk."
@@ -0,0 +1,146 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from config import Config
+
+
+class SamplingProfiler:
+    """Low-overhead profiler that samples one thread's stack at a fixed interval"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()  # collapsed stack -> sample count
+        self.thread_id = None
+        self.running = False
+        self.sampler = None
+
+    def enable(self):
+        self.thread_id = threading.get_ident()
+        self.running = True
+        self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+        self.sampler.start()
+
+    def disable(self):
+        self.running = False
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def sample_loop(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def dump(self, path):
+        """Write collapsed stacks (flamegraph.pl / speedscope format)"""
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, limit=20):
+        """Functions seen most often at the top of the stack"""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [f"{count / total:6.1%}  {frame}" for frame, count in leaves.most_common(limit)]
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests and keeps the slow ones on disk"""
+
+    def __init__(self, enabled=None, sample_rate=None, slow_ms=None, mode=None,
+                 output_dir=None, max_files=None):
+        self.enabled = Config.PROFILING_ENABLED if enabled is None else enabled
+        self.sample_rate = Config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = Config.PROFILE_SLOW_MS if slow_ms is None else slow_ms
+        self.mode = mode or Config.PROFILE_MODE
+        self.output_dir = output_dir or Config.PROFILE_DIR
+        self.max_files = Config.PROFILE_MAX_FILES if max_files is None else max_files
+        self.lock = threading.Lock()
+
+    def run(self, fn, details=None):
+        """Call fn, profiling it if this request is sampled"""
+        if not self.enabled:
+            return fn()
+
+        profiler = None
+        if random.random() < self.sample_rate:
+            profiler = cProfile.Profile() if self.mode == 'cprofile' else SamplingProfiler()
+
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return fn()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.slow_ms:
+                info = details() if callable(details) else dict(details or {})
+                self.capture(profiler, elapsed_ms, info)
+
+    def capture(self, profiler, elapsed_ms, info):
+        """Dump the profile and request details for a slow request"""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            intent = info.get('intent', 'unknown')
+            stem = os.path.join(self.output_dir, f"{stamp}_{intent}_{elapsed_ms:.0f}ms")
+
+            record = {
+                'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+                'elapsed_ms': round(elapsed_ms, 1),
+                'threshold_ms': self.slow_ms,
+                'profiler': None,
+                'profile_file': None,
+                'top': [],
+                **{key: str(value) if isinstance(value, datetime) else value for key, value in info.items()}
+            }
+
+            if isinstance(profiler, cProfile.Profile):
+                record['profiler'] = 'cprofile'
+                record['profile_file'] = os.path.basename(stem + '.prof')
+                profiler.dump_stats(stem + '.prof')
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(20)
+                record['top'] = [line for line in text.getvalue().splitlines() if line.strip()][-21:]
+            elif isinstance(profiler, SamplingProfiler):
+                record['profiler'] = 'sampling'
+                record['profile_file'] = os.path.basename(stem + '.folded')
+                profiler.dump(stem + '.folded')
+                record['top'] = profiler.summary()
+
+            with open(stem + '.json', 'w') as f:
+                json.dump(record, f, indent=2, default=str)
+            self.rotate()
+        except Exception as e:
+            print(f"Error capturing slow request profile: {e}")
+
+    def rotate(self):
+        """Keep only the newest max_files captures"""
+        with self.lock:
+            records = sorted(name for name in os.listdir(self.output_dir) if name.endswith('.json'))
+            for name in records[:max(0, len(records) - self.max_files)]:
+                stem = os.path.join(self.output_dir, name[:-len('.json')])
+                for suffix in ('.json', '.prof', '.folded'):
+                    if os.path.exists(stem + suffix):
+                        os.remove(stem + suffix)
+
+
+profiler = RequestProfiler()
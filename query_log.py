@@ -0,0 +1,173 @@
+"""Query log: intent, target date, latency and cache outcome of every /chat request"""
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    ts REAL NOT NULL,
+    city TEXT,
+    intent TEXT,
+    target_date TEXT,
+    horizon_days INTEGER,
+    latency_ms REAL,
+    cache TEXT,
+    status INTEGER
+)
+"""
+INSERT = "INSERT INTO queries VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Buckets for the target-date horizon in the report
+HORIZONS = [(None, 0, 'today/past'), (1, 1, '1 day'), (2, 2, '2 days'), (3, 7, '3-7 days'),
+            (8, 30, '8-30 days'), (31, None, '> 30 days')]
+
+
+class QueryLog:
+    """Queues request records and writes them to SQLite in batches off the request path"""
+
+    def __init__(self, path=None, enabled=None, batch_size=None, flush_seconds=None, max_queued=None):
+        self.path = path or Config.QUERY_LOG_PATH
+        self.enabled = Config.QUERY_LOG_ENABLED if enabled is None else enabled
+        self.batch_size = batch_size or Config.QUERY_LOG_BATCH_SIZE
+        self.flush_seconds = flush_seconds or Config.QUERY_LOG_FLUSH_SECONDS
+        self.queue = queue.Queue(maxsize=max_queued or Config.QUERY_LOG_MAX_QUEUED)
+        self.dropped = 0
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def record(self, annotations, seconds, status):
+        """Queue one request; never blocks, drops the record if the writer is behind"""
+        if not self.enabled:
+            return
+        if self.writer is None:
+            self.start()
+        now = time.time()
+        target = annotations.get('target_date')
+        horizon = None
+        if isinstance(target, datetime):
+            horizon = (target.date() - datetime.fromtimestamp(now).date()).days
+            target = target.strftime('%Y-%m-%d %H:%M')
+        try:
+            self.queue.put_nowait((now, annotations.get('city'), annotations.get('intent'), target, horizon,
+                                   round(seconds * 1000, 3), annotations.get('cache'), status))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self.lock:
+            if self.writer is not None:
+                return
+            self.writer = threading.Thread(target=self.write_loop, name='query-log', daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    def write_loop(self):
+        connection = self.connect()
+        while True:
+            # Wait for the first record, then take whatever else is queued
+            try:
+                batch = [self.queue.get(timeout=self.flush_seconds)]
+            except queue.Empty:
+                continue
+            if batch[0] is None:
+                break
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self.write(connection, batch)
+            if stop:
+                break
+        connection.close()
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(SCHEMA)
+        return connection
+
+    def write(self, connection, batch):
+        try:
+            with connection:
+                connection.executemany(INSERT, batch)
+        except sqlite3.Error as e:
+            print(f"Error writing query log: {e}")
+
+    def close(self):
+        """Flush queued records and stop the writer"""
+        if self.writer is None:
+            return
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+        self.writer = None
+
+
+def percentiles(values):
+    if not values:
+        return '-'
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"{p50:8.1f} {p95:8.1f} {p99:8.1f}"
+
+
+def report(path, days=None):
+    """Text report of top intents, target-date horizons and latency percentiles"""
+    connection = sqlite3.connect(path)
+    connection.execute(SCHEMA)
+    since = time.time() - days * 86400 if days else 0
+    rows = connection.execute(
+        "SELECT intent, horizon_days, latency_ms, cache FROM queries WHERE ts >= ?", (since,)).fetchall()
+    connection.close()
+    if not rows:
+        return "No queries logged."
+
+    lines = [f"{len(rows)} queries\n", f"{'intent':14s} {'count':>7s} {'share':>6s} {'hit rate':>8s}"
+                                       f" {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}"]
+    by_intent = {}
+    for intent, _, latency, cache in rows:
+        by_intent.setdefault(intent or 'unknown', []).append((latency, cache))
+    for intent, entries in sorted(by_intent.items(), key=lambda item: -len(item[1])):
+        cached = [cache for _, cache in entries if cache]
+        hit_rate = f"{cached.count('hit') / len(cached):8.0%}" if cached else f"{'-':>8s}"
+        lines.append(f"{intent:14s} {len(entries):7d} {len(entries) / len(rows):6.0%} {hit_rate} "
+                     f"{percentiles([latency for latency, _ in entries])}")
+
+    horizons = [horizon for _, horizon, _, _ in rows if horizon is not None]
+    lines.append(f"\n{'target date':14s} {'count':>7s} {'share':>6s}")
+    for low, high, label in HORIZONS:
+        count = sum(1 for h in horizons if (low is None or h >= low) and (high is None or h <= high))
+        if count:
+            lines.append(f"{label:14s} {count:7d} {count / len(horizons):6.0%}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report on logged /chat queries')
+    parser.add_argument('--path', default=Config.QUERY_LOG_PATH, help='Query log database')
+    parser.add_argument('--days', type=float, default=None, help='Only the last N days')
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        raise SystemExit(f"No query log at {args.path}")
+    print(report(args.path, args.days))
+
+
+query_log = QueryLog()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import math
+import threading
+import time
+from config import Config
+
+
+def parse_limits(spec):
+    """Parse 'intent=rate/burst,...' into {intent: (rate per second, burst)}"""
+    limits = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        intent, _, value = item.partition('=')
+        rate, _, burst = value.partition('/')
+        limits[intent.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+class TokenBucket:
+    """Allows bursts of up to `burst` requests, refilled at `rate` per second"""
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now, cost=1.0):
+        """Spend cost tokens; returns 0 if allowed, else seconds until it would be"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per (client, intent), with limits configured per intent"""
+
+    def __init__(self, limits=None, enabled=None, max_clients=None):
+        self.limits = parse_limits(Config.RATE_LIMITS) if limits is None else limits
+        self.enabled = Config.RATE_LIMIT_ENABLED if enabled is None else enabled
+        self.max_clients = max_clients or Config.RATE_LIMIT_MAX_CLIENTS
+        self.buckets = {}  # (client, intent) -> TokenBucket
+        self.lock = threading.Lock()
+
+    def limit_for(self, intent):
+        return self.limits.get(intent) or self.limits.get('default')
+
+    def check(self, client, intent):
+        """Seconds the client must wait before this request, or 0 if it may go ahead"""
+        limit = self.limit_for(intent)
+        if not self.enabled or limit is None:
+            return 0.0
+        # Intents without their own limit share the client's default bucket
+        key = (client, intent if intent in self.limits else 'default')
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    self.prune(now)
+                # Same clock reading as take(), or the first refill goes negative
+                bucket = self.buckets[key] = TokenBucket(*limit, now)
+            return bucket.take(now)
+
+    def prune(self, now):
+        """Drop buckets that have refilled completely; they behave like new ones"""
+        idle = [key for key, bucket in self.buckets.items()
+                if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.burst]
+        for key in idle:
+            del self.buckets[key]
+        # Still full of active clients: drop the least recently used half
+        if len(self.buckets) >= self.max_clients:
+            oldest = sorted(self.buckets, key=lambda key: self.buckets[key].updated)
+            for key in oldest[:len(oldest) // 2]:
+                del self.buckets[key]
+
+
+def retry_after_header(seconds):
+    """Retry-After value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds))) if math.isfinite(seconds) else '3600'
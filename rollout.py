@@ -0,0 +1,144 @@
+"""Recursive multi-step daily rollout with ring-buffer lag state"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# Lag and rolling-window features the daily model is trained on
+LAG_OFFSETS = {'aqi_lag1': 1, 'aqi_lag3': 3, 'aqi_lag7': 7}
+ROLLING_WINDOW = 7
+
+# Used when a series has too little history for a feature, as before
+DEFAULT_LAG = 150.0
+DEFAULT_STD = 30.0
+
+
+class LagState:
+    """Ring buffer of the last ROLLING_WINDOW daily values for each of n series
+
+    Running sums give the rolling mean and sample std (ddof=1, as pandas
+    rolling().std() used in training) without rescanning the window.
+    """
+
+    def __init__(self, histories, window=ROLLING_WINDOW):
+        self.window = window
+        n_series = len(histories)
+        self.values = np.zeros((n_series, window))
+        self.head = 0  # slot the next push writes; the newest value is at head - 1
+        self.count = np.zeros(n_series, dtype=np.int64)
+        self.total = np.zeros(n_series)
+        self.total_sq = np.zeros(n_series)
+
+        # Seed each series from its most recent finite values, oldest first
+        for i, history in enumerate(histories):
+            recent = np.asarray(history, dtype=np.float64)
+            recent = recent[np.isfinite(recent)][-window:]
+            k = len(recent)
+            self.values[i, window - k:] = recent
+            self.count[i] = k
+            self.total[i] = recent.sum()
+            self.total_sq[i] = (recent ** 2).sum()
+
+    def push(self, values):
+        """Append one value per series, evicting the oldest once the window is full"""
+        values = np.asarray(values, dtype=np.float64)
+        full = self.count >= self.window
+        evicted = np.where(full, self.values[:, self.head], 0.0)
+        self.values[:, self.head] = values
+        self.head = (self.head + 1) % self.window
+        self.total += values - evicted
+        self.total_sq += values ** 2 - evicted ** 2
+        self.count = np.minimum(self.count + 1, self.window)
+
+    def lag(self, offset):
+        """Value offset steps back (1 is the newest), DEFAULT_LAG where not yet known"""
+        slot = (self.head - offset) % self.window
+        return np.where(self.count >= offset, self.values[:, slot], DEFAULT_LAG)
+
+    def mean(self):
+        count = np.maximum(self.count, 1)
+        return np.where(self.count > 0, self.total / count, DEFAULT_LAG)
+
+    def std(self):
+        count = self.count
+        safe = np.maximum(count, 2)
+        variance = (self.total_sq - self.total ** 2 / safe) / (safe - 1)
+        # Running sums can dip a hair below zero on constant windows
+        return np.where(count >= 2, np.sqrt(np.maximum(variance, 0.0)), DEFAULT_STD)
+
+    def features(self):
+        """Lag and rolling features for every series, by feature name"""
+        features = {name: self.lag(offset) for name, offset in LAG_OFFSETS.items()}
+        features['aqi_rolling_mean_7'] = self.mean()
+        features['aqi_rolling_std_7'] = self.std()
+        return features
+
+    def trend(self):
+        """Change over the last two days, as used by the predictor's trend adjustment"""
+        return np.where(self.count >= 3, self.lag(1) - self.lag(3), 0.0)
+
+
+@lru_cache(maxsize=64)
+def history_features(history):
+    """Lag and rolling features for one daily AQI history (a tuple), as the rollout computes them"""
+    return {name: float(values[0]) for name, values in LagState([history]).features().items()}
+
+
+class Rollout:
+    """Rolls a predictor forward day by day for many series at once"""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def run(self, scenarios, n_days, histories=None, start=None):
+        """Point forecasts and intervals for each scenario over the next n_days
+
+        scenarios is a list of current-conditions dicts and histories the
+        matching lists of recent daily AQI (defaults to the predictor's).
+        start is a past forecast origin; without it the forecast runs from
+        now and picks up the cached forecast weather. Returns (dates, point,
+        lower, upper) with arrays shaped [n_scenarios, n_days]; lower and
+        upper are None without interval models.
+        """
+        predictor = self.predictor
+        dates = [(start or datetime.now()) + timedelta(days=i + 1) for i in range(n_days)]
+        if histories is None:
+            histories = [predictor.recent_aqi_values] * len(scenarios)
+
+        # Everything except the lags is known up front: one matrix per step
+        rows = [predictor.build_features(scenario, date, start) for date in dates for scenario in scenarios]
+        X = predictor.feature_matrix(rows).reshape(n_days, len(scenarios), len(predictor.feature_names))
+        return (dates, *self.run_matrix(X, histories))
+
+    def run_matrix(self, X, histories, intervals=True):
+        """Roll out a prebuilt [n_days, n_series, n_features] raw feature array
+
+        Lag columns of X are overwritten step by step. Returns (point, lower,
+        upper) shaped [n_series, n_days].
+        """
+        predictor = self.predictor
+        n_days, n_series, _ = X.shape
+        lag_columns = [(predictor.feature_names.index(name), name)
+                       for name in (*LAG_OFFSETS, 'aqi_rolling_mean_7', 'aqi_rolling_std_7')
+                       if name in predictor.feature_names]
+        state = LagState(histories)
+        # The trend adjustment is anchored to the observed history, not compounded
+        trend = state.trend()
+
+        point = np.empty((n_series, n_days))
+        lower = upper = None
+        for step in range(n_days):
+            if lag_columns:
+                features = state.features()
+                for column, name in lag_columns:
+                    X[step, :, column] = features[name]
+            step_point, step_lower, step_upper = predictor.predict_matrix(X[step], trend, intervals)
+            point[:, step] = step_point
+            if step_lower is not None:
+                if lower is None:
+                    lower, upper = np.empty((n_series, n_days)), np.empty((n_series, n_days))
+                lower[:, step] = step_lower
+                upper[:, step] = step_upper
+            state.push(step_point)
+
+        return point, lower, upper
@@ -0,0 +1,133 @@
+"""Monte Carlo scenario ensembles for daily forecast distributions"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from config import Config
+from metrics import metrics
+from rollout import Rollout
+
+# Seasonal adjustment ranges per day ahead: pm25/pm10 are multipliers on the
+# current reading, temp and humidity offsets added to it. Point forecasts use
+# the middle of each range; each scenario draws one position across it.
+SEASONAL_PERTURBATIONS = {
+    'winter': {'pm25': (1.1, 1.4), 'pm10': (1.1, 1.4), 'temp': (-2.0, 2.0)},
+    'monsoon': {'pm25': (0.6, 0.8), 'pm10': (0.6, 0.8), 'humidity': (0.0, 10.0)},
+    'other': {'pm25': (0.85, 1.15), 'pm10': (0.85, 1.15)},
+}
+
+# Lower bound of each category above Good, as in AQIPredictor.get_aqi_category
+CATEGORY_THRESHOLDS = {
+    'Moderate': 50,
+    'Unhealthy for Sensitive Groups': 100,
+    'Unhealthy': 150,
+    'Very Unhealthy': 200,
+    'Hazardous': 300,
+}
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def season(month):
+    if month in (11, 12, 1, 2):
+        return 'winter'
+    if month in (7, 8, 9):
+        return 'monsoon'
+    return 'other'
+
+
+def central_draws(month):
+    """Middle of each adjustment range, for deterministic point forecasts"""
+    return {name: (low + high) / 2 for name, (low, high) in SEASONAL_PERTURBATIONS[season(month)].items()}
+
+
+def random_quantiles(size, rng):
+    """One uniform position in [0, 1) per scenario for every adjustment, held for the horizon"""
+    names = sorted({name for ranges in SEASONAL_PERTURBATIONS.values() for name in ranges})
+    return {name: rng.uniform(0.0, 1.0, size) for name in names}
+
+
+def scenario_draws(month, quantiles):
+    """Each scenario's adjustments for a month, at its fixed position in that season's ranges"""
+    return {name: low + quantiles[name] * (high - low)
+            for name, (low, high) in SEASONAL_PERTURBATIONS[season(month)].items()}
+
+
+def apply_seasonal_adjustment(features, days_ahead, draws):
+    """Adjust pollutant and weather readings in place; draws may be scalars or arrays"""
+    features['pm25'] = features.get('pm25', 100) * draws['pm25']
+    features['pm10'] = features.get('pm10', 150) * draws['pm10']
+    if 'temp' in draws:
+        features['temp'] = np.maximum(10, features.get('temp', 20) - days_ahead * 0.5 + draws['temp'])
+    if 'humidity' in draws:
+        features['humidity'] = np.minimum(90, features.get('humidity', 70) + draws['humidity'])
+    return features
+
+
+class ScenarioEnsemble:
+    """Rolls K perturbed scenarios of the current conditions forward together"""
+
+    def __init__(self, predictor, n_scenarios=None, seed=None):
+        self.predictor = predictor
+        self.n_scenarios = n_scenarios or Config.SCENARIO_COUNT
+        self.seed = seed
+
+    def simulate(self, current_data, n_days):
+        """Dates and the [n_scenarios, n_days] matrix of scenario forecasts"""
+        predictor = self.predictor
+        start = datetime.now()
+        dates = [start + timedelta(days=i + 1) for i in range(n_days)]
+        quantiles = random_quantiles(self.n_scenarios, np.random.default_rng(self.seed))
+        columns = {name: i for i, name in enumerate(predictor.feature_names)}
+
+        with metrics.span('scenarios'):
+            # Deterministic rows for everything but the perturbed readings,
+            # repeated for every scenario
+            base = predictor.feature_matrix([predictor.build_features(current_data, d) for d in dates])
+            X = np.repeat(base[:, None, :], self.n_scenarios, axis=1)
+
+            for step, date in enumerate(dates):
+                draws = scenario_draws(date.month, quantiles)
+                readings = dict(current_data)
+                # Forecast weather is taken as given; only pollutants vary
+                weather = predictor.forecast_weather(date, step + 1)
+                if weather:
+                    readings.update(weather)
+                    draws = {name: draws[name] for name in ('pm25', 'pm10')}
+                apply_seasonal_adjustment(readings, step + 1, draws)
+                for name in draws:
+                    if name in columns:
+                        X[step, :, columns[name]] = readings[name]
+
+                # Interaction features follow the perturbed readings, as in build_features
+                pm25 = readings['pm25']
+                if 'temp_pm25_interaction' in columns:
+                    X[step, :, columns['temp_pm25_interaction']] = readings.get('temp', 25) * pm25
+                if 'wind_pm_interaction' in columns:
+                    X[step, :, columns['wind_pm_interaction']] = readings.get('wind_speed', 3) * pm25
+
+            predictor.reset_recent_values()
+            histories = [predictor.recent_aqi_values] * self.n_scenarios
+            point, _, _ = Rollout(predictor).run_matrix(X, histories, intervals=False)
+        return dates, point
+
+    def forecast(self, current_data, n_days=7, thresholds=None):
+        """Per-day percentiles, mean and probabilities of exceeding each threshold
+
+        thresholds maps a label to an AQI level and defaults to the category
+        thresholds.
+        """
+        thresholds = thresholds or CATEGORY_THRESHOLDS
+        dates, point = self.simulate(current_data, n_days)
+        percentiles = np.percentile(point, PERCENTILES, axis=0)
+        exceedance = (point[:, :, None] > np.array(list(thresholds.values()))).mean(axis=0)
+
+        days = []
+        for i, date in enumerate(dates):
+            days.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'day_name': date.strftime('%A'),
+                'mean': round(float(point[:, i].mean()), 1),
+                'percentiles': {p: round(float(percentiles[j, i]), 1) for j, p in enumerate(PERCENTILES)},
+                'exceedance': {label: round(float(exceedance[i, j]), 3) for j, label in enumerate(thresholds)}
+            })
+        return days
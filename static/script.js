@@ -53,9 +53,9 @@ function addGraphToChat(graphData) {
     const futureData = graphData.future || [];
     
     const labels = [
-        ...pastData.map(d => d.day_name.substring(0, 3)),
+        ...pastData.map(d => d.label || d.day_name.substring(0, 3)),
         'Today',
-        ...futureData.map(d => d.day_name.substring(0, 3))
+        ...futureData.map(d => d.label || d.day_name.substring(0, 3))
     ];
     
     const values = [
@@ -64,6 +64,19 @@ function addGraphToChat(graphData) {
         ...futureData.map(d => d.aqi)
     ];
     
+    // Prediction interval band (only future points have one)
+    const hasInterval = futureData.some(d => d.lower !== undefined);
+    const lowerValues = [
+        ...pastData.map(() => null),
+        null,
+        ...futureData.map(d => d.lower !== undefined ? d.lower : null)
+    ];
+    const upperValues = [
+        ...pastData.map(() => null),
+        null,
+        ...futureData.map(d => d.upper !== undefined ? d.upper : null)
+    ];
+    
     // Destroy existing chart if any
     if (aqiChart) {
         aqiChart.destroy();
@@ -91,14 +104,32 @@ function addGraphToChat(graphData) {
                         return index >= pastData.length ? [5, 5] : [];
                     }
                 }
-            }]
+            }, ...(hasInterval ? [{
+                label: 'Likely range',
+                data: upperValues,
+                borderWidth: 0,
+                pointRadius: 0,
+                backgroundColor: 'rgba(102, 126, 234, 0.2)',
+                tension: 0.4,
+                fill: '+1'
+            }, {
+                label: '',
+                data: lowerValues,
+                borderWidth: 0,
+                pointRadius: 0,
+                tension: 0.4,
+                fill: false
+            }] : [])]
         },
         options: {
             responsive: true,
             maintainAspectRatio: true,
             plugins: {
                 legend: {
-                    display: true
+                    display: true,
+                    labels: {
+                        filter: item => item.text !== ''
+                    }
                 },
                 tooltip: {
                     callbacks: {
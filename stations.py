@@ -0,0 +1,91 @@
+"""Station-level readings within a city"""
+import re
+
+import numpy as np
+
+POLLUTANTS = ['pm25', 'pm10', 'o3', 'no2', 'so2', 'co']
+
+
+def parse_bounds(data):
+    """Stations with a current reading from a WAQI map/bounds payload"""
+    if not isinstance(data, dict) or data.get('status') != 'ok' or not isinstance(data.get('data'), list):
+        return None
+    stations = []
+    for entry in data['data']:
+        try:
+            aqi = float(entry['aqi'])
+        except (KeyError, TypeError, ValueError):
+            continue  # "-" for stations that are offline
+        name = entry.get('station', {}).get('name') or f"Station {entry['uid']}"
+        stations.append({'uid': entry['uid'], 'name': name, 'area': area_name(name),
+                         'lat': entry.get('lat'), 'lon': entry.get('lon'), 'aqi': aqi})
+    return stations
+
+
+def parse_station_feed(data):
+    """Pollutant readings from a station's WAQI feed payload"""
+    if not isinstance(data, dict) or data.get('status') != 'ok':
+        return None
+    iaqi = data['data'].get('iaqi', {})
+    reading = {pollutant: iaqi[pollutant]['v'] for pollutant in POLLUTANTS if pollutant in iaqi}
+    city = data['data'].get('city', {})
+    if city.get('name'):
+        reading['name'] = city['name']
+        reading['area'] = area_name(city['name'])
+    if len(city.get('geo') or []) == 2:
+        reading['lat'], reading['lon'] = city['geo']
+    try:
+        reading['aqi'] = float(data['data']['aqi'])
+    except (KeyError, TypeError, ValueError):
+        pass
+    return reading
+
+
+def area_name(station_name):
+    """Locality part of a WAQI station name ('Anand Vihar, Delhi - DPCC' -> 'Anand Vihar')"""
+    area = station_name.split(',')[0].split(' - ')[0]
+    return re.sub(r'\s+', ' ', area).strip()
+
+
+def summarize(stations):
+    """City-wide summary across stations: count, mean, median, range and extremes"""
+    if not stations:
+        return None
+    aqi = np.array([station['aqi'] for station in stations], dtype=np.float64)
+    worst, best = int(np.argmax(aqi)), int(np.argmin(aqi))
+    return {
+        'stations': len(stations),
+        'mean': round(float(aqi.mean()), 1),
+        'median': round(float(np.median(aqi)), 1),
+        'min': float(aqi[best]),
+        'max': float(aqi[worst]),
+        'best_area': stations[best]['area'],
+        'worst_area': stations[worst]['area']
+    }
+
+
+def by_area(stations):
+    """Mean AQI and pollutants per area, keyed by lower-cased area name"""
+    groups = {}
+    for station in stations:
+        groups.setdefault(station['area'].lower(), []).append(station)
+    areas = {}
+    for key, members in groups.items():
+        area = {'name': members[0]['area'], 'stations': len(members),
+                'aqi': round(float(np.mean([m['aqi'] for m in members])), 1)}
+        for pollutant in POLLUTANTS:
+            values = [m[pollutant] for m in members if m.get(pollutant) is not None]
+            if values:
+                area[pollutant] = round(float(np.mean(values)), 1)
+        areas[key] = area
+    return areas
+
+
+def find_area(message_lower, areas):
+    """Area key mentioned in a lower-cased message, longest name first"""
+    if not areas:
+        return None
+    for key in sorted(areas, key=len, reverse=True):
+        if len(key) >= 3 and re.search(rf'\b{re.escape(key)}\b', message_lower):
+            return key
+    return None
@@ -0,0 +1,57 @@
+import pytest
+
+from alerts import ThresholdIndex, check_webhook
+
+
+@pytest.fixture
+def index():
+    index = ThresholdIndex()
+    for threshold, subscription_id in [(150, 'b'), (100, 'a'), (200, 'c'), (150, 'b2')]:
+        index.add(threshold, subscription_id)
+    return index
+
+
+def test_thresholds_are_kept_sorted(index):
+    assert index.thresholds == [100, 150, 150, 200]
+    assert index.ids == ['a', 'b', 'b2', 'c']
+
+
+def test_first_evaluation_crosses_everything_below_the_level(index):
+    assert index.crossed(160) == ['a', 'b', 'b2']
+
+
+def test_rising_level_crosses_only_the_new_thresholds(index):
+    index.crossed(120)
+    assert index.crossed(210) == ['b', 'b2', 'c']
+    assert index.crossed(210) == []
+
+
+def test_level_must_go_above_the_threshold(index):
+    assert index.crossed(150) == ['a']
+    assert index.crossed(150.5) == ['b', 'b2']
+
+
+def test_falling_level_notifies_nobody_but_rearms(index):
+    index.crossed(160)
+    assert index.crossed(90) == []
+    # Back above after dropping below: notified again
+    assert index.crossed(155) == ['a', 'b', 'b2']
+
+
+def test_removed_subscription_is_not_crossed(index):
+    index.remove(150, 'b')
+    assert index.crossed(160) == ['a', 'b2']
+    assert len(index) == 3
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/hook', 'http://10.0.0.5/hook', 'http://169.254.169.254/latest/meta-data',
+    'http://[::1]/hook', 'http://[::ffff:127.0.0.1]/hook', 'http://224.0.0.1/hook', 'ftp://8.8.8.8/hook',
+])
+def test_webhooks_to_non_public_addresses_are_rejected(url):
+    with pytest.raises(ValueError):
+        check_webhook(url)
+
+
+def test_webhook_to_public_address_is_accepted():
+    check_webhook('https://8.8.8.8/hook')
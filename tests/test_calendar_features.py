@@ -0,0 +1,84 @@
+import math
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import calendar_features
+from calendar_features import COLUMNS, calendar_frame, calendar_row
+from ml_model import AQIPredictor
+
+
+def expected_fields(day):
+    """Date fields derived directly from a datetime, as build_features used to"""
+    month, dow, doy = day.month, day.weekday(), day.timetuple().tm_yday
+    return {
+        'month': month,
+        'day_of_week': dow,
+        'day_of_year': doy,
+        'is_winter': int(month in (11, 12, 1, 2)),
+        'is_monsoon': int(month in (7, 8, 9)),
+        'is_summer': int(month in (4, 5, 6)),
+        'month_sin': math.sin(2 * math.pi * month / 12),
+        'month_cos': math.cos(2 * math.pi * month / 12),
+        'dow_sin': math.sin(2 * math.pi * dow / 7),
+        'dow_cos': math.cos(2 * math.pi * dow / 7),
+        'doy_sin': math.sin(2 * math.pi * doy / 365.25),
+        'doy_cos': math.cos(2 * math.pi * doy / 365.25),
+    }
+
+
+DAYS = [datetime(2024, 1, 1), datetime(2024, 2, 29), datetime(2024, 12, 31), datetime(2025, 7, 15),
+        datetime(2026, 10, 19, 18, 30)]
+
+
+@pytest.mark.parametrize('day', DAYS)
+def test_calendar_row_matches_the_date(day):
+    row = calendar_row(day)
+    for name, value in expected_fields(day).items():
+        assert row[name] == pytest.approx(value), name
+
+
+def test_build_features_takes_the_target_dates_calendar():
+    predictor = AQIPredictor.__new__(AQIPredictor)
+    predictor.episodes = ['stubble_burning', 'diwali']
+    predictor.feature_names = ['month']
+    target = datetime(2025, 10, 21)
+    features = predictor.build_features({'pm25': 90}, target, datetime(2025, 10, 20), adjust=False)
+    assert {name: features[name] for name in COLUMNS} == calendar_row(target, predictor.episodes)
+
+
+def test_episode_and_holiday_flags():
+    # Diwali 2025 is October 20; the window runs from the day before to three days after
+    assert [calendar_row(date(2025, 10, d))['is_diwali'] for d in (18, 19, 23, 24)] == [0, 1, 1, 0]
+    assert calendar_row(date(2025, 10, 20))['is_holiday'] == 1
+    assert calendar_row(date(2025, 1, 26))['is_holiday'] == 1
+    assert [calendar_row(date(2025, m, d))['is_stubble_burning'] for m, d in ((10, 9), (10, 10), (11, 20), (11, 21))] \
+        == [0, 1, 1, 0]
+
+
+def test_episodes_a_city_does_not_list_are_zeroed():
+    day = date(2025, 10, 20)
+    assert calendar_row(day, [])['is_diwali'] == 0
+    assert calendar_row(day, [])['is_stubble_burning'] == 0
+    assert calendar_row(day, ['diwali'])['is_diwali'] == 1
+    assert calendar_row(day, ['diwali'])['is_stubble_burning'] == 0
+    assert calendar_frame(pd.Series([day]), [])['is_diwali'].tolist() == [0]
+
+
+def test_frame_matches_rows():
+    dates = pd.Series(pd.date_range('2024-12-25', periods=20, freq='D'), index=range(100, 120))
+    frame = calendar_frame(dates)
+    assert list(frame.index) == list(dates.index)
+    for i, day in zip(frame.index, dates):
+        assert frame.loc[i].to_dict() == calendar_row(day)
+
+
+def test_dates_outside_the_table_widen_it():
+    far = datetime(2040, 3, 1)
+    assert far.toordinal() > calendar_features.table.last
+    row = calendar_row(far)
+    assert row['month'] == 3 and row['is_diwali'] == 0
+    assert calendar_features.table.last >= far.toordinal()
+    for name, value in expected_fields(far - timedelta(days=1)).items():
+        assert calendar_row(far - timedelta(days=1))[name] == pytest.approx(value)
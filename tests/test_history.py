@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from history import compact_history, load_history, lookup_dates
+
+
+def raw_history():
+    return pd.DataFrame({
+        'date': ['2025-01-03', '2025-01-01', '2025-01-02', '2025-01-02', '2025-01-05'],
+        'aqi': [180.4, 150.0, 170.25, 165.0, 210.0],
+        'pm25': [90.0, 70.0, 85.5, 80.0, 120.0],
+        'city': ['delhi'] * 5,
+        'temp_pm25_interaction': [1.0] * 5,
+    })
+
+
+def test_compact_history_keeps_serving_columns_on_a_sorted_date_index():
+    history = compact_history(raw_history())
+    assert list(history.columns) == ['aqi', 'pm25']
+    assert all(dtype == np.float32 for dtype in history.dtypes)
+    assert list(history.index.strftime('%Y-%m-%d')) == ['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-05']
+    # The last row for a date wins, as a dict keyed on the date would keep
+    assert history.loc['2025-01-02', 'aqi'] == np.float32(165.0)
+
+
+def test_lookup_dates_matches_a_frame_lookup():
+    df = raw_history()
+    history = compact_history(df)
+    dates = pd.to_datetime(['2024-12-31', '2025-01-01', '2025-01-04', '2025-01-05', '2025-02-01', '2025-01-02'])
+    expected = (df.assign(date=pd.to_datetime(df['date']).dt.normalize())
+                  .drop_duplicates('date', keep='last').set_index('date')['aqi']
+                  .reindex(dates).to_numpy())
+    np.testing.assert_allclose(lookup_dates(history, dates, 'aqi'), expected, rtol=1e-6)
+
+
+def test_lookup_dates_without_history_or_column():
+    dates = pd.to_datetime(['2025-01-01'])
+    assert np.isnan(lookup_dates(None, dates, 'aqi')).all()
+    assert np.isnan(lookup_dates(compact_history(raw_history()), dates, 'pm10')).all()
+
+
+def test_load_history_reads_only_the_serving_columns(tmp_path):
+    path = tmp_path / 'history.csv'
+    raw_history().to_csv(path, index=False)
+    pd.testing.assert_frame_equal(load_history(path), compact_history(raw_history()))
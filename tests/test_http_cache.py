@@ -0,0 +1,90 @@
+import gzip
+
+from config import Config
+from http_cache import gzip_body, http_date, is_not_modified, make_etag, should_compress
+
+LAST_MODIFIED = 1760000000
+
+
+def test_etag_is_weak_and_follows_its_parts():
+    etag = make_etag('delhi', LAST_MODIFIED, 'v1')
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert make_etag('delhi', LAST_MODIFIED, 'v1') == etag
+    assert make_etag('delhi', LAST_MODIFIED, 'v2') != etag
+    assert make_etag('delhi', LAST_MODIFIED + 1, 'v1') != etag
+
+
+def test_if_none_match():
+    etag = make_etag('delhi', LAST_MODIFIED)
+    assert is_not_modified({'If-None-Match': etag}, etag, LAST_MODIFIED)
+    # Weak comparison, and any tag in the list
+    assert is_not_modified({'If-None-Match': etag.removeprefix('W/')}, etag, LAST_MODIFIED)
+    assert is_not_modified({'If-None-Match': f'"other", {etag}'}, etag, LAST_MODIFIED)
+    assert is_not_modified({'If-None-Match': '*'}, etag, LAST_MODIFIED)
+    assert not is_not_modified({'If-None-Match': make_etag('mumbai', LAST_MODIFIED)}, etag, LAST_MODIFIED)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = make_etag('delhi', LAST_MODIFIED)
+    headers = {'If-None-Match': '"stale"', 'If-Modified-Since': http_date(LAST_MODIFIED)}
+    assert not is_not_modified(headers, etag, LAST_MODIFIED)
+
+
+def test_if_modified_since():
+    etag = make_etag('delhi', LAST_MODIFIED)
+    assert is_not_modified({'If-Modified-Since': http_date(LAST_MODIFIED)}, etag, LAST_MODIFIED)
+    assert is_not_modified({'If-Modified-Since': http_date(LAST_MODIFIED + 60)}, etag, LAST_MODIFIED)
+    assert not is_not_modified({'If-Modified-Since': http_date(LAST_MODIFIED - 1)}, etag, LAST_MODIFIED)
+    # HTTP dates have whole seconds; a fractional Last-Modified still matches its own header
+    assert is_not_modified({'If-Modified-Since': http_date(LAST_MODIFIED + 0.7)}, etag, LAST_MODIFIED + 0.7)
+
+
+def test_unconditional_and_malformed_requests_get_the_full_response():
+    etag = make_etag('delhi', LAST_MODIFIED)
+    assert not is_not_modified({}, etag, LAST_MODIFIED)
+    assert not is_not_modified({'If-Modified-Since': 'yesterday'}, etag, LAST_MODIFIED)
+
+
+def test_should_compress():
+    large = b'x' * Config.COMPRESS_MIN_BYTES
+    gzip_ok = {'Accept-Encoding': 'br, GZIP'}
+    assert should_compress(gzip_ok, large, 'application/json')
+    assert should_compress(gzip_ok, large, 'text/html; charset=utf-8')
+    assert not should_compress(gzip_ok, large[1:], 'application/json')
+    assert not should_compress({}, large, 'application/json')
+    assert not should_compress(gzip_ok, large, 'image/png')
+
+
+def test_gzip_body_round_trips():
+    body = b'{"response": "AQI 180"}' * 50
+    assert gzip.decompress(gzip_body(body)) == body
+
+
+class Stub:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+def forecast_chatbot(fetched_at=LAST_MODIFIED, model_version=LAST_MODIFIED - 3600, weather_updated_at=0):
+    from chatbot import AQIChatbot
+
+    chatbot = AQIChatbot.__new__(AQIChatbot)
+    chatbot.city = 'delhi'
+    fetcher = Stub(get_snapshot=lambda: {'fetched_at': fetched_at})
+    predictor = Stub(model_version=model_version, weather_forecast=Stub(updated_at=weather_updated_at))
+    chatbot.registry = Stub(get_fetcher=lambda city: fetcher, get_predictor=lambda city: predictor)
+    return chatbot
+
+
+def test_forecast_is_revalidated_when_any_input_changes():
+    etag, last_modified = forecast_chatbot().forecast_validators({})
+    assert last_modified == LAST_MODIFIED
+    headers = {'If-None-Match': etag, 'If-Modified-Since': http_date(last_modified)}
+    assert is_not_modified(headers, *forecast_chatbot().forecast_validators({}))
+
+    for changed in (forecast_chatbot(fetched_at=LAST_MODIFIED + 300),
+                    forecast_chatbot(model_version=LAST_MODIFIED + 60),
+                    forecast_chatbot(weather_updated_at=LAST_MODIFIED + 120)):
+        assert not is_not_modified(headers, *changed.forecast_validators({}))
+    # A stale snapshot served on an upstream failure is not the fresh one the client holds
+    assert not is_not_modified(headers, *forecast_chatbot().forecast_validators({'stale': True}))
@@ -0,0 +1,60 @@
+import math
+
+import pytest
+
+from rate_limit import RateLimiter, TokenBucket, parse_limits, retry_after_header
+
+
+def test_parse_limits():
+    assert parse_limits('default=2/20, prediction=0.5/10,graph=3,') == {
+        'default': (2.0, 20.0), 'prediction': (0.5, 10.0), 'graph': (3.0, 3.0)}
+
+
+def test_bucket_allows_a_full_burst_then_waits():
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(now) == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    now = bucket.updated
+    for _ in range(3):
+        bucket.take(now)
+    # Half a second refills one token
+    assert bucket.take(now + 0.5) == 0.0
+    assert bucket.take(now + 0.5) > 0
+    # A long idle spell refills to the burst, never beyond it
+    now += 100
+    assert [bucket.take(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(now) > 0
+
+
+def test_zero_rate_never_refills():
+    bucket = TokenBucket(rate=0.0, burst=1.0)
+    now = bucket.updated
+    assert bucket.take(now) == 0.0
+    assert bucket.take(now + 1000) == math.inf
+
+
+def test_limiter_keys_on_client_and_intent():
+    limiter = RateLimiter({'default': (1.0, 1.0), 'graph': (1.0, 2.0)}, enabled=True)
+    assert limiter.check('a', 'graph') == 0.0
+    assert limiter.check('a', 'graph') == 0.0
+    assert limiter.check('a', 'graph') > 0
+    # Another client, and intents sharing the default bucket, are unaffected
+    assert limiter.check('b', 'graph') == 0.0
+    assert limiter.check('a', 'greeting') == 0.0
+    assert limiter.check('a', 'help') > 0
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = RateLimiter({'default': (0.0, 1.0)}, enabled=False)
+    assert all(limiter.check('a', 'graph') == 0.0 for _ in range(10))
+
+
+def test_retry_after_header():
+    assert retry_after_header(0.2) == '1'
+    assert retry_after_header(2.1) == '3'
+    assert retry_after_header(math.inf) == '3600'
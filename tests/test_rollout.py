@@ -0,0 +1,113 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_model import AQIPredictor
+from rollout import DEFAULT_LAG, DEFAULT_STD, LAG_OFFSETS, LagState, Rollout, history_features
+from weather_forecast import ForecastWeatherProvider
+
+CONDITIONS = {'temp': 25.0, 'humidity': 60, 'pressure': 1010, 'wind_speed': 1.5, 'wind_deg': 180,
+              'clouds': 20, 'pm25': 90, 'pm10': 150, 'o3': 30, 'no2': 40, 'so2': 10, 'co': 1.0}
+
+
+@pytest.fixture
+def predictor():
+    """A daily predictor without a trained model whose matrix calls are recorded"""
+    predictor = AQIPredictor.__new__(AQIPredictor)
+    predictor.city = 'delhi'
+    predictor.episodes = []
+    predictor.feature_names = ['temp', 'humidity', 'pressure', 'wind_speed', 'wind_deg', 'clouds',
+                               'pm25', 'pm10', 'month', 'day_of_week']
+    predictor.recent_aqi_values = []
+    predictor.weather_forecast = ForecastWeatherProvider('delhi', enabled=True)
+    predictor.matrices = []
+
+    def predict_matrix(X, trend=None, intervals=True):
+        predictor.matrices.append(X.copy())
+        return np.full(len(X), 100.0), None, None
+
+    predictor.predict_matrix = predict_matrix
+    return predictor
+
+
+def set_grid(provider, days):
+    """Serve a fixed forecast grid for the next `days` days without fetching"""
+    today = datetime.now().date()
+    provider.daily = {today + timedelta(days=i): {'temp': 5.0 + i, 'humidity': 40.0, 'pressure': 1000.0,
+                                                  'wind_speed': 9.0 + i, 'wind_deg': 90.0, 'clouds': 10.0}
+                      for i in range(1, days + 1)}
+    provider.next_fetch = time.monotonic() + 3600
+
+
+def test_rollout_from_now_uses_forecast_weather(predictor):
+    set_grid(predictor.weather_forecast, 5)
+    Rollout(predictor).run([CONDITIONS], 5)
+
+    temp = predictor.feature_names.index('temp')
+    wind = predictor.feature_names.index('wind_speed')
+    for step, X in enumerate(predictor.matrices):
+        assert X[0, temp] == 5.0 + step + 1
+        assert X[0, wind] == 9.0 + step + 1
+
+
+def test_rollout_from_past_origin_ignores_forecast_weather(predictor):
+    set_grid(predictor.weather_forecast, 5)
+    Rollout(predictor).run([CONDITIONS], 5, start=datetime.now() - timedelta(days=1))
+
+    wind = predictor.feature_names.index('wind_speed')
+    assert all(X[0, wind] == CONDITIONS['wind_speed'] for X in predictor.matrices)
+
+
+def pandas_lags(series):
+    """Lag and rolling features as training computes them (ml_model.add_lag_features)"""
+    df = AQIPredictor.add_lag_features(None, pd.DataFrame({'aqi': series}))
+    return df
+
+
+def test_lag_state_matches_pandas_lag_features():
+    rng = np.random.default_rng(0)
+    aqi = rng.uniform(50, 300, 40)
+    expected = pandas_lags(aqi)
+    # Seed from the first 10 days, then push the rest one at a time so the
+    # ring buffer wraps several times
+    state = LagState([aqi[:10]])
+    for i in range(10, len(aqi)):
+        features = state.features()
+        # Features for day i are the lags of day i and the rolling window up to day i - 1
+        for name, offset in LAG_OFFSETS.items():
+            assert features[name][0] == pytest.approx(aqi[i - offset])
+        assert features['aqi_rolling_mean_7'][0] == pytest.approx(expected['aqi_rolling_mean_7'][i - 1])
+        assert features['aqi_rolling_std_7'][0] == pytest.approx(expected['aqi_rolling_std_7'][i - 1])
+        assert state.trend()[0] == pytest.approx(aqi[i - 1] - aqi[i - 3])
+        state.push([aqi[i]])
+
+
+def test_lag_state_rolls_many_series_independently():
+    histories = [[100.0] * 7, [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0]]
+    state = LagState(histories)
+    state.push([200.0, 80.0])
+    features = state.features()
+    assert features['aqi_lag1'].tolist() == [200.0, 80.0]
+    assert features['aqi_lag7'].tolist() == [100.0, 20.0]
+    assert features['aqi_rolling_mean_7'] == pytest.approx([(6 * 100 + 200) / 7, 50.0])
+
+
+def test_short_history_uses_defaults():
+    state = LagState([[120.0]])
+    features = state.features()
+    assert features['aqi_lag1'][0] == 120.0
+    assert features['aqi_lag3'][0] == DEFAULT_LAG
+    assert features['aqi_rolling_std_7'][0] == DEFAULT_STD
+    assert state.trend()[0] == 0.0
+
+
+def test_history_features_skips_missing_values():
+    history = (100.0, float('nan'), 110.0, 120.0, 130.0, 140.0, 150.0, 160.0, 170.0)
+    features = history_features(history)
+    assert features['aqi_lag1'] == 170.0
+    assert features['aqi_lag7'] == 110.0
+    assert features['aqi_rolling_mean_7'] == pytest.approx(140.0)
+    assert features['aqi_rolling_std_7'] == pytest.approx(pd.Series(history[2:]).std())
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'answer'
+
+    run_concurrently(5, lambda: results.append(flight.do('key', slow)))
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == 'answer' for result, _ in results)
+
+
+def test_exception_reaches_every_caller():
+    flight = SingleFlight()
+    errors = []
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError('upstream down')
+
+    def call():
+        try:
+            flight.do('key', failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_concurrently(3, call)
+    assert errors == ['upstream down'] * 3
+
+
+def test_nothing_is_cached_after_the_call():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do('key', lambda: next(counter)) == (0, False)
+    assert flight.do('key', lambda: next(counter)) == (1, False)
+    assert flight.calls == {}
+
+
+def test_failed_call_is_not_remembered():
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do('key', lambda: (_ for _ in ()).throw(RuntimeError('once')))
+    assert flight.do('key', lambda: 'recovered') == ('recovered', False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == (1, False)
+    assert flight.do('b', lambda: 2) == (2, False)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+
+from tree_compiler import CompiledEnsemble, float32_boundary, load_compiled, save_compiled
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    """Small ensemble on a mix of continuous and integer-valued features, like the calendar columns"""
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.normal(20, 8, 600), rng.integers(1, 13, 600), rng.integers(0, 7, 600),
+                         rng.uniform(0, 400, 600)])
+    y = 2 * X[:, 0] + 10 * np.isin(X[:, 1], [11, 12, 1]) + 0.3 * X[:, 3] + rng.normal(0, 5, 600)
+    scaler = StandardScaler().fit(X)
+    model = GradientBoostingRegressor(n_estimators=40, max_depth=4, random_state=0)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, X
+
+
+def split_points(model):
+    """(feature, threshold) of every split node, in the model's (scaled) feature space"""
+    points = []
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        nodes = np.flatnonzero(tree.children_left != -1)
+        points += zip(tree.feature[nodes], tree.threshold[nodes])
+    return points
+
+
+def test_matches_sklearn_on_training_and_new_rows(fitted):
+    model, scaler, X = fitted
+    compiled = CompiledEnsemble.from_sklearn(model, scaler)
+    rng = np.random.default_rng(1)
+    X_new = X[rng.permutation(len(X))] + rng.normal(0, 1, X.shape)
+    for rows in (X, X_new, X[:1]):
+        np.testing.assert_allclose(compiled.predict(rows), model.predict(scaler.transform(rows)), atol=1e-9)
+
+
+def test_float32_boundary_is_where_the_float32_cast_changes_the_comparison():
+    rng = np.random.default_rng(2)
+    threshold = np.concatenate([rng.normal(0, 3, 10000), rng.integers(-5, 5, 1000) + 0.5])
+    boundary = float32_boundary(threshold)
+    as_sklearn = lambda v: v.astype(np.float32).astype(np.float64) <= threshold
+    assert as_sklearn(boundary).all()
+    assert not as_sklearn(np.nextafter(boundary, np.inf)).any()
+
+
+def test_matches_sklearn_at_the_split_thresholds(fitted):
+    model, _, X = fitted
+    # Without a scaler the folded threshold is the float32 boundary itself,
+    # so rows can sit exactly on it and one ulp either side
+    compiled = CompiledEnsemble.from_sklearn(model)
+    rows = []
+    for feature, threshold in split_points(model):
+        boundary = float32_boundary(np.array([threshold]))[0]
+        for value in (threshold, boundary, np.nextafter(boundary, np.inf), np.nextafter(boundary, -np.inf)):
+            row = X[0].copy()
+            row[feature] = value
+            rows.append(row)
+    rows = np.array(rows)
+    np.testing.assert_allclose(compiled.predict(rows), model.predict(rows), atol=1e-9)
+
+
+def test_round_trips_through_npz(fitted, tmp_path):
+    model, scaler, X = fitted
+    point = CompiledEnsemble.from_sklearn(model, scaler)
+    path = tmp_path / 'compiled.npz'
+    save_compiled(path, point, [point])
+    loaded, quantiles = load_compiled(path)
+    assert len(quantiles) == 1
+    np.testing.assert_array_equal(loaded.predict(X), point.predict(X))
+
+
+def test_older_export_format_is_not_loaded(fitted, tmp_path):
+    model, scaler, _ = fitted
+    arrays = CompiledEnsemble.from_sklearn(model, scaler).to_arrays('point_')
+    path = tmp_path / 'old.npz'
+    np.savez(path, n_quantiles=np.array(0), **arrays)
+    assert load_compiled(path) is None
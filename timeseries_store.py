@@ -0,0 +1,214 @@
+"""Time-series store: every live snapshot, rolled up into hourly and daily means"""
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from config import Config
+
+COLUMNS = ['aqi', 'pm25', 'pm10', 'o3', 'no2', 'so2', 'co',
+           'temp', 'humidity', 'pressure', 'wind_speed', 'wind_deg', 'clouds']
+
+SCHEMA = [
+    # hour/day are local wall-clock hours and days since the epoch, the
+    # same convention as hourly_model.to_hour_key
+    "CREATE TABLE IF NOT EXISTS readings (ts REAL PRIMARY KEY, hour INTEGER NOT NULL, day INTEGER NOT NULL, "
+    + ', '.join(f'{column} REAL' for column in COLUMNS) + ')',
+    "CREATE INDEX IF NOT EXISTS readings_hour ON readings (hour)",
+    "CREATE INDEX IF NOT EXISTS readings_day ON readings (day)",
+    "CREATE TABLE IF NOT EXISTS hourly (hour INTEGER PRIMARY KEY, n INTEGER, "
+    + ', '.join(f'{column} REAL' for column in COLUMNS) + ')',
+    "CREATE TABLE IF NOT EXISTS daily (day INTEGER PRIMARY KEY, n INTEGER, "
+    + ', '.join(f'{column} REAL' for column in COLUMNS) + ')',
+]
+INSERT = (f"INSERT OR REPLACE INTO readings (ts, hour, day, {', '.join(COLUMNS)}) "
+          f"VALUES ({', '.join('?' * (len(COLUMNS) + 3))})")
+
+
+def rollup_sql(table, key):
+    """Recompute the rollup rows from the newest one already stored onwards"""
+    means = ', '.join(f'AVG({column})' for column in COLUMNS)
+    return (f"INSERT OR REPLACE INTO {table} ({key}, n, {', '.join(COLUMNS)}) "
+            f"SELECT {key}, COUNT(*), {means} FROM readings "
+            f"WHERE {key} >= (SELECT COALESCE(MAX({key}), 0) FROM {table}) GROUP BY {key}")
+
+
+def hour_key(ts):
+    """Local wall-clock hours since the epoch for a Unix timestamp"""
+    local = datetime.fromtimestamp(ts)
+    return (local - datetime(1970, 1, 1)).days * 24 + local.hour
+
+
+def day_key(date):
+    """Days since the epoch for a date or datetime"""
+    return (pd.Timestamp(date).normalize() - pd.Timestamp('1970-01-01')).days
+
+
+class TimeSeriesStore:
+    """Per-city SQLite store of live readings with hourly and daily rollups"""
+
+    def __init__(self, city=None, path=None, enabled=None, rollup_seconds=None):
+        self.path = path or Config.get_city_paths(city)['timeseries']
+        self.enabled = Config.TIMESERIES_ENABLED if enabled is None else enabled
+        self.rollup_seconds = rollup_seconds or Config.TIMESERIES_ROLLUP_SECONDS
+        self.queue = queue.Queue(maxsize=1000)
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def append(self, data, fetched_at=None):
+        """Queue one snapshot for the writer; never blocks the caller"""
+        if not self.enabled or not data:
+            return
+        if self.writer is None:
+            self.start()
+        ts = fetched_at or time.time()
+        hour = hour_key(ts)
+        row = (ts, hour, hour // 24, *[self.number(data.get(column)) for column in COLUMNS])
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            print(f"Time-series store is behind; dropped reading for {self.path}")
+
+    @staticmethod
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def start(self):
+        with self.lock:
+            if self.writer is not None:
+                return
+            writer = threading.Thread(target=self.write_loop, name='timeseries', daemon=True)
+            writer.start()
+            self.writer = writer
+            atexit.register(self.close)
+
+    def write_loop(self):
+        connection = self.connect()
+        pending = False
+        last_rollup = 0.0
+        while True:
+            # Roll up at most every rollup_seconds, and only after new readings
+            timeout = max(0.0, last_rollup + self.rollup_seconds - time.monotonic()) if pending else None
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = ()
+            if row is None:
+                break
+            if row:
+                self.write(connection, row)
+                pending = True
+            if pending and time.monotonic() - last_rollup >= self.rollup_seconds:
+                self.rollup(connection)
+                pending = False
+                last_rollup = time.monotonic()
+        if pending:
+            self.rollup(connection)
+        connection.close()
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def write(self, connection, row):
+        try:
+            with connection:
+                connection.execute(INSERT, row)
+        except sqlite3.Error as e:
+            print(f"Error writing time-series reading: {e}")
+
+    def rollup(self, connection=None):
+        """Fold readings since the last rolled-up hour and day into the rollup tables"""
+        own = connection is None
+        connection = connection or self.connect()
+        try:
+            with connection:
+                connection.execute(rollup_sql('hourly', 'hour'))
+                connection.execute(rollup_sql('daily', 'day'))
+        except sqlite3.Error as e:
+            print(f"Error rolling up time-series readings: {e}")
+        finally:
+            if own:
+                connection.close()
+
+    def close(self):
+        """Write queued readings, roll them up and stop the writer"""
+        if self.writer is None:
+            return
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+        self.writer = None
+
+    def daily_values(self, dates, column='aqi'):
+        """Daily mean of a column for each date, NaN where there are no readings"""
+        values = np.full(len(dates), np.nan)
+        if not self.enabled or not len(dates) or not os.path.exists(self.path):
+            return values
+        keys = [day_key(date) for date in dates]
+        rows = self.query(f"SELECT day, {column} FROM daily WHERE day BETWEEN ? AND ?",
+                          (min(keys), max(keys)))
+        found = {day: value for day, value in rows if value is not None}
+        for i, key in enumerate(keys):
+            values[i] = found.get(key, np.nan)
+        return values
+
+    def hourly_values(self, columns):
+        """Hour keys and hourly means of the columns, oldest first, NaN where there were no readings"""
+        if not self.enabled or not os.path.exists(self.path):
+            return np.array([], dtype=np.int64), {column: np.array([]) for column in columns}
+        rows = self.query(f"SELECT hour, {', '.join(columns)} FROM hourly ORDER BY hour")
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns) + 1)
+        return values[:, 0].astype(np.int64), {column: values[:, i + 1] for i, column in enumerate(columns)}
+
+    def query(self, sql, params=()):
+        try:
+            connection = sqlite3.connect(self.path)
+            try:
+                return connection.execute(sql, params).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Error reading time-series store: {e}")
+            return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show daily rollups from the time-series store')
+    parser.add_argument('--city', default=None, help='City key (default: DEFAULT_CITY)')
+    parser.add_argument('--days', type=int, default=14, help='Days to show, ending today')
+    args = parser.parse_args()
+
+    store = TimeSeriesStore(args.city, enabled=True)
+    if not os.path.exists(store.path):
+        raise SystemExit(f"No time-series store at {store.path}")
+    store.rollup()
+    today = pd.Timestamp(datetime.now().date())
+    first = day_key(today) - args.days + 1
+    rows = store.query("SELECT day, n, aqi, pm25 FROM daily WHERE day BETWEEN ? AND ? ORDER BY day",
+                       (first, day_key(today)))
+    if not rows:
+        raise SystemExit("No readings in that range")
+    print(f"{'date':10s} {'readings':>8s} {'aqi':>7s} {'pm25':>7s}")
+    for day, n, aqi, pm25 in rows:
+        date = pd.Timestamp('1970-01-01') + pd.Timedelta(days=day)
+        print(f"{date:%Y-%m-%d} {n:8d} {aqi if aqi is not None else float('nan'):7.1f} "
+              f"{pm25 if pm25 is not None else float('nan'):7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Flatten a fitted GradientBoostingRegressor into contiguous NumPy arrays"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Bumped when the folded thresholds change meaning; older exports are rebuilt
+EXPORT_FORMAT = 3
+
+
+def float32_boundary(threshold):
+    """Largest v such that float32(v) <= threshold, as sklearn compares, for float64 v
+
+    The float32 values at or below the threshold end at t32; every float64
+    below the midpoint between t32 and the next float32 rounds to t32 or
+    below. The midpoint itself rounds to even, so it is only included when
+    t32 is the even one.
+    """
+    t32 = threshold.astype(np.float32)
+    t32 = np.where(t32.astype(np.float64) > threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+    above = np.nextafter(t32, np.float32(np.inf))
+    midpoint = (t32.astype(np.float64) + above.astype(np.float64)) / 2
+    return np.where(midpoint.astype(np.float32) > t32, np.nextafter(midpoint, -np.inf), midpoint)
+
+
+class CompiledEnsemble:
+    """Tree ensemble stored as padded [n_trees, max_nodes] arrays"""
+
+    def __init__(self, feature, threshold, left, right, value, init, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value  # leaf values, already scaled by the learning rate
+        self.init = float(init)
+        self.max_depth = int(max_depth)
+
+        # Flat views with children as global node indices, so each traversal
+        # step is a handful of 1-D np.take calls
+        n_trees, max_nodes = feature.shape
+        self.roots = np.arange(n_trees) * max_nodes
+        offsets = self.roots[:, None]
+        self.flat_feature = feature.ravel()
+        self.flat_threshold = threshold.ravel()
+        self.flat_left = (left + offsets).ravel()
+        self.flat_right = (right + offsets).ravel()
+        self.flat_value = value.ravel()
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """Compile a fitted single-output GradientBoostingRegressor"""
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        n_trees = len(trees)
+        max_nodes = max(tree.node_count for tree in trees)
+        n_features = model.n_features_in_
+
+        if model.init_ == 'zero':
+            init = 0.0
+        else:
+            baseline = model.init_.predict(np.zeros((2, n_features)))
+            if not np.allclose(baseline, baseline[0]):
+                raise ValueError("Only constant init estimators can be compiled")
+            init = float(baseline[0])
+
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if getattr(scaler, 'mean_', None) is not None:
+                mean = scaler.mean_
+            if getattr(scaler, 'scale_', None) is not None:
+                scale = scaler.scale_
+
+        feature = np.zeros((n_trees, max_nodes), dtype=np.intp)
+        threshold = np.zeros((n_trees, max_nodes))
+        # Padding and leaf nodes point at themselves so every row can take
+        # max_depth steps without branching on "is this a leaf"
+        self_index = np.arange(max_nodes)
+        left = np.tile(self_index, (n_trees, 1))
+        right = left.copy()
+        value = np.zeros((n_trees, max_nodes))
+
+        for t, tree in enumerate(trees):
+            n = tree.node_count
+            split = tree.children_left != -1
+            nodes = np.flatnonzero(split)
+            features = tree.feature[nodes]
+            feature[t, nodes] = features
+            # float32(x_scaled) <= thr  <=>  x_scaled <= boundary
+            #                          <=>  x <= boundary * scale + mean  (scale > 0)
+            boundary = float32_boundary(tree.threshold[nodes])
+            threshold[t, nodes] = boundary * scale[features] + mean[features]
+            left[t, nodes] = tree.children_left[nodes]
+            right[t, nodes] = tree.children_right[nodes]
+            value[t, :n] = tree.value[:, 0, 0] * model.learning_rate
+
+        max_depth = max(tree.max_depth for tree in trees)
+        return cls(feature, threshold, left, right, value, init, max_depth)
+
+    def predict(self, X):
+        """Evaluate all trees for a batch of raw (unscaled) feature rows"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        X_flat = X.ravel()
+
+        # One row per sample, one column per tree; every tree advances one
+        # level per step until all reach a (self-looping) leaf
+        node = np.tile(self.roots, (n_rows, 1))
+        for _ in range(self.max_depth):
+            values = X_flat.take(row_offsets + self.flat_feature.take(node))
+            go_left = values <= self.flat_threshold.take(node)
+            node = np.where(go_left, self.flat_left.take(node), self.flat_right.take(node))
+        return self.init + self.flat_value.take(node).sum(axis=1)
+
+    def to_arrays(self, prefix=''):
+        return {
+            f'{prefix}feature': self.feature,
+            f'{prefix}threshold': self.threshold,
+            f'{prefix}left': self.left,
+            f'{prefix}right': self.right,
+            f'{prefix}value': self.value,
+            f'{prefix}meta': np.array([self.init, self.max_depth])
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=''):
+        init, max_depth = arrays[f'{prefix}meta']
+        return cls(arrays[f'{prefix}feature'], arrays[f'{prefix}threshold'],
+                   arrays[f'{prefix}left'], arrays[f'{prefix}right'],
+                   arrays[f'{prefix}value'], init, max_depth)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value))
+
+
+def save_compiled(path, point, quantiles=None):
+    """Write the point ensemble and optional quantile ensembles to one .npz file"""
+    arrays = point.to_arrays('point_')
+    for i, ensemble in enumerate(quantiles or []):
+        arrays.update(ensemble.to_arrays(f'q{i}_'))
+    arrays['n_quantiles'] = np.array(len(quantiles or []))
+    arrays['format'] = np.array(EXPORT_FORMAT)
+    np.savez(path, **arrays)
+
+
+def load_compiled(path):
+    """Load (point, quantile list) written by save_compiled; None for an older export format"""
+    with np.load(path) as arrays:
+        if 'format' not in arrays or int(arrays['format']) != EXPORT_FORMAT:
+            return None
+        point = CompiledEnsemble.from_arrays(arrays, 'point_')
+        quantiles = [CompiledEnsemble.from_arrays(arrays, f'q{i}_')
+                     for i in range(int(arrays['n_quantiles']))]
+    return point, quantiles
+
+
+def verify(compiled, model, scaler, X, feature_names=None):
+    """Largest absolute difference between compiled and sklearn predictions"""
+    X_scaled = scaler.transform(pd.DataFrame(X, columns=feature_names) if feature_names else X)
+    return float(np.max(np.abs(compiled.predict(X) - model.predict(X_scaled))))
+
+
+def training_rows(predictor):
+    """Raw feature rows built from the predictor's history CSV the way training builds them"""
+    df = pd.read_csv(predictor.paths['history'])
+    df = predictor.add_temporal_features(df)
+    df = predictor.add_interaction_features(df)
+    df = predictor.add_lag_features(df)
+    return df[predictor.feature_names].to_numpy(dtype=np.float64)
+
+
+def time_per_call(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    from ml_model import AQIPredictor
+
+    parser = argparse.ArgumentParser(description='Export and verify the compiled tree ensemble')
+    parser.add_argument('--city', default=None, help='City key (default: DEFAULT_CITY)')
+    parser.add_argument('--rows', type=int, default=None, help='Latest history rows used for verification (default: all)')
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    predictor = AQIPredictor(args.city)
+    if predictor.model is None:
+        raise SystemExit("No trained model to compile")
+    model, scaler, feature_names = predictor.model, predictor.scaler, predictor.feature_names
+    models = [model] + (predictor.quantile_models['models'] if predictor.quantile_models else [])
+    compiled = [CompiledEnsemble.from_sklearn(m, scaler) for m in models]
+
+    # Verify on the real feature rows, where integer-valued and repeated
+    # features sit right next to split thresholds
+    X = training_rows(predictor)[-args.rows if args.rows else 0:]
+    error = max(verify(c, m, scaler, X, feature_names) for c, m in zip(compiled, models))
+    print(f"Max abs difference vs sklearn: {error:.3g} over {len(X)} history rows")
+
+    X_one = X[:1]
+    frame = pd.DataFrame(X_one, columns=feature_names)
+    print(f"sklearn  {time_per_call(lambda: model.predict(scaler.transform(frame))):9.1f} µs per single-row call")
+    print(f"compiled {time_per_call(lambda: compiled[0].predict(X_one)):9.1f} µs per single-row call")
+
+    if error > args.tolerance:
+        raise SystemExit(f"Compiled ensemble differs from sklearn by more than {args.tolerance}")
+
+    save_compiled(predictor.paths['compiled_model'], compiled[0], compiled[1:])
+    print(f"Compiled ensemble written to {predictor.paths['compiled_model']}")
+
+
+if __name__ == '__main__':
+    main()
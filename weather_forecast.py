@@ -0,0 +1,163 @@
+"""Forecast weather for future target dates from OpenWeather's 3-hour grid"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+import numpy as np
+import pandas as pd
+import requests
+from circuit_breaker import CircuitBreaker
+from config import Config
+
+WEATHER_COLUMNS = ['temp', 'humidity', 'pressure', 'wind_speed', 'wind_deg', 'clouds']
+# Days with fewer 3-hour steps (the ends of the grid) would be biased
+# towards the hours they cover
+MIN_STEPS_PER_DAY = 4
+
+
+def parse_forecast(payload):
+    """3-hour forecast steps as a DataFrame with a UTC `timestamp` (dt_txt) and local `date`"""
+    if not isinstance(payload, dict) or 'list' not in payload:
+        return None
+    offset = timedelta(seconds=payload.get('city', {}).get('timezone', 0))
+    rows = []
+    for item in payload['list']:
+        rows.append({
+            'timestamp': item['dt_txt'],
+            'date': (datetime.fromtimestamp(item['dt'], timezone.utc) + offset).date(),
+            'temp': item['main']['temp'],
+            'humidity': item['main']['humidity'],
+            'pressure': item['main']['pressure'],
+            'wind_speed': item['wind']['speed'],
+            'wind_deg': item['wind'].get('deg', 0),
+            'clouds': item['clouds']['all']
+        })
+    return pd.DataFrame(rows) if rows else None
+
+
+def daily_weather(steps):
+    """{date: weather features} averaged over each day's steps; wind direction as a vector mean"""
+    daily = {}
+    for date, day in steps.groupby('date'):
+        if len(day) < MIN_STEPS_PER_DAY:
+            continue
+        features = {column: round(float(day[column].mean()), 2) for column in WEATHER_COLUMNS}
+        radians = np.deg2rad(day['wind_deg'].to_numpy(dtype=np.float64))
+        features['wind_deg'] = round(float(np.rad2deg(np.arctan2(np.sin(radians).mean(),
+                                                                  np.cos(radians).mean())) % 360), 1)
+        daily[date] = features
+    return daily
+
+
+class ForecastWeatherProvider:
+    """Caches a city's OpenWeather forecast grid as daily weather features"""
+
+    def __init__(self, city=None, ttl=None, enabled=None):
+        city_config = Config.get_city(city)
+        self.city = city_config['key']
+        self.coords = city_config['coords']
+        self.ttl = Config.WEATHER_FORECAST_TTL if ttl is None else ttl
+        self.enabled = Config.WEATHER_FORECAST_ENABLED if enabled is None else enabled
+        self.breaker = CircuitBreaker(f"openweather-forecast:{self.city}")
+        self.daily = {}
+        self.updated_at = 0.0  # when a fetch last changed the daily weather
+        self.next_fetch = 0.0  # monotonic time the cache expires
+        self.refreshing = False  # a refresh is in flight
+        self.lock = threading.Lock()
+
+    def forecast_url(self):
+        return (f"{Config.OPENWEATHER_BASE_URL}/data/2.5/forecast?lat={self.coords['lat']}"
+                f"&lon={self.coords['lon']}&appid={Config.OPENWEATHER_API_KEY}&units=metric")
+
+    def fetch_steps(self):
+        """The forecast grid from upstream, or None"""
+        if not self.breaker.allow():
+            return None
+        try:
+            response = requests.get(self.forecast_url(), timeout=Config.HTTP_TIMEOUT)
+            steps = parse_forecast(response.json())
+        except Exception as e:
+            print(f"Error fetching weather forecast: {e}")
+            steps = None
+        self.breaker.record(steps is not None)
+        return steps
+
+    async def fetch_steps_async(self, session):
+        """fetch_steps on an aiohttp session, without blocking the event loop"""
+        if not self.breaker.allow():
+            return None
+        try:
+            timeout = aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
+            async with session.get(self.forecast_url(), timeout=timeout) as response:
+                steps = parse_forecast(await response.json(content_type=None))
+        except Exception as e:
+            print(f"Error fetching weather forecast: {e!r}")
+            steps = None
+        self.breaker.record(steps is not None)
+        return steps
+
+    def is_expired(self):
+        return self.enabled and time.monotonic() >= self.next_fetch
+
+    def start_refresh(self):
+        """Claim the single in-flight refresh of an expired grid; False if fresh or already claimed"""
+        with self.lock:
+            if self.refreshing or not self.is_expired():
+                return False
+            self.refreshing = True
+            return True
+
+    def refresh(self):
+        """Refetch the grid if it is past its TTL; the last grid is served meanwhile"""
+        if self.start_refresh():
+            steps = None
+            try:
+                steps = self.fetch_steps()
+            finally:
+                self.finish_refresh(steps)
+
+    async def refresh_async(self, session):
+        """refresh, fetching on an aiohttp session"""
+        if self.start_refresh():
+            steps = None
+            try:
+                steps = await self.fetch_steps_async(session)
+            finally:
+                self.finish_refresh(steps)
+
+    def finish_refresh(self, steps):
+        with self.lock:
+            if steps is not None:
+                daily = daily_weather(steps)
+                # An unchanged grid leaves forecasts built on it valid
+                if daily != self.daily:
+                    self.daily = daily
+                    self.updated_at = time.time()
+                self.next_fetch = time.monotonic() + self.ttl
+            else:
+                # Keep the last grid; retry after the breaker cool-down
+                self.next_fetch = time.monotonic() + Config.CIRCUIT_RESET_SECONDS
+            self.refreshing = False
+
+    def get_daily(self):
+        """Cached daily weather by date; never fetches (see refresh)"""
+        return self.daily if self.enabled else {}
+
+    def for_date(self, target_date):
+        """Weather features forecast for a date, or None outside the grid"""
+        day = self.get_daily().get(pd.Timestamp(target_date).date())
+        return dict(day) if day else None
+
+
+providers = {}
+providers_lock = threading.Lock()
+
+
+def get_provider(city=None):
+    """The ForecastWeatherProvider shared by a city's fetcher and predictors"""
+    key = Config.get_city(city)['key']
+    with providers_lock:
+        if key not in providers:
+            providers[key] = ForecastWeatherProvider(key)
+        return providers[key]